@@ -0,0 +1,121 @@
+""" Benchmark the xpdf and pdf ingestion backends on the same corpus.
+For every PDF in the input folder, builds the document with each backend,
+extracts the figures and reports the processing time, the number of pages,
+captions and figures, and how well the figures of the pdf backend match the
+figures of the xpdf backend (mean IoU of the best match per figure).
+
+Run:
+poetry run python benchmarks/compare_backends.py INPUT_FOLDER ARTIFACTS_FOLDER OUTPUT_FOLDER
+    INPUT_FOLDER      -> folder with PDFs
+    ARTIFACTS_FOLDER  -> folder to place processing artifacts
+    OUTPUT_FOLDER     -> folder where to write the report
+    --measurement     -> measurement backend for xpdf, chrome (default) or fonts
+"""
+
+from argparse import ArgumentParser, Namespace
+from json import dumps as json_dumps
+from pathlib import Path
+from statistics import mean
+from sys import argv
+from time import perf_counter
+from typing import List
+
+from pdfigcapx.browser_pool import BrowserPool
+from pdfigcapx.document import Document
+from pdfigcapx.ingestion import PDF, XPDF
+from pdfigcapx.measurement import CHROME
+
+
+def parse_args(args) -> Namespace:
+    """Read command line arguments"""
+    parser = ArgumentParser(
+        prog="compare_backends",
+        description="compare the xpdf and pdf ingestion backends",
+    )
+    parser.add_argument("inputs_path", help="location for inputs")
+    parser.add_argument("xpdf_path", help="location for artifacts")
+    parser.add_argument("outputs_path", help="location for the report")
+    parser.add_argument(
+        "--measurement", type=str, choices=["chrome", "fonts"], default="chrome"
+    )
+    return parser.parse_args(args)
+
+
+def run_backend(pdf_path: Path, args: Namespace, backend: str, pool: BrowserPool):
+    """Process a document and return its figures and timing"""
+    start = perf_counter()
+    document = Document(
+        pdf_path,
+        args.xpdf_path,
+        args.outputs_path,
+        browser_pool=pool if args.measurement == CHROME else None,
+        measurement=args.measurement,
+        backend=backend,
+    )
+    document.extract_figures()
+    elapsed = perf_counter() - start
+    figures = {
+        page.number: [fig.bbox for fig in page.figures] for page in document.pages
+    }
+    return {
+        "seconds": elapsed,
+        "pages": len(document.pages),
+        "captions": sum([len(page.captions) for page in document.pages]),
+        "figures": sum([len(el) for el in figures.values()]),
+    }, figures
+
+
+def figure_agreement(reference: dict, candidate: dict) -> List[float]:
+    """Best IoU of every reference figure against the candidate figures"""
+    ious = []
+    for page_number, ref_boxes in reference.items():
+        cand_boxes = candidate.get(page_number, [])
+        for box in ref_boxes:
+            ious.append(max([box.iou(el) for el in cand_boxes], default=0.0))
+    return ious
+
+
+def main():
+    """Entry point"""
+    args = parse_args(argv[1:])
+    pdf_paths = sorted(
+        [el for el in Path(args.inputs_path).iterdir() if el.suffix.lower() == ".pdf"]
+    )
+    pool = BrowserPool()
+    rows = []
+    try:
+        for pdf_path in pdf_paths:
+            row = {"name": pdf_path.stem}
+            try:
+                row[XPDF], xpdf_figures = run_backend(pdf_path, args, XPDF, pool)
+                row[PDF], pdf_figures = run_backend(pdf_path, args, PDF, pool)
+            # pylint: disable=W0718:broad-exception-caught
+            except Exception as error:
+                row["error"] = str(error)
+                rows.append(row)
+                continue
+            ious = figure_agreement(xpdf_figures, pdf_figures)
+            row["figure_iou"] = mean(ious) if ious else None
+            rows.append(row)
+            print(
+                f"{pdf_path.stem}: xpdf {row[XPDF]['seconds']:.2f}s, "
+                f"pdf {row[PDF]['seconds']:.2f}s, figure IoU {row['figure_iou']}"
+            )
+    finally:
+        pool.close()
+
+    ok_rows = [row for row in rows if "error" not in row]
+    summary = {
+        "documents": len(rows),
+        "failed": len(rows) - len(ok_rows),
+        "xpdf_seconds": sum([row[XPDF]["seconds"] for row in ok_rows]),
+        "pdf_seconds": sum([row[PDF]["seconds"] for row in ok_rows]),
+    }
+    print(summary)
+    output_path = Path(args.outputs_path) / "compare_backends.json"
+    with open(output_path, "w", encoding="utf-8") as f_out:
+        f_out.write(json_dumps({"summary": summary, "documents": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
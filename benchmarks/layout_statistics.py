@@ -0,0 +1,176 @@
+""" Benchmark of the layout statistics in LayoutBuilder.build on synthetic
+documents. Generates one or two-column pages with many text boxes and times
+the layout built with the histograms over Python lists, as computed before
+TextBoxCoords, against the current builder, checking that both return the
+same layout.
+
+Run:
+poetry run python benchmarks/layout_statistics.py
+    --pages -> number of pages per document (default 10 100 300)
+    --boxes -> number of text boxes per page (default 500)
+    --seed  -> random seed
+"""
+
+from argparse import ArgumentParser, Namespace
+from math import floor
+from sys import argv
+from time import perf_counter
+
+from numpy.random import default_rng
+
+from pdfigcapx.layout import LayoutBuilder
+from pdfigcapx.models import Bbox, Layout, TextBox
+from pdfigcapx.page import HtmlPage
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+
+def parse_args(args) -> Namespace:
+    """Read command line arguments"""
+    parser = ArgumentParser(
+        prog="layout_statistics",
+        description="benchmark the layout statistics",
+    )
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--boxes", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(args)
+
+
+def synthetic_pages(n_pages: int, n_boxes: int, n_cols: int, rng):
+    """Rows of text aligned to the columns with some jitter, plus short boxes
+    (e.g., equations, page numbers) anywhere on the page"""
+    col_width = 468 / n_cols
+    pages = []
+    for number in range(1, n_pages + 1):
+        boxes = []
+        for idx in range(n_boxes):
+            if rng.random() < 0.8:
+                col = int(rng.integers(0, n_cols))
+                x = 72 + col * col_width + float(rng.choice([0, 0, 0, 0.5, 3, 12]))
+                width = col_width - 18 + float(rng.choice([0, 0, -40, -100.5]))
+            else:
+                x = float(rng.integers(0, PAGE_WIDTH - 30))
+                width = float(rng.integers(2, 60))
+            y = float(rng.integers(40, 760))
+            height = float(rng.choice([11, 11, 11, 9, 14.5]))
+            boxes.append(TextBox(x, y, width, height, idx, number, ""))
+        pages.append(
+            HtmlPage(
+                name=f"page{number}.html",
+                width=PAGE_WIDTH,
+                height=PAGE_HEIGHT,
+                img_name=f"page{number}.png",
+                number=number,
+                text_boxes=boxes,
+                captions=[],
+            )
+        )
+    return pages
+
+
+def list_histograms_layout(pages, threshold=30) -> Layout:
+    """Layout as computed before TextBoxCoords"""
+    widths = [y.width for x in pages for y in x.text_boxes if y.width > threshold]
+    heights = [y.height for x in pages for y in x.text_boxes if y.width > threshold]
+    sorted_widths = sorted(
+        [(i, widths.count(i)) for i in set(widths)],
+        key=lambda x: (x[1], x[0]),
+        reverse=True,
+    )
+    sorted_heights = sorted(
+        [(i, heights.count(i)) for i in set(heights)],
+        key=lambda x: x[1],
+        reverse=True,
+    )
+    row_width, row_height = sorted_widths[0][0], sorted_heights[0][0]
+    width, height = LayoutBuilder._calc_main_content_page_size(pages)
+
+    x0s = [
+        y.x
+        for x in pages
+        for y in x.text_boxes
+        if y.width > threshold and y.x < width / 2
+    ]
+    y0s = [y.y for x in pages for y in x.text_boxes if y.width > threshold]
+    x1s = [y.x1 for x in pages for y in x.text_boxes if y.width > threshold]
+    sorted_x0s = sorted(
+        [(i, x0s.count(i)) for i in set(x0s)], key=lambda x: x[1], reverse=True
+    )
+    sorted_x0s = LayoutBuilder._merge_left_padded_points(sorted_x0s)
+    cr_x0 = sorted_x0s[0][0]
+    cr_y0 = max(0, min(y0s))
+    cr_x1 = min(width - cr_x0, max(x1s))
+    cr_y1 = max(
+        [
+            y.y1
+            for x in pages
+            for y in x.text_boxes
+            if y.x >= cr_x0 and y.x1 <= cr_x1 and y.y >= cr_y0 and y.y1 <= height
+        ]
+    )
+    content_region = Bbox(cr_x0, cr_y0, cr_x1 - cr_x0, cr_y1 - cr_y0)
+
+    number_cols = floor(content_region.width / row_width)
+    if number_cols == 1:
+        if content_region.x > width / 4:
+            x0 = sorted([el.x for x in pages for el in x.text_boxes])[0]
+            x1 = sorted([el.x1 for x in pages for el in x.text_boxes], reverse=True)[0]
+            content_region = content_region.with_edges(x=x0, x1=x1)
+        col_coords = [content_region.x]
+    else:
+        x1s = [
+            y.x
+            for x in pages
+            for y in x.text_boxes
+            if y.x >= content_region.x + row_width
+        ]
+        x1s = sorted(
+            [(i, x1s.count(i)) for i in set(x1s)], key=lambda x: x[1], reverse=True
+        )
+        col_coords = [content_region.x, x1s[0][0]]
+
+    return Layout(
+        width=width,
+        height=height,
+        row_width=row_width,
+        row_height=row_height,
+        content_region=content_region,
+        num_cols=number_cols,
+        col_coords=col_coords,
+    )
+
+
+def main():
+    """Entry point"""
+    args = parse_args(argv[1:])
+    rng = default_rng(args.seed)
+    print(
+        f"{'cols':>5} {'pages':>6} {'lists (s)':>10} {'arrays (s)':>11} {'speed-up':>9}"
+    )
+    for n_cols in [1, 2]:
+        for n_pages in args.pages:
+            pages = synthetic_pages(n_pages, args.boxes, n_cols, rng)
+
+            start = perf_counter()
+            expected = list_histograms_layout(pages)
+            lists_time = perf_counter() - start
+
+            start = perf_counter()
+            layout = LayoutBuilder.build(pages)
+            arrays_time = perf_counter() - start
+
+            if repr(layout) != repr(expected):
+                raise Exception(
+                    f"layouts differ for {n_pages} pages:\n{layout}\n{expected}"
+                )
+            speed_up = lists_time / arrays_time if arrays_time > 0 else float("inf")
+            print(
+                f"{n_cols:>5} {n_pages:>6} {lists_time:>10.3f} {arrays_time:>11.3f} "
+                f"{speed_up:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+""" Accuracy of the font-metrics measurement backend against Chrome.
+Measures the same pdftohtml pages with both backends and reports the mean
+absolute error in width and height and the IoU of the text boxes.
+
+Run:
+poetry run python benchmarks/measurement_accuracy.py XPDF_FOLDER [XPDF_FOLDER ...]
+    XPDF_FOLDER -> folder created by pdftohtml (e.g. ARTIFACTS_FOLDER/xpdf_PDF_SHA256)
+    --output    -> optional path to save the report as JSON
+"""
+
+from argparse import ArgumentParser, Namespace
+from json import dumps as json_dumps
+from pathlib import Path
+from sys import argv
+
+from pdfigcapx.browser_pool import BrowserPool
+from pdfigcapx.document import valid_file
+from pdfigcapx.measurement import (
+    ChromeMeasurement,
+    FontMetricsMeasurement,
+    compare_measurements,
+)
+from pdfigcapx.utils import natural_sort
+
+
+def parse_args(args) -> Namespace:
+    """Read command line arguments"""
+    parser = ArgumentParser(
+        prog="measurement_accuracy",
+        description="compare font-metrics text boxes with Chrome",
+    )
+    parser.add_argument("xpdf_paths", nargs="+", help="pdftohtml output folders")
+    parser.add_argument("--output", type=str, default=None)
+    return parser.parse_args(args)
+
+
+def main():
+    """Entry point"""
+    args = parse_args(argv[1:])
+    browser_pool = BrowserPool()
+    reference = ChromeMeasurement(browser_pool)
+    candidate = FontMetricsMeasurement()
+
+    reports = []
+    try:
+        for xpdf_path in args.xpdf_paths:
+            names = natural_sort([x.name for x in Path(xpdf_path).iterdir()])
+            page_paths = [
+                (Path(xpdf_path) / name).resolve() for name in names if valid_file(name)
+            ]
+            report = compare_measurements(page_paths, reference, candidate)
+            report["document"] = str(xpdf_path)
+            reports.append(report)
+            print(
+                f"{xpdf_path}: {report['boxes']} boxes, "
+                f"width MAE {report.get('width_mae', 0):.2f}px, "
+                f"height MAE {report.get('height_mae', 0):.2f}px, "
+                f"mean IoU {report.get('mean_iou', 0):.3f}"
+            )
+    finally:
+        browser_pool.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f_out:
+            f_out.write(json_dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
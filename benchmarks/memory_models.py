@@ -0,0 +1,168 @@
+""" Benchmark of the memory held by the pages of a document. Builds the pages
+of a PDF, or of a synthetic document, with the text box models as defined
+before the slotted models (a __dict__ per box and a string per text) and with
+the current models, each in a fresh process, and reports the growth of the
+process RSS and of the Python heap while the pages are alive. A large
+supplementary PDF, i.e., many pages of tables, gives the worst case.
+
+Run:
+poetry run python benchmarks/memory_models.py [PDF_PATH]
+    PDF_PATH -> PDF read with the pdf ingestion backend (requires pdfminer.six).
+                Without it, a synthetic document is generated
+    --pages  -> number of pages of the synthetic document (default 300)
+    --boxes  -> number of text boxes per synthetic page (default 400)
+    --seed   -> random seed
+"""
+
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass, field
+from gc import collect
+from json import dumps, loads
+from multiprocessing import get_context
+from os import sysconf
+from pathlib import Path
+from sys import argv
+from tempfile import TemporaryDirectory
+from tracemalloc import get_traced_memory, start, stop
+
+from numpy.random import default_rng
+
+from pdfigcapx.models import AlignmentType
+from pdfigcapx.page import HtmlPage
+from pdfigcapx.utils import build_html_page
+
+WORDS = ["figure", "table", "gene", "0.05", "p-value", "cell", "±", "résumé", "n=12"]
+
+
+@dataclass()
+class LegacyBbox:
+    """Bbox before the slotted models, __slot__ does not declare slots"""
+
+    __slot__ = ("x", "y", "width", "height", "x1", "y1")
+    x: int
+    y: int
+    width: int
+    height: int
+    x1: int = field(init=False)
+    y1: int = field(init=False)
+
+    def __post_init__(self):
+        self.x1 = self.x + self.width
+        self.y1 = self.y + self.height
+
+
+class LegacyTextBox(LegacyBbox):
+    """TextBox before the slotted models"""
+
+    def __init__(self, x, y, width, height, id, page_number, text):
+        super().__init__(x, y, width, height)
+        self.id = id
+        self.page_number = page_number
+        self.text = text
+        self.alignment = AlignmentType.UNKNOWN
+
+
+def parse_args(args) -> Namespace:
+    """Read command line arguments"""
+    parser = ArgumentParser(
+        prog="memory_models",
+        description="compare the memory held by the document pages",
+    )
+    parser.add_argument("pdf_path", nargs="?", default=None)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--boxes", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(args)
+
+
+def write_pdf_boxes(pdf_path: str, boxes_path: Path) -> None:
+    """Text boxes of every page as read by the pdf ingestion backend"""
+    # pylint: disable=import-outside-toplevel
+    from pdfigcapx.ingestion import extract_pdf_pages
+
+    with open(boxes_path, "w", encoding="utf-8") as f_out:
+        for page in extract_pdf_pages(pdf_path):
+            boxes = sorted(page.text_boxes + page.captions, key=lambda tb: tb.id)
+            rows = [[tb.x, tb.y, tb.width, tb.height, tb.text] for tb in boxes]
+            f_out.write(dumps([page.width, page.height, rows]) + "\n")
+
+
+def write_synthetic_boxes(args: Namespace, boxes_path: Path) -> None:
+    """Text lines of a few words all over the page"""
+    rng = default_rng(args.seed)
+    with open(boxes_path, "w", encoding="utf-8") as f_out:
+        for _ in range(args.pages):
+            rows = []
+            for _ in range(args.boxes):
+                words = rng.choice(WORDS, int(rng.integers(1, 12))).tolist()
+                x, y = float(rng.integers(40, 540)), float(rng.integers(40, 760))
+                rows.append([x, y, float(rng.integers(5, 500)), 11, " ".join(words)])
+            f_out.write(dumps([612, 792, rows]) + "\n")
+
+
+def legacy_page(number: int, width, height, rows) -> HtmlPage:
+    text_boxes = [
+        LegacyTextBox(x, y, box_width, box_height, idx, number, text)
+        for idx, (x, y, box_width, box_height, text) in enumerate(rows)
+    ]
+    return HtmlPage(f"page{number}.html", width, height, "", number, text_boxes, [])
+
+
+def rss() -> int:
+    """Resident set size of the process in bytes"""
+    with open("/proc/self/statm", encoding="utf-8") as f_in:
+        return int(f_in.read().split()[1]) * sysconf("SC_PAGE_SIZE")
+
+
+def measure(boxes_path: str, variant: str):
+    """Build the pages from boxes_path and return the growth of the RSS and the
+    traced Python heap in bytes, and the number of text boxes"""
+    collect()
+    rss_before = rss()
+    start()
+    pages, n_boxes = [], 0
+    with open(boxes_path, encoding="utf-8") as f_in:
+        for number, line in enumerate(f_in, start=1):
+            width, height, rows = loads(line)
+            n_boxes += len(rows)
+            if variant == "legacy":
+                pages.append(legacy_page(number, width, height, rows))
+            else:
+                pages.append(build_html_page(f"page{number}.html", width, height, rows))
+            del rows, line
+    collect()
+    heap, _ = get_traced_memory()
+    stop()
+    return rss() - rss_before, heap, n_boxes
+
+
+def main():
+    """Entry point"""
+    args = parse_args(argv[1:])
+    with TemporaryDirectory() as tmp_path:
+        boxes_path = Path(tmp_path) / "boxes.jsonl"
+        if args.pdf_path:
+            write_pdf_boxes(args.pdf_path, boxes_path)
+        else:
+            write_synthetic_boxes(args, boxes_path)
+
+        results = {}
+        context = get_context("spawn")
+        for variant in ["legacy", "slotted"]:
+            with context.Pool(1) as pool:
+                results[variant] = pool.apply(measure, (str(boxes_path), variant))
+
+    n_boxes = results["legacy"][2]
+    print(f"{n_boxes} text boxes")
+    print(f"{'models':>8} {'RSS (MiB)':>10} {'heap (MiB)':>11} {'bytes/box':>10}")
+    for variant, (rss_bytes, heap, _) in results.items():
+        print(
+            f"{variant:>8} {rss_bytes / 2**20:>10.1f} {heap / 2**20:>11.1f} "
+            f"{heap / max(n_boxes, 1):>10.0f}"
+        )
+    saved = 1 - results["slotted"][1] / max(results["legacy"][1], 1)
+    print(f"heap saved: {saved:.1%}")
+
+
+if __name__ == "__main__":
+    main()
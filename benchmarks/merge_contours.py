@@ -0,0 +1,103 @@
+""" Microbenchmark of the cross-column contour merge in get_candidates.
+Generates synthetic two-column pages with dense line art, i.e., many small
+contours and a few contours crossing the column boundary, and times the
+pairwise merge against contours.cross_column_groups, checking that both
+return the same groups.
+
+Run:
+poetry run python benchmarks/merge_contours.py
+    --sizes    -> number of contours per page (default 500 2000 8000)
+    --crossing -> fraction of contours crossing the column boundary
+    --seed     -> random seed
+"""
+
+from argparse import ArgumentParser, Namespace
+from sys import argv
+from time import perf_counter
+from typing import List
+
+from numpy.random import default_rng
+
+from pdfigcapx.contours import cross_column_groups
+from pdfigcapx.models import Bbox
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+CONTENT_REGION = Bbox(50, 60, 512, 672)
+X_CROSS = 306
+
+
+def parse_args(args) -> Namespace:
+    """Read command line arguments"""
+    parser = ArgumentParser(
+        prog="merge_contours",
+        description="benchmark the cross-column contour merge",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 8000])
+    parser.add_argument("--crossing", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(args)
+
+
+def synthetic_contours(size: int, crossing: float, rng) -> List[Bbox]:
+    """Small boxes all over the content region plus a few wide boxes crossing
+    the column boundary"""
+    n_crossing = max(1, int(size * crossing))
+    cnts = []
+    for _ in range(size - n_crossing):
+        x = int(rng.integers(CONTENT_REGION.x, CONTENT_REGION.x1 - 10))
+        y = int(rng.integers(CONTENT_REGION.y, CONTENT_REGION.y1 - 10))
+        cnts.append(Bbox(x, y, int(rng.integers(1, 10)), int(rng.integers(1, 10))))
+    for _ in range(n_crossing):
+        x = int(rng.integers(CONTENT_REGION.x, X_CROSS - 1))
+        y = int(rng.integers(CONTENT_REGION.y, CONTENT_REGION.y1 - 20))
+        width = int(rng.integers(X_CROSS - x + 1, CONTENT_REGION.x1 - x))
+        cnts.append(Bbox(x, y, width, int(rng.integers(2, 20))))
+    rng.shuffle(cnts)
+    return cnts
+
+
+def pairwise_groups(cnts: List[Bbox], x_cross: float, content_region: Bbox):
+    """Merge groups as computed before the index, comparing every pair"""
+    groups = []
+    for i, cnt in enumerate(cnts):
+        if cnt.x < x_cross and cnt.x1 > x_cross:
+            idxs_merge = [i]
+            for j, cnt_eval in enumerate(cnts):
+                if cnt != cnt_eval:
+                    row_region = Bbox(
+                        content_region.x, cnt.y, content_region.width, cnt.height
+                    )
+                    if row_region.intersect_area(cnt_eval) > 0:
+                        idxs_merge.append(j)
+            if len(idxs_merge) > 1:
+                groups.append(idxs_merge)
+    return groups
+
+
+def main():
+    """Entry point"""
+    args = parse_args(argv[1:])
+    rng = default_rng(args.seed)
+    print(f"{'contours':>10} {'pairwise (s)':>14} {'indexed (s)':>14} {'speed-up':>10}")
+    for size in args.sizes:
+        cnts = synthetic_contours(size, args.crossing, rng)
+
+        start = perf_counter()
+        expected = pairwise_groups(cnts, X_CROSS, CONTENT_REGION)
+        pairwise_time = perf_counter() - start
+
+        start = perf_counter()
+        groups = cross_column_groups(cnts, X_CROSS, CONTENT_REGION)
+        indexed_time = perf_counter() - start
+
+        if groups != expected:
+            raise Exception(f"merge groups differ for {size} contours")
+        speed_up = pairwise_time / indexed_time if indexed_time > 0 else float("inf")
+        print(
+            f"{size:>10} {pairwise_time:>14.4f} {indexed_time:>14.4f} {speed_up:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
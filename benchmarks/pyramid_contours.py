@@ -0,0 +1,100 @@
+""" Benchmark the multi-resolution contour detection against the full
+resolution path on the page PNGs of an artifacts folder. For every pyramid
+scale, reports the detection time and speed-up, and the drift of the boxes:
+for every full resolution box big enough to be a figure candidate, the IoU of
+the best matching pyramid box.
+
+Run:
+poetry run python benchmarks/pyramid_contours.py ARTIFACTS_FOLDER
+    ARTIFACTS_FOLDER -> folder with page PNGs, searched recursively
+    --scales         -> pyramid scales to compare (default 2 4 8)
+    --min_area       -> min area in pixels of the boxes compared (default 2500)
+    --max_pages      -> max number of pages to read
+"""
+
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from statistics import mean
+from sys import argv
+from time import perf_counter
+
+from pdfigcapx.contours import (
+    PYRAMID_SCALES,
+    graphics_boxes,
+    pyramid_boxes,
+    read_gray,
+)
+from pdfigcapx.models import Bbox
+
+
+def parse_args(args) -> Namespace:
+    """Read command line arguments"""
+    parser = ArgumentParser(
+        prog="pyramid_contours",
+        description="compare pyramid and full resolution contour detection",
+    )
+    parser.add_argument("artifacts_path", help="location of the page PNGs")
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        choices=PYRAMID_SCALES,
+        default=[2, 4, 8],
+    )
+    parser.add_argument("--min_area", type=int, default=2500)
+    parser.add_argument("--max_pages", type=int, default=None)
+    return parser.parse_args(args)
+
+
+def full_resolution_boxes(png_path: str):
+    """Current detection path"""
+    return graphics_boxes(read_gray(png_path))
+
+
+def best_ious(reference, boxes, min_area: int):
+    """IoU of the best match of every reference box above min_area"""
+    candidates = [Bbox(*el) for el in boxes.tolist()]
+    ious = []
+    for el in reference.tolist():
+        bbox = Bbox(*el)
+        if bbox.area() >= min_area:
+            ious.append(max([bbox.iou(other) for other in candidates], default=0.0))
+    return ious
+
+
+def main():
+    """Entry point"""
+    args = parse_args(argv[1:])
+    png_paths = sorted(Path(args.artifacts_path).rglob("*.png"))
+    png_paths = [str(el) for el in png_paths[: args.max_pages]]
+    if len(png_paths) == 0:
+        raise Exception(f"no PNG files in {args.artifacts_path}")
+
+    reference, full_time = [], 0.0
+    for png_path in png_paths:
+        start = perf_counter()
+        reference.append(full_resolution_boxes(png_path))
+        full_time += perf_counter() - start
+    print(f"{len(png_paths)} pages, full resolution: {full_time:.3f}s")
+
+    print(
+        f"{'scale':>6} {'time (s)':>10} {'speed-up':>9} {'mean IoU':>9} {'IoU>=0.9':>9}"
+    )
+    for scale in args.scales:
+        ious, pyramid_time = [], 0.0
+        for png_path, ref_boxes in zip(png_paths, reference):
+            start = perf_counter()
+            boxes = pyramid_boxes(png_path, scale)
+            pyramid_time += perf_counter() - start
+            ious += best_ious(ref_boxes, boxes, args.min_area)
+        speed_up = full_time / pyramid_time if pyramid_time > 0 else float("inf")
+        mean_iou = mean(ious) if ious else 1.0
+        matched = sum([iou >= 0.9 for iou in ious]) / len(ious) if ious else 1.0
+        print(
+            f"{scale:>6} {pyramid_time:>10.3f} {speed_up:>8.1f}x "
+            f"{mean_iou:>9.3f} {matched:>9.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
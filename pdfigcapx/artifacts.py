@@ -0,0 +1,157 @@
+""" Content-addressed store for the artifacts created from a PDF.
+The artifacts (pdftohtml pages or page background images) are stored in a
+folder named after the SHA-256 of the PDF content, so that identical PDFs
+share a single conversion regardless of their file names, and PDFs with the
+same name do not collide. Conversions are written to a temporary folder that
+gets a completion marker and is then renamed atomically, hence a folder
+without the marker is always a leftover from a crashed run. A lock file per
+PDF hash makes concurrent workers wait for the first conversion instead of
+repeating it.
+"""
+
+import logging
+from hashlib import sha256
+from json import dumps as json_dumps
+from os import O_CREAT, O_EXCL, O_WRONLY, close, getpid, kill, open as os_open
+from os import rename, replace, walk, write
+from os.path import getsize, join
+from pathlib import Path
+from shutil import rmtree
+from time import sleep, time
+from typing import Callable, Optional, Tuple, Union
+
+COMPLETE_MARKER = ".complete"
+LOCK_TIMEOUT = 1800  # seconds before a lock from a hung worker is broken
+
+
+def content_hash(file_path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of the file content"""
+    digest = sha256()
+    with open(file_path, "rb") as f_in:
+        for chunk in iter(lambda: f_in.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def folder_size(folder: Union[str, Path]) -> int:
+    """Total size in bytes of the files inside the folder"""
+    return sum(
+        getsize(join(root, name)) for root, _, files in walk(folder) for name in files
+    )
+
+
+def is_complete(folder: Path) -> bool:
+    """Whether the folder holds a finished conversion"""
+    return (folder / COMPLETE_MARKER).exists()
+
+
+def write_marker(folder: Path, content: str) -> None:
+    """Write the completion marker atomically"""
+    tmp_marker = folder / f"{COMPLETE_MARKER}.tmp"
+    with open(tmp_marker, "w", encoding="utf-8") as f_out:
+        f_out.write(content)
+    replace(tmp_marker, folder / COMPLETE_MARKER)
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with the pid is running on this host"""
+    try:
+        kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _is_stale(lock_path: Path) -> bool:
+    try:
+        pid = int(lock_path.read_text(encoding="utf-8") or 0)
+        age = time() - lock_path.stat().st_mtime
+    except (FileNotFoundError, ValueError):
+        return False
+    return age > LOCK_TIMEOUT or not pid_alive(pid)
+
+
+def _acquire_lock(lock_path: Path, folder: Path, poll: float) -> bool:
+    """Take the lock for a conversion. Returns False without the lock if another
+    worker completed the conversion while waiting."""
+    while True:
+        try:
+            descriptor = os_open(lock_path, O_CREAT | O_EXCL | O_WRONLY)
+        except FileExistsError:
+            if is_complete(folder):
+                return False
+            if _is_stale(lock_path):
+                logging.warning("breaking stale artifacts lock %s", lock_path)
+                lock_path.unlink(missing_ok=True)
+            else:
+                sleep(poll)
+            continue
+        write(descriptor, str(getpid()).encode())
+        close(descriptor)
+        return True
+
+
+def ensure_artifacts(
+    pdf_path: Union[str, Path],
+    base_path: Union[str, Path],
+    prefix: str,
+    convert: Callable[[Path, Path], None],
+    poll: float = 0.5,
+    digest: Optional[str] = None,
+) -> Tuple[Path, bool]:
+    """Return the artifacts folder for the PDF, converting it only if there is
+    no complete conversion of the same content.
+    Parameters:
+    ----------
+    - pdf_path: str
+    - base_path: str
+        Folder holding every artifacts folder
+    - prefix: str
+        Kind of artifacts (e.g. xpdf), used as folder name prefix
+    - convert: Callable
+        convert(pdf_path, output_path) writes the artifacts into output_path,
+        which does not exist before the call
+    - digest: str
+        content_hash of the PDF, if already computed
+    Returns:
+    - (artifacts folder, whether the folder was reused)
+    """
+    pdf_path = Path(pdf_path).resolve()
+    base_path = Path(base_path).resolve()
+    if digest is None:
+        digest = content_hash(pdf_path)
+    name = f"{prefix}_{digest}"
+    folder = base_path / name
+    if is_complete(folder):
+        return folder, True
+
+    lock_path = base_path / f".{name}.lock"
+    if not _acquire_lock(lock_path, folder, poll):
+        return folder, True
+    try:
+        if is_complete(folder):
+            return folder, True
+        if folder.exists():
+            logging.info("removing incomplete artifacts %s", folder)
+            rmtree(folder)
+        tmp_folder = base_path / f".{name}.tmp-{getpid()}"
+        if tmp_folder.exists():
+            rmtree(tmp_folder)
+        try:
+            convert(pdf_path, tmp_folder)
+            marker = {
+                "pdf": pdf_path.name,
+                "sha256": digest,
+                "created": time(),
+                "bytes": folder_size(tmp_folder),
+            }
+            write_marker(tmp_folder, json_dumps(marker))
+            rename(tmp_folder, folder)
+        finally:
+            if tmp_folder.exists():
+                rmtree(tmp_folder, ignore_errors=True)
+    finally:
+        lock_path.unlink(missing_ok=True)
+    return folder, False
@@ -5,18 +5,209 @@ The batch imports support two modes FOLDER_INPUT and FOLDER_BASKET.
 - FOLDER_BASKET: The input_path contains PDF documents
 """
 
-from os import makedirs
+from collections import Counter
+from json import loads as json_loads
+from os import getpid, makedirs, rename, utime
 from pathlib import Path
+from re import compile as re_compile
+from shutil import rmtree
 import logging
 import multiprocessing
-from typing import Optional, List
+from multiprocessing.util import Finalize
+from typing import Optional, List, Set
 from pdfigcapx.utils import batch
+from pdfigcapx.artifacts import (
+    COMPLETE_MARKER,
+    content_hash,
+    folder_size,
+    is_complete,
+    pid_alive,
+)
 from pdfigcapx.document import Document
+from pdfigcapx.page_cache import PageCache
+from pdfigcapx.layout_cache import LayoutTemplateCache
+from pdfigcapx.browser_pool import BrowserPool
+from pdfigcapx.measurement import CHROME
+from pdfigcapx.ingestion import XPDF
+from pdfigcapx.contours import RASTER
+from pdfigcapx.layout import UnsupportedLayoutError
 
 ERROR_NO_PDF = "NO_PDF"
 ERROR_MORE_THAN_ONE_PDF = "MORE_THAN_ONE_PDF"
 FAILED_LOG = "pdfigcapx_failed.log"
 
+ARTIFACTS_FOLDER_NAME = re_compile(r"^(xpdf|pdf)_[0-9a-f]{64}$")
+
+# browsers shared by every document processed in the current worker process
+_BROWSER_POOL: Optional[BrowserPool] = None
+# artifacts folder budget and manager of the current worker process
+_ARTIFACTS_MAX_BYTES: Optional[int] = None
+_ARTIFACT_MANAGER: Optional["ArtifactManager"] = None
+# cache of parsed pages shared by the workers, None when disabled
+_PAGE_CACHE: Optional[PageCache] = None
+# ghostscript processes rendering the pages of a document for export
+_RENDER_WORKERS = 1
+# reduction of the page PNGs to find the contour candidates, 1 for none
+_PYRAMID_SCALE = 1
+# source of the contour candidates, raster or objects
+_CANDIDATE_SOURCE = RASTER
+# leave out the graphics repeated on most pages as figure candidates
+_REMOVE_FURNITURE = False
+# max pages sampled to fix the layout early, 0 to use every page
+_LAYOUT_SAMPLE = 0
+# publisher layout templates shared by the workers, None when disabled
+_LAYOUT_CACHE: Optional[LayoutTemplateCache] = None
+
+
+class ArtifactManager:
+    """Keeps the artifacts folder under a byte budget by evicting the least
+    recently used artifact folders. The folders of documents in process by any
+    worker are pinned and never evicted. Pins are files named after the PDF
+    hash and the worker pid, so pins from dead workers are ignored.
+    Parameters:
+    ----------
+    - artifacts_path: str
+        Folder holding the artifact folders (see pdfigcapx.artifacts)
+    - max_bytes: int
+        Byte budget for the artifacts folder, None for no limit
+    - collect_interval: int
+        Number of processed documents between garbage collections
+    """
+
+    def __init__(
+        self, artifacts_path: str, max_bytes: Optional[int] = None, collect_interval=10
+    ):
+        self.artifacts_path = Path(artifacts_path)
+        self.max_bytes = max_bytes
+        self.collect_interval = collect_interval
+        self.pins_path = self.artifacts_path / ".pins"
+        self._documents_since_collect = 0
+
+    def pin(self, digest: str) -> None:
+        """Protect the artifacts of the PDF with content hash digest from
+        eviction"""
+        makedirs(self.pins_path, exist_ok=True)
+        (self.pins_path / f"{digest}.{getpid()}").touch()
+
+    def unpin(self, digest: str) -> None:
+        (self.pins_path / f"{digest}.{getpid()}").unlink(missing_ok=True)
+
+    def pinned(self) -> Set[str]:
+        """Hashes pinned by running processes"""
+        if not self.pins_path.exists():
+            return set()
+        digests = set()
+        for pin in self.pins_path.iterdir():
+            digest, _, pid = pin.name.partition(".")
+            if pid.isdigit() and pid_alive(int(pid)):
+                digests.add(digest)
+            else:
+                pin.unlink(missing_ok=True)
+        return digests
+
+    def record_use(self, folder: Path) -> None:
+        """Mark the folder as recently used"""
+        if is_complete(folder):
+            utime(folder / COMPLETE_MARKER)
+        self._documents_since_collect += 1
+
+    def collect(self, force=False) -> Counter:
+        """Evict least recently used folders until the artifacts fit the budget.
+        Returns the number of evicted folders and bytes."""
+        evicted = Counter()
+        if self.max_bytes is None:
+            return evicted
+        if not force and self._documents_since_collect < self.collect_interval:
+            return evicted
+        self._documents_since_collect = 0
+
+        entries = []
+        for folder in self.artifacts_path.iterdir():
+            if ARTIFACTS_FOLDER_NAME.match(folder.name) and is_complete(folder):
+                marker = folder / COMPLETE_MARKER
+                try:
+                    size = json_loads(marker.read_text(encoding="utf-8"))["bytes"]
+                    entries.append((marker.stat().st_mtime, size, folder))
+                except (FileNotFoundError, KeyError, ValueError):
+                    # evicted by another worker or marker without size
+                    if folder.exists():
+                        entries.append((0, folder_size(folder), folder))
+        total_bytes = sum([el[1] for el in entries])
+        if total_bytes <= self.max_bytes:
+            return evicted
+
+        pinned = self.pinned()
+        for _, size, folder in sorted(entries, key=lambda x: x[0]):
+            if total_bytes <= self.max_bytes:
+                break
+            if folder.name.split("_", 1)[1] in pinned:
+                continue
+            if self._evict(folder):
+                total_bytes -= size
+                evicted["artifacts_evictions"] += 1
+                evicted["artifacts_evicted_bytes"] += size
+        return evicted
+
+    def _evict(self, folder: Path) -> bool:
+        # rename first so that no one reads a partially deleted folder
+        trash = folder.parent / f".evict-{folder.name}-{getpid()}"
+        try:
+            rename(folder, trash)
+        except FileNotFoundError:
+            return False
+        rmtree(trash, ignore_errors=True)
+        return True
+
+
+def init_worker(
+    browser_max_pages: int = 500,
+    artifacts_max_bytes: Optional[int] = None,
+    page_cache_path: Optional[str] = None,
+    render_workers: int = 1,
+    pyramid_scale: int = 1,
+    candidate_source: str = RASTER,
+    layout_sample: int = 0,
+    layout_cache_path: Optional[str] = None,
+    remove_furniture: bool = False,
+) -> None:
+    """Initializer for pool workers. Creates the browser pool lent to every
+    document processed by the worker and quits its browsers when the worker exits.
+    """
+    # pylint: disable=global-statement
+    global _BROWSER_POOL, _ARTIFACTS_MAX_BYTES, _PAGE_CACHE
+    global _RENDER_WORKERS, _PYRAMID_SCALE, _CANDIDATE_SOURCE, _LAYOUT_SAMPLE
+    global _LAYOUT_CACHE, _REMOVE_FURNITURE
+    _BROWSER_POOL = BrowserPool(max_pages=browser_max_pages)
+    Finalize(_BROWSER_POOL, _BROWSER_POOL.close, exitpriority=10)
+    _ARTIFACTS_MAX_BYTES = artifacts_max_bytes
+    _PAGE_CACHE = PageCache(page_cache_path) if page_cache_path else None
+    _RENDER_WORKERS = render_workers
+    _PYRAMID_SCALE = pyramid_scale
+    _CANDIDATE_SOURCE = candidate_source
+    _LAYOUT_SAMPLE = layout_sample
+    _LAYOUT_CACHE = (
+        LayoutTemplateCache(layout_cache_path) if layout_cache_path else None
+    )
+    _REMOVE_FURNITURE = remove_furniture
+
+
+def get_browser_pool() -> BrowserPool:
+    """Browser pool of the current process, created on first use"""
+    if _BROWSER_POOL is None:
+        init_worker()
+    return _BROWSER_POOL
+
+
+def get_artifact_manager(artifacts_path: str) -> ArtifactManager:
+    """Artifact manager of the current process, created on first use"""
+    # pylint: disable=global-statement
+    global _ARTIFACT_MANAGER
+    if _ARTIFACT_MANAGER is None or _ARTIFACT_MANAGER.artifacts_path != Path(
+        artifacts_path
+    ):
+        _ARTIFACT_MANAGER = ArtifactManager(artifacts_path, _ARTIFACTS_MAX_BYTES)
+    return _ARTIFACT_MANAGER
+
 
 def process_pdf(
     pdf_path: str,
@@ -25,7 +216,9 @@ def process_pdf(
     logs_path: str,
     create_folder: bool = False,
     debug: bool = True,
-) -> None:
+    measurement: str = CHROME,
+    backend: str = XPDF,
+) -> Counter:
     """Process each PDF and extract data to data directory.
     Identifies the layout and extracts the figures per page. For bookkeeping, if
     the extraction fails, saves the document name to 'failed_processing.log'. If
@@ -41,7 +234,53 @@ def process_pdf(
         Full path to folder where to save the xpdf content, which includes the pdf pages as HTML and PNG
     - data_path: str
         Full path to folder where to save the extracted images and metadata information
+    - measurement: str
+        Backend to measure the text boxes, "chrome" or "fonts"
+    - backend: str
+        Ingestion backend, "xpdf" or "pdf"
+    Returns:
+    - Counter
+        Processing metrics of the document, aggregated in the run summary
     """
+    artifact_manager = get_artifact_manager(xpdf_path)
+    try:
+        # hashed once, for the pin and the artifacts folder
+        digest = content_hash(pdf_path)
+        artifact_manager.pin(digest)
+    except OSError:
+        digest = None  # unreadable PDF, reported as a failed extraction
+    try:
+        metrics = _process_document(
+            pdf_path,
+            xpdf_path,
+            data_path,
+            logs_path,
+            create_folder,
+            debug,
+            measurement,
+            backend,
+            digest,
+        )
+    finally:
+        if digest is not None:
+            artifact_manager.unpin(digest)
+    metrics.update(artifact_manager.collect())
+    return metrics
+
+
+def _process_document(
+    pdf_path: str,
+    xpdf_path: str,
+    data_path: str,
+    logs_path: str,
+    create_folder: bool,
+    debug: bool,
+    measurement: str,
+    backend: str,
+    pdf_hash: Optional[str] = None,
+) -> Counter:
+    """Extract, export and draw the document as described in process_pdf"""
+    metrics = Counter(documents=1)
     error_processing_path = Path(logs_path) / FAILED_LOG
     error_export_path = Path(logs_path) / "pdfigcapx_failed_export.log"
     error_draw_path = Path(logs_path) / "pdfigcapx_failed_draw.log"
@@ -55,26 +294,52 @@ def process_pdf(
         if create_folder:
             target_path = Path(data_path) / document_name
             makedirs(target_path, exist_ok=True)
-        document = Document(pdf_path, xpdf_path, target_path, include_first_page=False)
+        document = Document(
+            pdf_path,
+            xpdf_path,
+            target_path,
+            include_first_page=False,
+            browser_pool=get_browser_pool() if measurement == CHROME else None,
+            measurement=measurement,
+            backend=backend,
+            page_cache=_PAGE_CACHE,
+            pyramid_scale=_PYRAMID_SCALE,
+            candidate_source=_CANDIDATE_SOURCE,
+            remove_furniture=_REMOVE_FURNITURE,
+            layout_sample=_LAYOUT_SAMPLE,
+            layout_cache=_LAYOUT_CACHE,
+            pdf_hash=pdf_hash,
+        )
+        get_artifact_manager(xpdf_path).record_use(document.xpdf_path)
+        metrics[
+            "artifacts_hits" if document.artifacts_reused else "artifacts_misses"
+        ] += 1
         document.extract_figures()
+        metrics.update(document.metrics)
+        if not debug:
+            document.release_text_boxes()
     # pylint: disable=W0718:broad-exception-caught
-    except Exception:
+    except Exception as error:
         logging.error("%s,FAILED_EXTRACT", document_name, exc_info=True)
         with open(error_processing_path, "a", encoding="utf-8") as f_in:
             f_in.write(f"{document_name}\n")
-        return
+        metrics["failed_extract"] += 1
+        if isinstance(error, UnsupportedLayoutError):
+            metrics["unsupported_layouts"] += 1
+        return metrics
 
     try:
         # save the data to disk
         document.export_metadata(prefix=document_name)
-        document.save_images(dpi=300, prefix=document_name)
+        document.save_images(dpi=300, prefix=document_name, workers=_RENDER_WORKERS)
     # pylint: disable=W0718:broad-exception-caught
     except Exception:
         logging.error("%s,FAILED_EXPORT", document_name, exc_info=True)
         logging.error(pdf_path, exc_info=True)
         with open(error_export_path, "a", encoding="utf-8") as f_in:
             f_in.write(f"{document_name}\n")
-        return
+        metrics["failed_export"] += 1
+        return metrics
 
     if debug:
         try:
@@ -84,9 +349,12 @@ def process_pdf(
             logging.warning("%s,FAILED_DRAW", document_name, exc_info=True)
             with open(error_draw_path, "a", encoding="utf-8") as f_in:
                 f_in.write(f"{document_name}\n")
+            metrics["failed_draw"] += 1
 
     with open(success_path, "a", encoding="utf-8") as f_in:
         f_in.write(f"{document_name}\n")
+    metrics["succeeded"] += 1
+    return metrics
 
 
 def setup_logging(
@@ -187,17 +455,62 @@ def process_in_folder_mode(
     batch_size: int = 256,
     num_workers: int = 6,
     debug: bool = False,
-) -> None:
+    browser_max_pages: int = 500,
+    measurement: str = CHROME,
+    backend: str = XPDF,
+    artifacts_max_bytes: Optional[int] = None,
+    page_cache_path: Optional[Path] = None,
+    render_workers: int = 1,
+    pyramid_scale: int = 1,
+    candidate_source: str = RASTER,
+    layout_sample: int = 0,
+    layout_cache_path: Optional[Path] = None,
+    remove_furniture: bool = False,
+) -> Counter:
     """Process the list of PDFs in batches to avoid overload the system with
-    OS forks."""
+    OS forks. Every worker reuses its browser until it loads browser_max_pages,
+    and keeps the artifacts folder under artifacts_max_bytes. Parsed pages are
+    cached in page_cache_path when given, and each document is rendered for
+    export by render_workers ghostscript processes. Contours are found on the
+    page images reduced by pyramid_scale, or read from the PDF objects with the
+    objects candidate_source. With a layout_sample, the layout is fixed from
+    the first pages measured and documents with an unsupported layout are
+    abandoned early. Layouts of known publisher templates are taken from
+    layout_cache_path when given. With remove_furniture, logos and rules
+    repeated on most pages are not figure candidates. Returns the aggregated
+    metrics, which are also logged as the run summary."""
     in_tuples = [
-        (pdf_path, artifacts_path, pdf_path.parent, logs_path, False, debug)
+        (
+            pdf_path,
+            artifacts_path,
+            pdf_path.parent,
+            logs_path,
+            False,
+            debug,
+            measurement,
+            backend,
+        )
         for pdf_path in pdf_paths
     ]
 
+    metrics = Counter()
     for data_batch in batch(in_tuples, n=batch_size):
-        with multiprocessing.Pool(num_workers) as pool:
-            pool.starmap(process_pdf, data_batch)
+        worker_args = (
+            browser_max_pages,
+            artifacts_max_bytes,
+            page_cache_path,
+            render_workers,
+            pyramid_scale,
+            candidate_source,
+            layout_sample,
+            layout_cache_path,
+            remove_furniture,
+        )
+        metrics.update(_run_batch(data_batch, num_workers, worker_args))
+    manager = ArtifactManager(artifacts_path, artifacts_max_bytes)
+    metrics.update(manager.collect(force=True))
+    log_run_summary(metrics)
+    return metrics
 
 
 def process_in_basket_mode(
@@ -209,14 +522,93 @@ def process_in_basket_mode(
     batch_size: int = 256,
     num_workers: int = 6,
     debug: bool = False,
-) -> None:
+    browser_max_pages: int = 500,
+    measurement: str = CHROME,
+    backend: str = XPDF,
+    artifacts_max_bytes: Optional[int] = None,
+    page_cache_path: Optional[Path] = None,
+    render_workers: int = 1,
+    pyramid_scale: int = 1,
+    candidate_source: str = RASTER,
+    layout_sample: int = 0,
+    layout_cache_path: Optional[Path] = None,
+    remove_furniture: bool = False,
+) -> Counter:
     """Process the list of PDFs in batches to avoid overload the system with
-    OS forks."""
+    OS forks. Every worker reuses its browser until it loads browser_max_pages,
+    and keeps the artifacts folder under artifacts_max_bytes. Parsed pages are
+    cached in page_cache_path when given, and each document is rendered for
+    export by render_workers ghostscript processes. Contours are found on the
+    page images reduced by pyramid_scale, or read from the PDF objects with the
+    objects candidate_source. With a layout_sample, the layout is fixed from
+    the first pages measured and documents with an unsupported layout are
+    abandoned early. Layouts of known publisher templates are taken from
+    layout_cache_path when given. With remove_furniture, logos and rules
+    repeated on most pages are not figure candidates. Returns the aggregated
+    metrics, which are also logged as the run summary."""
     in_tuples = [
-        (pdf_path, artifacts_path, outputs_path, logs_path, create_folder, debug)
+        (
+            pdf_path,
+            artifacts_path,
+            outputs_path,
+            logs_path,
+            create_folder,
+            debug,
+            measurement,
+            backend,
+        )
         for pdf_path in pdf_paths
     ]
 
+    metrics = Counter()
     for data_batch in batch(in_tuples, n=batch_size):
-        with multiprocessing.Pool(num_workers) as pool:
-            pool.starmap(process_pdf, data_batch)
+        worker_args = (
+            browser_max_pages,
+            artifacts_max_bytes,
+            page_cache_path,
+            render_workers,
+            pyramid_scale,
+            candidate_source,
+            layout_sample,
+            layout_cache_path,
+            remove_furniture,
+        )
+        metrics.update(_run_batch(data_batch, num_workers, worker_args))
+    manager = ArtifactManager(artifacts_path, artifacts_max_bytes)
+    metrics.update(manager.collect(force=True))
+    log_run_summary(metrics)
+    return metrics
+
+
+def _run_batch(data_batch: List[tuple], num_workers: int, worker_args: tuple):
+    """Process a batch in a new pool. Workers are closed and joined instead of
+    terminated so that they can quit their browsers before exiting."""
+    with multiprocessing.Pool(
+        num_workers, initializer=init_worker, initargs=worker_args
+    ) as pool:
+        results = pool.starmap(process_pdf, data_batch)
+        pool.close()
+        pool.join()
+    return sum(results, Counter())
+
+
+def format_run_summary(metrics: Counter) -> str:
+    """One line with the aggregated metrics of a run and the cache hit rates"""
+    lookups = metrics["artifacts_hits"] + metrics["artifacts_misses"]
+    hit_rate = metrics["artifacts_hits"] / lookups if lookups > 0 else 0.0
+    summary = ", ".join([f"{key}={value}" for key, value in sorted(metrics.items())])
+    message = f"run summary: {summary}, artifacts_hit_rate={hit_rate:.2%}"
+    page_lookups = metrics["page_cache_hits"] + metrics["page_cache_misses"]
+    if page_lookups > 0:
+        page_hit_rate = metrics["page_cache_hits"] / page_lookups
+        message += f", page_cache_hit_rate={page_hit_rate:.2%}"
+    layout_lookups = metrics["layout_cache_hits"] + metrics["layout_cache_misses"]
+    if layout_lookups > 0:
+        layout_hit_rate = metrics["layout_cache_hits"] / layout_lookups
+        message += f", layout_cache_hit_rate={layout_hit_rate:.2%}"
+    return message
+
+
+def log_run_summary(metrics: Counter) -> None:
+    """Log the aggregated metrics of a run"""
+    logging.info(format_run_summary(metrics))
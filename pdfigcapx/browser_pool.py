@@ -0,0 +1,105 @@
+""" Pool of headless Chrome instances reused across documents.
+Launching Chrome and chromedriver costs more than measuring the pages of a
+short paper, so a worker keeps its browsers warm between documents. Browsers
+are health-checked before being lent and recycled after a number of pages to
+contain Chrome memory leaks.
+"""
+
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, List
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from pdfigcapx.utils import launch_chromedriver
+
+
+@dataclass
+class BrowserLease:
+    """Browser borrowed from the pool. Borrowers increase `pages` for every
+    page loaded so the pool knows when to recycle the browser.
+    """
+
+    browser: webdriver.Chrome
+    pages: int = 0
+
+
+class BrowserPool:
+    """Keeps idle chromedriver instances alive between documents.
+    Parameters:
+    ----------
+    - max_pages: int
+        Pages a browser can load before being quit and replaced. Use 0 to
+        never reuse a browser (i.e., the behaviour without a pool).
+    - max_idle: int
+        Maximum number of idle browsers kept in the pool
+    - launcher: Callable
+        Function returning a new webdriver instance
+    """
+
+    def __init__(
+        self,
+        max_pages: int = 500,
+        max_idle: int = 1,
+        launcher: Callable[[], webdriver.Chrome] = launch_chromedriver,
+    ):
+        self.max_pages = max_pages
+        self.max_idle = max_idle
+        self.launcher = launcher
+        self._idle: List[BrowserLease] = []
+
+    def acquire(self) -> BrowserLease:
+        """Return a healthy browser, launching a new one if none is idle"""
+        while self._idle:
+            lease = self._idle.pop()
+            if self._is_healthy(lease.browser):
+                return lease
+            logging.warning("discarding unresponsive browser from pool")
+            self._quit(lease.browser)
+        return BrowserLease(browser=self.launcher())
+
+    def release(self, lease: BrowserLease, healthy: bool = True) -> None:
+        """Give the browser back, or quit it when it reached the page limit"""
+        if (
+            not healthy
+            or lease.pages >= self.max_pages
+            or len(self._idle) >= self.max_idle
+        ):
+            self._quit(lease.browser)
+        else:
+            self._idle.append(lease)
+
+    @contextmanager
+    def borrow(self) -> Iterator[BrowserLease]:
+        """Context manager to lend a browser during the processing of a document.
+        Browsers are not returned to the pool if the borrower raises a webdriver
+        error, as the session may be corrupted.
+        """
+        lease = self.acquire()
+        healthy = True
+        try:
+            yield lease
+        except WebDriverException:
+            healthy = False
+            raise
+        finally:
+            self.release(lease, healthy=healthy)
+
+    def close(self) -> None:
+        """Quit every idle browser"""
+        while self._idle:
+            self._quit(self._idle.pop().browser)
+
+    def _is_healthy(self, browser: webdriver.Chrome) -> bool:
+        try:
+            return browser.execute_script("return 1;") == 1
+        except WebDriverException:
+            return False
+
+    def _quit(self, browser: webdriver.Chrome) -> None:
+        try:
+            browser.quit()
+        # pylint: disable=W0718:broad-exception-caught
+        except Exception:
+            logging.warning("error quitting browser", exc_info=True)
@@ -1,10 +1,19 @@
+from collections import Counter
+from math import ceil
 from pathlib import Path
-from typing import Tuple, List
+from typing import Tuple, List, Optional, Union
 from cv2 import (
     imread,
+    IMREAD_GRAYSCALE,
+    INTER_AREA,
+    INTER_NEAREST,
+    integral,
+    resize,
     cvtColor,
     dilate,
     findContours,
+    floodFill,
+    connectedComponentsWithStats,
     threshold,
     boundingRect,
     drawContours,
@@ -16,17 +25,82 @@ from cv2 import (
     RETR_EXTERNAL,
     Mat,
 )
-from numpy import ones, uint8, zeros, array
+from numpy import (
+    full,
+    ones,
+    uint8,
+    zeros,
+    array,
+    arange,
+    argsort,
+    concatenate,
+    int32,
+    int64,
+    maximum,
+    minimum,
+    ndarray,
+    nonzero,
+    float64,
+    lexsort,
+    searchsorted,
+    unique,
+    vstack,
+    where,
+)
 from PIL import Image
-from copy import copy, deepcopy
+from copy import copy
 from pdfigcapx.page import HtmlPage
-from pdfigcapx.models import Bbox, Layout, TextBox
-from pdfigcapx.utils import overlap_ratio_based
+from pdfigcapx.models import Bbox, BboxArray, Layout, TextBox
+
+# engines to find the bounding boxes of the graphical content in a page
+COMPONENTS = "components"  # connected components, boxes computed as arrays
+CONTOURS = "contours"  # findContours and one boundingRect per contour
+CANDIDATE_ENGINES = [COMPONENTS, CONTOURS]
+
+# where the contours come from: the page PNGs or the image and vector drawing
+# placements in the PDF (see ingestion.extract_graphics_boxes)
+RASTER = "raster"
+OBJECTS = "objects"
+CANDIDATE_SOURCES = [RASTER, OBJECTS]
+# pdftohtml renders the page PNGs at 150 dpi, the html pages are at 72 dpi
+PNG_SCALE = 150 / 72
+
+# thumbnail reduction and gray level below which a thumbnail pixel has ink
+THUMBNAIL_SCALE = 8
+THUMBNAIL_INK = 250
+# page furniture is inked at the same place in this fraction of the pages with
+# the most common size, and in no less than FURNITURE_MIN_PAGES pages. Contours
+# covered by the furniture in this ratio of their area are removed.
+FURNITURE_RATIO = 0.6
+FURNITURE_MIN_PAGES = 3
+FURNITURE_COVERAGE = 0.9
+# only repeated ink that is thin (rules), small (logos) or mostly outside the
+# content region (header and footer bands) is furniture, large repeated ink in
+# the content region is kept, e.g., a figure per page in supplementary files
+FURNITURE_MAX_THICKNESS = 2  # thumbnail pixels
+FURNITURE_MAX_AREA = 0.02  # fraction of the thumbnail
+FURNITURE_MAX_IN_CONTENT = 0.5  # fraction of the area in the content region
+
+# image pyramid levels, and gray level below which a reduced pixel may hold
+# content. The level is above the page threshold as thin lines get lighter
+# when averaged with the background.
+PYRAMID_SCALES = [2, 4, 8]
+PYRAMID_INK = 250
+
+# contours taller than this fraction of the content region height are tested
+# against every row when merging the rows that cross the columns
+TALL_CONTOUR_RATIO = 0.25
 
 
 def calc_scaling_factor(image: Mat, page_width: int, page_height: int) -> float:
+    height, width = image.shape[:2]
+    return size_scaling_factor(width, height, page_width, page_height)
+
+
+def size_scaling_factor(
+    width: int, height: int, page_width: int, page_height: int
+) -> float:
     # the PNG may be bigger than the html size
-    height, width, _ = image.shape
     if height > width:
         return float(height) / page_height
     else:
@@ -38,78 +112,387 @@ def scaled_bbox(cnt, scaling) -> Bbox:
     return Bbox(*[int(float(x) / scaling) for x in cnt_bbox])
 
 
-def get_candidates(
-    base_folder_path: str, page: HtmlPage, layout: Layout, captions: List[TextBox]
-) -> Tuple[List[Bbox], List[Bbox], List[Bbox]]:
-    """Find every contour in the page that could represent a publication figure
-    or a section of a publication figure"""
-    LAYOUT_MARGIN = 10
+def scaled_boxes(boxes: ndarray, scaling: float) -> ndarray:
+    """Array version of scaled_bbox for boxes as rows of [x, y, width, height]"""
+    return (boxes / scaling).astype(int32)
+
+
+def contour_boxes(binary: Mat) -> ndarray:
+    """Bounding boxes of the external contours in the binary image"""
+    contours, _ = findContours(binary, RETR_EXTERNAL, CHAIN_APPROX_SIMPLE)
+    return array([boundingRect(el) for el in contours], dtype=int32).reshape(-1, 4)
+
+
+def component_boxes(binary: Mat) -> ndarray:
+    """Same boxes and order as contour_boxes, computed from the connected
+    components of the image. External contours are the outer borders of the
+    8-connected components once their holes are filled, so the background
+    reachable from the image border (4-connected) is flood filled and every
+    other pixel becomes foreground. findContours returns the contours in
+    reverse raster order of their first pixel, which is kept here."""
+    height, width = binary.shape
+    padded = zeros((height + 2, width + 2), dtype=uint8)
+    padded[1:-1, 1:-1] = binary
+    floodFill(padded, None, (0, 0), 128)
+    solid = (padded[1:-1, 1:-1] != 128).astype(uint8)
+    _, labels, stats, _ = connectedComponentsWithStats(solid, connectivity=8)
+
+    # the first pixel of a component is the left-most one in its top row
+    top_rows = stats[:, 1]
+    in_top_row = (labels > 0) & (top_rows[labels] == arange(height)[:, None])
+    rows, cols = nonzero(in_top_row)
+    ids, first_idxs = unique(labels[rows, cols], return_index=True)
+    order = ids[argsort(first_idxs)][::-1]
+    return stats[order, :4].astype(int32)
+
+
+def graphics_boxes(
+    gray: Mat, engine: str = COMPONENTS, kernel_size=5, level=240
+) -> ndarray:
+    """Boxes of the content darker than level in the grayscale image, in pixels"""
+    _, thresh = threshold(gray, level, 255, THRESH_BINARY_INV)
+    kernel = ones((kernel_size, kernel_size), uint8)
+    dilation = dilate(thresh, kernel, iterations=1)
+    if engine == COMPONENTS:
+        return component_boxes(dilation)
+    return contour_boxes(dilation)
+
+
+def reduced_gray(gray: Mat, scale: int) -> Mat:
+    """Reduce the image by scale, averaging the pixels"""
+    height, width = gray.shape
+    reduced_size = (-(-width // scale), -(-height // scale))
+    return resize(gray, reduced_size, interpolation=INTER_AREA)
+
+
+def merge_windows(windows: ndarray, height: int, width: int) -> ndarray:
+    """Join the windows [x, y, width, height] that overlap or touch until
+    every window is disjoint, by painting them and finding their components"""
+    while True:
+        canvas = zeros((height, width), dtype=uint8)
+        for x, y, w, h in windows.tolist():
+            canvas[y : y + h, x : x + w] = 255
+        merged = component_boxes(canvas)
+        if len(merged) == len(windows):
+            return merged
+        windows = merged
+
+
+def read_gray(png_path: str) -> Mat:
+    """PNG decoded straight as grayscale, the image every contour is found on.
+    Decoding in color to convert it afterwards is slower."""
+    return imread(png_path, IMREAD_GRAYSCALE)
+
+
+def page_gray(base_folder_path: str, page: HtmlPage) -> Mat:
+    """Grayscale PNG of the page"""
+    return read_gray(str((Path(base_folder_path) / page.img_name).resolve()))
+
+
+def pyramid_boxes(
+    png: Union[str, Mat], scale: int, engine: str = COMPONENTS
+) -> ndarray:
+    """Boxes of the dark content in the PNG, in pixels, found on the page
+    reduced by scale and refined at full resolution only inside the windows
+    around the coarse boxes. png is the path of the PNG or the page already
+    read with read_gray. The page is reduced by averaging, so that thin lines
+    still show on the reduced page; content too faint to fall below
+    PYRAMID_INK once averaged is missed.
+    """
+    page_gray = read_gray(png) if isinstance(png, str) else png
+    reduced = reduced_gray(page_gray, scale)
+    # a 3x3 kernel at the reduced scale covers the 5x5 full resolution kernel
+    coarse = graphics_boxes(reduced, engine, kernel_size=3, level=PYRAMID_INK)
+    if len(coarse) == 0:
+        return zeros((0, 4), dtype=int32)
+
+    # one reduced pixel of margin, clipped to the reduced page
+    reduced_height, reduced_width = reduced.shape
+    x0 = maximum(coarse[:, 0] - 1, 0)
+    y0 = maximum(coarse[:, 1] - 1, 0)
+    x1 = minimum(coarse[:, 0] + coarse[:, 2] + 1, reduced_width)
+    y1 = minimum(coarse[:, 1] + coarse[:, 3] + 1, reduced_height)
+    windows = array([x0, y0, x1 - x0, y1 - y0]).T
+    windows = merge_windows(windows, reduced_height, reduced_width) * scale
+
+    boxes = []
+    for x, y, w, h in windows.tolist():
+        window_boxes = graphics_boxes(page_gray[y : y + h, x : x + w], engine)
+        window_boxes[:, 0] += x
+        window_boxes[:, 1] += y
+        boxes.append(window_boxes)
+    boxes = vstack(boxes)
+    # reverse raster order, as findContours
+    return boxes[lexsort((boxes[:, 0], boxes[:, 1]))[::-1]]
 
+
+def page_thumbnail(base_folder_path: str, page: HtmlPage) -> ndarray:
+    """Grayscale page PNG reduced by THUMBNAIL_SCALE"""
+    return reduced_gray(page_gray(base_folder_path, page), THUMBNAIL_SCALE)
+
+
+def contours_thumbnail(base_folder_path: str, page: HtmlPage) -> ndarray:
+    """Thumbnail of a page whose raw contours are known, with the contours
+    painted as ink. Only the PNG header is read, for the thumbnail size."""
     png_path = str((Path(base_folder_path) / page.img_name).resolve())
-    page_image = imread(png_path)
-    page_image_gray = cvtColor(page_image, COLOR_BGR2GRAY)
+    with Image.open(png_path) as png:
+        png_width, png_height = png.size
+    shape = (-(-png_height // THUMBNAIL_SCALE), -(-png_width // THUMBNAIL_SCALE))
+    thumbnail = full(shape, 255, dtype=uint8)
+    scaling = size_scaling_factor(png_width, png_height, page.width, page.height)
+    for x, y, width, height in (page.raw_contours * scaling / THUMBNAIL_SCALE).tolist():
+        x0, y0 = int(x), int(y)
+        x1, y1 = max(ceil(x + width), x0 + 1), max(ceil(y + height), y0 + 1)
+        thumbnail[y0:y1, x0:x1] = 0
+    return thumbnail
+
+
+def has_graphics(
+    base_folder_path: str,
+    page: HtmlPage,
+    thumbnail: Optional[ndarray] = None,
+    furniture: Optional[ndarray] = None,
+) -> bool:
+    """Cheap check on the page thumbnail for any graphical content. The
+    pdftohtml PNGs leave the text out, so pages with only text are blank. A
+    thumbnail pixel averages THUMBNAIL_SCALE^2 page pixels, so any content
+    big enough to become a candidate darkens it below THUMBNAIL_INK. Ink
+    inside the furniture mask, if any, is not graphical content. Pages with
+    known raw contours are answered from them, without reading the PNG."""
+    if page.raw_contours is not None:
+        if furniture is None or len(page.raw_contours) == 0:
+            return len(page.raw_contours) > 0
+        coverage = furniture_coverage(page.raw_contours, furniture, page)
+        return bool((coverage < FURNITURE_COVERAGE).any())
+    if thumbnail is None:
+        thumbnail = page_thumbnail(base_folder_path, page)
+    ink = thumbnail < THUMBNAIL_INK
+    if furniture is not None and furniture.shape == ink.shape:
+        ink &= ~furniture
+    return bool(ink.any())
+
+
+def furniture_mask(
+    thumbnails: List[ndarray], layout: Optional[Layout] = None
+) -> Optional[ndarray]:
+    """Thumbnail pixels inked at the same place across most pages, e.g.,
+    logos, running headers or footer rules. Only pages with the most common
+    thumbnail size count. A region inked repeatedly is furniture when it is
+    thin or small, or when it lies mostly outside the content region of the
+    layout, if given. Large regions in the content region are left alone, as
+    they are likely figures placed at the same spot on every page. The mask
+    grows by one thumbnail pixel to cover the borders of the furniture.
+    Returns None when nothing repeats."""
+    if len(thumbnails) < FURNITURE_MIN_PAGES:
+        return None
+    shape, count = Counter([el.shape for el in thumbnails]).most_common(1)[0]
+    if count < FURNITURE_MIN_PAGES:
+        return None
+    inked = zeros(shape, dtype=int32)
+    for thumbnail in thumbnails:
+        if thumbnail.shape == shape:
+            inked += thumbnail < THUMBNAIL_INK
+    repeated = (inked >= max(FURNITURE_MIN_PAGES, FURNITURE_RATIO * count)).astype(
+        uint8
+    )
+    n_labels, labels, stats, _ = connectedComponentsWithStats(repeated, connectivity=8)
+    x, y, width, height = stats[:, 0], stats[:, 1], stats[:, 2], stats[:, 3]
+    is_furniture = (minimum(width, height) <= FURNITURE_MAX_THICKNESS) | (
+        width * height <= FURNITURE_MAX_AREA * repeated.size
+    )
+    if layout is not None:
+        region = layout.content_region
+        scaling = size_scaling_factor(shape[1], shape[0], layout.width, layout.height)
+        inter_w = minimum(x + width, (region.x + region.width) * scaling) - maximum(
+            x, region.x * scaling
+        )
+        inter_h = minimum(y + height, (region.y + region.height) * scaling) - maximum(
+            y, region.y * scaling
+        )
+        in_content = inter_w.clip(0) * inter_h.clip(0) / (width * height)
+        is_furniture |= in_content < FURNITURE_MAX_IN_CONTENT
+    is_furniture[0] = False  # background
+    mask = is_furniture[labels]
+    if n_labels == 1 or not mask.any():
+        return None
+    return dilate(mask.astype(uint8), ones((3, 3), uint8)) > 0
+
+
+def furniture_coverage(boxes: ndarray, furniture: ndarray, page: HtmlPage) -> ndarray:
+    """Fraction of the area of every box [x, y, width, height] in html
+    coordinates covered by the furniture mask of the page thumbnails"""
+    width, height = ceil(page.width), ceil(page.height)
+    mask = resize(furniture.astype(uint8), (width, height), interpolation=INTER_NEAREST)
+    table = integral(mask)  # (height + 1, width + 1) cumulative sums
+    x0 = boxes[:, 0].clip(0, width)
+    y0 = boxes[:, 1].clip(0, height)
+    x1 = (boxes[:, 0] + boxes[:, 2]).clip(0, width)
+    y1 = (boxes[:, 1] + boxes[:, 3]).clip(0, height)
+    covered = table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+    area = boxes[:, 2] * boxes[:, 3]
+    coverage = zeros(len(boxes), dtype=float64)
+    coverage[area > 0] = covered[area > 0] / area[area > 0]
+    return coverage
+
+
+def object_contours(boxes: ndarray, page: HtmlPage, scale=PNG_SCALE) -> ndarray:
+    """Contours of the graphics placed in the PDF, given as rows of [x, y,
+    width, height] in html coordinates. The boxes are painted on a canvas the
+    size of the page PNG and go through the same dilation and external
+    contours as detect_contours, so nearby drawings join in the same way."""
+    canvas = zeros((ceil(page.height * scale), ceil(page.width * scale)), uint8)
+    for x, y, width, height in (boxes * scale).tolist():
+        x0, y0 = int(x), int(y)
+        x1, y1 = max(ceil(x + width), x0 + 1), max(ceil(y + height), y0 + 1)
+        canvas[y0:y1, x0:x1] = 255
+    dilation = dilate(canvas, ones((5, 5), uint8), iterations=1)
+    return scaled_boxes(component_boxes(dilation), scale)
+
+
+def detect_contours(
+    base_folder_path: str,
+    page: HtmlPage,
+    engine: str = COMPONENTS,
+    pyramid_scale=1,
+    gray: Optional[Mat] = None,
+) -> ndarray:
+    """Bounding boxes of the graphical content in the page PNG, in html
+    coordinates, as rows of [x, y, width, height]. With a pyramid_scale of 2, 4
+    or 8, the content is found on the reduced page first (see pyramid_boxes).
+    Pass the page already read with page_gray as gray to avoid reading it again.
+    """
+    if engine not in CANDIDATE_ENGINES:
+        raise Exception(f"Candidate engine {engine} not supported")
+    if pyramid_scale != 1 and pyramid_scale not in PYRAMID_SCALES:
+        raise Exception(f"Pyramid scale {pyramid_scale} not supported")
+    if gray is None:
+        gray = page_gray(base_folder_path, page)
     # match PNG and html sizes
-    scaling = calc_scaling_factor(page_image, page.width, page.height)
-    # scaling = calc_scaling_factor(page_image, layout.width, layout.height)
+    scaling = calc_scaling_factor(gray, page.width, page.height)
+    if pyramid_scale != 1:
+        return scaled_boxes(pyramid_boxes(gray, pyramid_scale, engine), scaling)
 
-    _, thresh = threshold(page_image_gray, 240, 255, THRESH_BINARY_INV)
-    kernel = ones((5, 5), uint8)
-    dilation = dilate(thresh, kernel, iterations=1)
-    contours, _ = findContours(dilation, RETR_EXTERNAL, CHAIN_APPROX_SIMPLE)
+    # scaling = calc_scaling_factor(page_image, layout.width, layout.height)
+    boxes = graphics_boxes(gray, engine)
 
     # for cnt in contours:
     #     drawContours(canvas, [cnt], 0, 255, -1)
     # contours, _ = findContours(canvas, RETR_EXTERNAL, CHAIN_APPROX_SIMPLE)
 
+    return scaled_boxes(boxes, scaling)
+
+
+def cross_column_groups(
+    cnts: Union[BboxArray, List[Bbox]], x_cross: float, content_region: Bbox
+) -> List[List[int]]:
+    """For every contour crossing the column boundary x_cross, the indexes of
+    the contours in the same row of the content region, starting with the
+    crossing one. A contour belongs to the row when it overlaps the band
+    spanning the content region width and the crossing contour height, and
+    it is not equal to the crossing contour. Contours are indexed by their y
+    coordinate, so each row only looks at the contours starting above its
+    bottom and below its top minus the tallest contour height. Contours taller
+    than TALL_CONTOUR_RATIO of the content region are left out of the index
+    and tested against every row, so they do not widen the rows of the others.
+    """
+    if len(cnts) == 0:
+        return []
+    if not isinstance(cnts, BboxArray):
+        cnts = BboxArray.from_bboxes(cnts)
+    x0, y0, width, height = cnts.x, cnts.y, cnts.width, cnts.height
+    x1, y1 = cnts.x1, cnts.y1
+    # overlap with the band along x is the same for every row
+    cr_x1 = content_region.x + content_region.width
+    in_band = minimum(cr_x1, x1) - maximum(content_region.x, x0) > 0
+
+    band_idxs = nonzero(in_band)[0]
+    is_tall = height[band_idxs] > TALL_CONTOUR_RATIO * content_region.height
+    tall_idxs = band_idxs[is_tall]
+    band_idxs = band_idxs[~is_tall]
+    band_idxs = band_idxs[argsort(y0[band_idxs], kind="stable")]
+    band_ys = y0[band_idxs]
+    max_height = height[band_idxs].max() if len(band_idxs) > 0 else 0
+
+    groups = []
+    for i in nonzero((x0 < x_cross) & (x1 > x_cross))[0].tolist():
+        # rows overlap when y0[j] < y1[i] and y1[j] > y0[i]
+        start = searchsorted(band_ys, y0[i] - max_height, side="right")
+        end = searchsorted(band_ys, y1[i], side="left")
+        js = concatenate([band_idxs[start:end], tall_idxs])
+        js = js[
+            (minimum(y1[i], y1[js]) - maximum(y0[i], y0[js]) > 0)
+            & ~(
+                (x0[js] == x0[i])
+                & (y0[js] == y0[i])
+                & (width[js] == width[i])
+                & (height[js] == height[i])
+            )
+        ]
+        if len(js) > 0:
+            groups.append([i] + sorted(js.tolist()))
+    return groups
+
+
+def get_candidates(
+    base_folder_path: str,
+    page: HtmlPage,
+    layout: Layout,
+    captions: List[TextBox],
+    engine: str = COMPONENTS,
+    pyramid_scale=1,
+    furniture: Optional[ndarray] = None,
+    gray: Optional[Mat] = None,
+) -> Tuple[BboxArray, BboxArray, BboxArray]:
+    """Find every contour in the page that could represent a publication figure
+    or a section of a publication figure. Contours covered by the furniture
+    mask of the document (see furniture_mask) are left out. gray is the page
+    PNG if already read (see detect_contours)."""
+    LAYOUT_MARGIN = 10
+
+    if page.raw_contours is None:
+        page.raw_contours = detect_contours(
+            base_folder_path, page, engine, pyramid_scale, gray
+        )
+
+    boxes = BboxArray(page.raw_contours)
+    in_content = boxes.overlap_ratio(layout.content_region) > 0.75
+    if furniture is not None:
+        coverage = furniture_coverage(page.raw_contours, furniture, page)
+        in_content &= coverage < FURNITURE_COVERAGE
+    cnts = boxes[in_content]
+
     # merge contours based on multicolumn
-    cnts = [scaled_bbox(el, scaling) for el in contours]
-    cnts = [
-        cnt for cnt in cnts if overlap_ratio_based(cnt, layout.content_region) > 0.75
-    ]
-    orig_cnts = deepcopy(cnts)
+    orig_cnts = cnts
     if layout.num_cols == 2:
-        idxs_groups_merge = []
-        x_cross = layout.col_coords[1]
-        cr_width = layout.content_region.width
-        cr_x = layout.content_region.x
-
-        for i, cnt in enumerate(cnts):
-            if cnt.x < x_cross and cnt.x1 > x_cross:
-                idxs_merge = [i]
-                for j, cnt_eval in enumerate(cnts):
-                    if cnt != cnt_eval:
-                        row_region = Bbox(cr_x, cnt.y, cr_width, cnt.height)
-                        if row_region.intersect_area(cnt_eval) > 0:
-                            idxs_merge.append(j)
-                if len(idxs_merge) > 1:
-                    idxs_groups_merge.append(idxs_merge)
-
-        idxs_not_merge = [x for x in range(len(cnts))]
+        idxs_groups_merge = cross_column_groups(
+            cnts, layout.col_coords[1], layout.content_region
+        )
         affected_ids = [idx for group in idxs_groups_merge for idx in group]
-        idxs_not_merge = set(idxs_not_merge).difference(set(affected_ids))
-
-        merged_cnts = [cnts[i] for i in idxs_not_merge]
-        for idxs_group in idxs_groups_merge:
-            bboxes_to_merge = [cnts[i] for i in idxs_group]
-            merged_cnts.append(Bbox.merge_bboxes(bboxes_to_merge))
-        cnts = merged_cnts
+        # the contours not merged keep the iteration order of the set
+        idxs_not_merge = set(range(len(cnts))).difference(set(affected_ids))
+        idxs_not_merge = array(list(idxs_not_merge), dtype=int64)
+        merged_cnts = [cnts[idxs_group].merge() for idxs_group in idxs_groups_merge]
+        cnts = BboxArray.concat(
+            [cnts[idxs_not_merge], BboxArray.from_bboxes(merged_cnts)]
+        )
 
     # remove scaling here
-    candidate_bboxes = []  # for candidate figures or tables
-    for cnt in cnts:
-        for caption_box in captions:
-            intersect_bbox = caption_box.intersect(cnt)
-            if intersect_bbox is not None:
-                if cnt.x < caption_box.x:
-                    cnt.x1 = intersect_bbox.x
-                else:
-                    cnt.x = intersect_bbox.x1
-                cnt.update_width()
-
-        if (
-            cnt.y >= layout.content_region.y - LAYOUT_MARGIN
-            and cnt.height > layout.row_height
-        ):
-            candidate_bboxes.append(cnt)
-
-    return candidate_bboxes, cnts, orig_cnts
+    # trim the contours overlapping a caption, one caption at a time
+    x, x1 = cnts.x, cnts.x1
+    for caption_box in captions:
+        # Bbox.intersect of the caption with every contour
+        inter_x = maximum(caption_box.x, x)
+        inter_w = minimum(caption_box.x1, x1) - inter_x
+        inter_h = minimum(caption_box.y1, cnts.y1) - maximum(caption_box.y, cnts.y)
+        intersects = (inter_w >= 0) & (inter_h >= 0)
+        inter_x1 = inter_x + inter_w
+        x1 = where(intersects & (x < caption_box.x), inter_x, x1)
+        x = where(intersects & ~(x < caption_box.x), inter_x1, x)
+    if len(captions) > 0:
+        cnts = cnts.with_columns(x=x, x1=x1)
+
+    # candidate figures or tables
+    candidates = (cnts.y >= layout.content_region.y - LAYOUT_MARGIN) & (
+        cnts.height > layout.row_height
+    )
+    return cnts[candidates], cnts, orig_cnts
@@ -1,16 +1,30 @@
 import logging
+from collections import Counter
 from os import listdir, makedirs
 from pathlib import Path
-from typing import List, Union
+from types import GeneratorType
+from typing import Dict, Iterator, List, Optional, Union
 from math import ceil
 from json import dumps as json_dumps
-from shutil import rmtree
 from matplotlib.pyplot import subplots, savefig, close as plt_close
+from numpy import ndarray
 from PIL import Image as PILImage
 
-from pdfigcapx.models import Bbox, Figure, Layout
+from pdfigcapx.models import Bbox, BboxArray, Figure, Layout
 from pdfigcapx.page import HtmlPage
-from pdfigcapx.utils import launch_chromedriver, extract_page_text_content, pdf2html
+from pdfigcapx.utils import pdf2html, pdf2background_images
+from pdfigcapx.browser_pool import BrowserPool
+from pdfigcapx.measurement import MeasurementBackend, get_measurement_backend
+from pdfigcapx.ingestion import (
+    XPDF,
+    PDF,
+    INGESTION_BACKENDS,
+    extract_pdf_pages,
+    extract_graphics_boxes,
+)
+from pdfigcapx.artifacts import ensure_artifacts
+from pdfigcapx.page_cache import PageCache
+from pdfigcapx.layout_cache import LayoutTemplateCache
 from pdfigcapx.draw import (
     draw_bboxes,
     draw_content_region,
@@ -20,7 +34,11 @@ from pdfigcapx.draw import (
 import pdfigcapx.contours as cnt
 from pdfigcapx.sweep import sweep_regions
 import pdfigcapx.utils as utils
-from pdfigcapx.layout import LayoutBuilder
+from pdfigcapx.layout import (
+    IncrementalLayoutEstimator,
+    LayoutBuilder,
+    UnsupportedLayoutError,
+)
 
 
 def valid_file(filename: str):
@@ -33,9 +51,38 @@ def valid_image(filename: str):
     return filename.endswith(".png") and not filename.startswith(".")
 
 
+def _convert_to_html(pdf_path: Path, output_path: Path) -> None:
+    pdf2html(pdf_path, output_path.parent, output_path.name)
+
+
+def _render_background_images(pdf_path: Path, output_path: Path) -> None:
+    makedirs(output_path)
+    pdf2background_images(pdf_path, output_path)
+
+
 class Document:
     """Represents a PDF document with every associated HTML page, figures,
-    captions and bounding boxes
+    captions and bounding boxes. The pages are built by the ingestion backend,
+    "xpdf" or "pdf" (see pdfigcapx.ingestion). With xpdf, the text boxes are
+    measured with the measurement backend, "chrome" or "fonts" (see
+    pdfigcapx.measurement). Provide a browser_pool to reuse warm browsers
+    across documents; otherwise the chrome backend launches a browser for this
+    document only. Provide a page_cache to reuse the measured text boxes and
+    contours of pages already processed (see pdfigcapx.page_cache). A
+    pyramid_scale of 2, 4 or 8 finds the contours on the pages reduced by that
+    factor before refining them (see contours.pyramid_boxes). With the
+    "objects" candidate_source, the contours come from the images and vector
+    drawings placed in the PDF, falling back to the page PNGs for pages
+    without any. With remove_furniture, small or thin graphics repeated at the
+    same place on most pages (logos, running headers, footer rules), and those
+    outside the content region, are not candidates (see contours.furniture_mask).
+    With a layout_sample, the layout is estimated while the pages are measured
+    and fixed once stable within that many pages (see
+    layout.IncrementalLayoutEstimator), and documents with an unsupported
+    layout are abandoned without measuring the remaining pages. Provide a
+    layout_cache to take the layout of papers from known publisher templates
+    (see pdfigcapx.layout_cache). Provide the pdf_hash if the content hash of
+    the PDF is already known, to avoid reading the PDF again.
     """
 
     def __init__(
@@ -44,12 +91,42 @@ class Document:
         xpdf_base_path: str,
         data_path: str,
         include_first_page=False,
+        browser_pool: Optional[BrowserPool] = None,
+        measurement: Union[str, MeasurementBackend] = "chrome",
+        backend: str = XPDF,
+        page_cache: Optional[PageCache] = None,
+        pyramid_scale: int = 1,
+        candidate_source: str = cnt.RASTER,
+        remove_furniture: bool = False,
+        layout_sample: int = 0,
+        layout_cache: Optional[LayoutTemplateCache] = None,
+        pdf_hash: Optional[str] = None,
     ):
         self.pdf_path = Path(pdf_path)
         self.doc_name = self.pdf_path.stem
         self.include_first_page = include_first_page
         self.xpdf_base_path = Path(xpdf_base_path)
         self.data_path = Path(data_path)
+        self.browser_pool = browser_pool
+        if isinstance(measurement, str):
+            measurement = get_measurement_backend(measurement, browser_pool)
+        self.measurement = measurement
+        if backend not in INGESTION_BACKENDS:
+            raise Exception(f"Ingestion backend {backend} not supported")
+        self.backend = backend
+        self.page_cache = page_cache
+        self.pyramid_scale = pyramid_scale
+        self.contours_variant = "" if pyramid_scale == 1 else f".x{pyramid_scale}"
+        if candidate_source not in cnt.CANDIDATE_SOURCES:
+            raise Exception(f"Candidate source {candidate_source} not supported")
+        self.candidate_source = candidate_source
+        self.remove_furniture = remove_furniture
+        self.layout_sample = layout_sample
+        self.layout_cache = layout_cache
+        self.pdf_hash = pdf_hash
+        self.furniture: Optional[ndarray] = None
+        self.thumbnails: Dict[int, ndarray] = {}
+        self.metrics = Counter()
 
         self.pages: List[HtmlPage] = []
         self.layout: Layout = None
@@ -57,54 +134,121 @@ class Document:
         logging.info(f"{self.doc_name} starting process ${self.pdf_path}")
         self.transform_pdf()
         self.fetch_pages()
-        self.layout = LayoutBuilder.build(self.pages)
+        if self.layout is None:
+            self.layout = self._build_layout()
         # self.calculate_layout()
         self.expand_captions()
 
     def transform_pdf(self) -> None:
-        """Converts the PDF to HTML using xpdf"""
-        # print('START: transform_pdf')
+        """Converts the PDF to HTML using xpdf, or only renders the page
+        background images for the pdf backend. Artifacts are shared by every
+        PDF with the same content (see pdfigcapx.artifacts)."""
         if not self.xpdf_base_path.exists():
             makedirs(self.xpdf_base_path)
-        # print('self.xpdf_base_path', self.xpdf_base_path)
 
-        prefixed_name = f"xpdf_{self.doc_name}"
-        self.xpdf_path = self.xpdf_base_path / prefixed_name
-        # print('self.xpdf_path', self.xpdf_path)
-        if self.xpdf_path.exists():
-            logging.debug(f"attempting to reuse xpdf content {self.xpdf_path}")
+        if self.backend == PDF:
+            convert = _render_background_images
         else:
-            print('self.xpdf_path not exists')
-            print('self.pdf_path.resolve()', self.pdf_path.resolve())
-            print('self.xpdf_base_path.resolve()', self.xpdf_base_path.resolve())
-            print('prefixed_name', prefixed_name)
-            out_path = pdf2html(
-                self.pdf_path.resolve(), self.xpdf_base_path.resolve(), prefixed_name
-            )
-            # print('out_path', out_path)
-            self.xpdf_path = Path(out_path)
-            # print('self.xpdf_path', self.xpdf_path)
+            convert = _convert_to_html
+        self.xpdf_path, self.artifacts_reused = ensure_artifacts(
+            self.pdf_path,
+            self.xpdf_base_path,
+            self.backend,
+            convert,
+            digest=self.pdf_hash,
+        )
+        if self.artifacts_reused:
+            logging.debug(f"reusing artifacts {self.xpdf_path}")
 
     def fetch_pages(self) -> None:
-        """Parses the HTML pages using chromedriver to estimate sizes"""
-        # print('START: fetch_pages')
-        # print('self.xpdf_path', self.xpdf_path)
+        """Parses the HTML pages using the measurement backend to estimate sizes,
+        or reads the text lines from the PDF for the pdf backend. With a
+        layout_sample, the layout is estimated as the pages arrive."""
         names = [name for name in listdir(self.xpdf_path) if valid_file(name)]
-        browser = launch_chromedriver()
+        # in document order, so that the layout sample starts at the first page
+        names = utils.natural_sort(names)
+        page_paths = [(self.xpdf_path / page_name).resolve() for page_name in names]
+        estimator = None
+        if self.layout_sample > 0:
+            estimator = IncrementalLayoutEstimator(max_pages=self.layout_sample)
 
+        pages = []
         try:
-            pages = []
-            for page_name in names:
-                page_path = (self.xpdf_path / page_name).resolve()
-                page = extract_page_text_content(browser, page_path)
-                pages.append(page)
+            if self.backend == PDF:
+                pages = extract_pdf_pages(self.pdf_path.resolve())
+            elif self.page_cache is not None:
+                pages = self._fetch_cached_pages(page_paths)
+            else:
+                pages = self.measurement.extract_pages(page_paths)
+            self.pages = []
+            for page in pages:
+                self.pages.append(page)
+                if estimator is not None:
+                    self.layout = estimator.add_page(page)
+        except UnsupportedLayoutError:
+            # pylint: disable-next=line-too-long
+            message = f"{self.doc_name}: unsupported layout after measuring {len(self.pages)} pages"
+            logging.info(message)
+            raise
         except Exception as error:
             logging.error("Error parsing pages", exc_info=True)
             raise Exception(error) from error
         finally:
-            if browser:
-                browser.quit()
-        self.pages = sorted(pages, key=lambda x: x.number)
+            if isinstance(pages, GeneratorType):
+                pages.close()  # return the browser of abandoned measurements
+        self.pages = sorted(self.pages, key=lambda x: x.number)
+        if self.layout is not None:
+            self.metrics["layouts_sampled"] += 1
+            # pylint: disable-next=line-too-long
+            message = f"{self.doc_name}: layout fixed after sampling {len(estimator.pages)} pages"
+            logging.info(message)
+
+    def _build_layout(self) -> Layout:
+        """Layout of the known template of the document if any, otherwise
+        computed from every page and recorded in the layout cache"""
+        if self.layout_cache is None:
+            return LayoutBuilder.build(self.pages)
+        key = self.layout_cache.fingerprint(self.pages)
+        if key is None:
+            return LayoutBuilder.build(self.pages)
+        layout = self.layout_cache.load(key, self.pages)
+        if layout is not None:
+            self.metrics["layout_cache_hits"] += 1
+            return layout
+        self.metrics["layout_cache_misses"] += 1
+        layout = LayoutBuilder.build(self.pages)
+        self.layout_cache.save(key, layout)
+        return layout
+
+    def _fetch_cached_pages(self, page_paths: List[Path]) -> Iterator[HtmlPage]:
+        """Yields the pages in the order of page_paths, taken from the page
+        cache or measured. The missing pages go through a single measurement,
+        consumed as they come up, so that a browser is borrowed once."""
+        keys, cached = [], []
+        for page_path in page_paths:
+            key = self.page_cache.key(
+                page_path, page_path.with_suffix(".png"), self.measurement.name
+            )
+            keys.append(key)
+            cached.append(
+                self.page_cache.load_page(key, page_path, self.contours_variant)
+            )
+
+        missing = [el for el, page in zip(page_paths, cached) if page is None]
+        measured = iter(self.measurement.extract_pages(missing))
+        try:
+            for idx, key in enumerate(keys):
+                page, cached[idx] = cached[idx], None
+                if page is not None:
+                    self.metrics["page_cache_hits"] += 1
+                else:
+                    page = next(measured)
+                    self.page_cache.save_page(key, page)
+                    self.metrics["page_cache_misses"] += 1
+                yield page
+        finally:
+            if isinstance(measured, GeneratorType):
+                measured.close()  # return the browser of abandoned measurements
 
     def _log_no_captions_found(self):
         message = f"%s{self.doc_name}: no captions found"
@@ -133,11 +277,13 @@ class Document:
         """
         pages = []
         pages = self.pages if self.include_first_page else self.pages[1:]
+        if self.candidate_source == cnt.OBJECTS:
+            self._place_object_contours(pages)
+        if self.remove_furniture:
+            self._find_furniture(pages)
 
         for idx, page in enumerate(pages):
-            candidates, _, _ = cnt.get_candidates(
-                str(self.xpdf_path), page, self.layout, page.captions
-            )
+            candidates = self._page_candidates(page)
             # match captions with candidates, assigned captions become figures
             if len(page.captions) > 0:
                 if len(candidates) > 0:
@@ -153,11 +299,119 @@ class Document:
                     )
                     if candidates is not None:
                         # caption not found on next page, save as orphan image
-                        bbox = Bbox.merge_bboxes(candidates)
+                        bbox = candidates.merge()
                         figure = Figure(bbox, True, None, "orphan")
                         figure.identifier = ""
                         page.figures.append(figure)
 
+        self._log_skipped_pages(len(pages))
+
+    def release_text_boxes(self) -> None:
+        """Free the text boxes of every page once the figures are extracted.
+        The captions and figures are kept, but drawing the text regions is no
+        longer possible."""
+        for page in self.pages:
+            page.release_text_boxes()
+
+    def _place_object_contours(self, pages: List[HtmlPage]) -> None:
+        """Use the images and vector drawings placed in the PDF as the raw
+        contours of the pages. Pages without any keep the raster contours, as
+        does every page when pdfminer is missing or cannot read the PDF."""
+        try:
+            graphics = extract_graphics_boxes(self.pdf_path.resolve())
+        # pylint: disable-next=broad-exception-caught
+        except Exception:
+            # e.g., syntax errors, encrypted files or truncated streams
+            logging.warning("%s: no object candidates", self.doc_name, exc_info=True)
+            self.metrics["documents_object_candidates_failed"] += 1
+            return
+        for page in pages:
+            boxes = graphics.get(page.number)
+            if boxes is not None and len(boxes) > 0:
+                page.raw_contours = cnt.object_contours(boxes, page)
+                page.has_graphics = True
+                self.metrics["pages_object_candidates"] += 1
+
+    def _find_furniture(self, pages: List[HtmlPage]) -> None:
+        """Compute the page thumbnails and the furniture mask of the document.
+        Pages with known contours are not read, their thumbnail is painted
+        from the contours. Every other page is read once: pages without ink
+        have no graphics, and the contours of the rest are found on the same
+        image."""
+        self.thumbnails = {}
+        for page in pages:
+            if page.raw_contours is not None:
+                thumbnail = cnt.contours_thumbnail(str(self.xpdf_path), page)
+                self.thumbnails[page.number] = thumbnail
+                continue
+            gray = cnt.page_gray(str(self.xpdf_path), page)
+            thumbnail = cnt.reduced_gray(gray, cnt.THUMBNAIL_SCALE)
+            self.thumbnails[page.number] = thumbnail
+            if cnt.has_graphics(str(self.xpdf_path), page, thumbnail):
+                self._detect_contours(page, gray)
+            else:
+                page.has_graphics = False
+        self.furniture = cnt.furniture_mask(list(self.thumbnails.values()), self.layout)
+        if self.furniture is not None:
+            self.metrics["documents_with_furniture"] += 1
+            message = f"{self.doc_name}: furniture mask of {self.furniture.sum()} cells"
+            logging.info(message)
+
+    def _page_furniture(self, page: HtmlPage) -> Optional[ndarray]:
+        """Furniture mask for the page, None if the page size differs"""
+        thumbnail = self.thumbnails.get(page.number)
+        if self.furniture is None or thumbnail is None:
+            return None
+        return self.furniture if thumbnail.shape == self.furniture.shape else None
+
+    def _page_candidates(self, page: HtmlPage) -> BboxArray:
+        """Candidate figure regions in the page. Pages without graphical content
+        in their thumbnail skip the contour analysis. The page PNG is read at
+        most once, for the thumbnail and the contours."""
+        furniture = self._page_furniture(page)
+        gray = None
+        if page.has_graphics is None:
+            thumbnail = self.thumbnails.get(page.number)
+            if thumbnail is None and page.raw_contours is None:
+                gray = cnt.page_gray(str(self.xpdf_path), page)
+                thumbnail = cnt.reduced_gray(gray, cnt.THUMBNAIL_SCALE)
+            page.has_graphics = cnt.has_graphics(
+                str(self.xpdf_path), page, thumbnail, furniture
+            )
+        if not page.has_graphics:
+            self.metrics["pages_skipped"] += 1
+            return BboxArray([])
+
+        self._detect_contours(page, gray)
+        candidates, _, _ = cnt.get_candidates(
+            str(self.xpdf_path),
+            page,
+            self.layout,
+            page.captions,
+            pyramid_scale=self.pyramid_scale,
+            furniture=furniture,
+        )
+        return candidates
+
+    def _detect_contours(self, page: HtmlPage, gray: Optional[ndarray] = None):
+        """Find the raw contours of the page, unless known, and save them in the
+        page cache. gray is the page PNG if already read."""
+        if page.raw_contours is not None:
+            return
+        page.raw_contours = cnt.detect_contours(
+            str(self.xpdf_path), page, pyramid_scale=self.pyramid_scale, gray=gray
+        )
+        if self.page_cache is not None and page.cache_key:
+            self.page_cache.save_contours(
+                page.cache_key, page.raw_contours, self.contours_variant
+            )
+
+    def _log_skipped_pages(self, total_pages: int):
+        skipped = self.metrics["pages_skipped"]
+        # pylint: disable-next=line-too-long
+        message = f"{self.doc_name}: skipped {skipped} of {total_pages} pages without graphics"
+        logging.info(message)
+
     def _log_captions_without_candidates(self, page):
         message = f"{self.doc_name} - pg.{page.number}: captions have no candidates"
         logging.info(message)
@@ -171,13 +425,13 @@ class Document:
         self,
         pages: List[HtmlPage],
         page_idx: int,
-        candidates: List[Bbox],
+        candidates: BboxArray,
         min_orphan_size: int,
-    ) -> List[Bbox]:
+    ) -> Optional[BboxArray]:
         if page_idx == len(pages) - 1:
             # last page can't have caption on next page
             return candidates
-        bbox = Bbox.merge_bboxes(candidates)
+        bbox = candidates.merge()
         if bbox.area() < min_orphan_size:
             # candidates too small, discard
             return None
@@ -251,21 +505,19 @@ class Document:
             savefig(output_path, dpi=1200)
         plt_close(fig)  # close to avoid memory leak
 
-    def _fetch_pages_as_images(self, dpi=300) -> list[PILImage.Image]:
-        """Return PDF pages as PIL Images"""
-        output_folder = self.data_path / f"{self.doc_name}_images"
-        makedirs(output_folder, exist_ok=True)
-        utils.pdf2images(self.pdf_path.resolve(), output_folder.resolve(), dpi=dpi)
-        filenames = listdir(output_folder)
-        image_names = [x for x in filenames if valid_image(x)]
-        image_names = utils.natural_sort(image_names)
-        images = []
-        for image_name in image_names:
-            pil_image = PILImage.open(output_folder / image_name).convert("RGB")
-            pil_image.load()  # load into memory (also closes the file associated)
-            images.append(pil_image)
-        rmtree(output_folder)
-        return images
+    def _fetch_pages_as_images(
+        self, dpi=300, page_numbers: Optional[List[int]] = None, workers=1
+    ) -> Iterator[PILImage.Image]:
+        """Yield the PDF pages as RGB PIL Images in page order, rendered by up to
+        `workers` ghostscript processes. Only the pages in page_numbers are
+        rendered when given."""
+        return utils.stream_pdf_images_parallel(
+            self.pdf_path.resolve(), dpi=dpi, pages=page_numbers, workers=workers
+        )
+
+    def _export_plan(self) -> List[HtmlPage]:
+        """Pages with figures to export, in page order"""
+        return [page for page in self.pages if len(page.figures) > 0]
 
     def _fig_name(self, prefix: Union[str, None], page: HtmlPage, fig_idx: int) -> str:
         """naming convention for saving figure data"""
@@ -294,40 +546,61 @@ class Document:
     #             extracted_fig.close()
 
     # 몇 퍼 더 키운거
-    def save_images(self, dpi=300, prefix=None, scale_percentage=5.5):
-        """Save extracted images to disk"""
-        pil_images = self._fetch_pages_as_images(dpi)
-        for page, pil_image in zip(self.pages, pil_images):
-            scale = float(pil_image.size[0]) / self.layout.width
-
-            for idx, fig in enumerate(page.figures):
-                # 원래 좌표
-                x0 = fig.bbox.x * scale
-                y0 = fig.bbox.y * scale
-                x1 = fig.bbox.x1 * scale
-                y1 = fig.bbox.y1 * scale
-
-                # 너비 높이
-                width = x1 - x0
-                height = y1 - y0
-
-                # 비율 계산
-                delta_w = width * (scale_percentage / 100.)
-                delta_h = height * (scale_percentage / 100.)
-
-                # 조정 좌표
-                crop_box = [
-                    x0 - delta_w,
-                    y0 - delta_h,
-                    x1 + delta_w,
-                    y1 + delta_h,
-                ]
-
-                extracted_fig = pil_image.crop(crop_box)
-                fig_name = self._fig_name(prefix, page, idx)
-                fig_path = self.data_path / fig_name
-                extracted_fig.save(fig_path)
-                extracted_fig.close()
+    def save_images(self, dpi=300, prefix=None, scale_percentage=5.5, workers=1):
+        """Save extracted images to disk. Only the pages with figures are
+        rendered, using up to `workers` ghostscript processes, and they are
+        cropped one at a time in page order, so only a few page images are in
+        memory regardless of the page count"""
+        pages = self._export_plan()
+        if len(pages) == 0:
+            return
+        page_numbers = [page.number for page in pages]
+        pil_images = self._fetch_pages_as_images(dpi, page_numbers, workers)
+        try:
+            for page, pil_image in zip(pages, pil_images):
+                self._save_page_images(page, pil_image, prefix, scale_percentage)
+                pil_image.close()
+        finally:
+            pil_images.close()  # stops ghostscript when not every page is read
+
+    def _save_page_images(
+        self,
+        page: HtmlPage,
+        pil_image: PILImage.Image,
+        prefix: Union[str, None],
+        scale_percentage: float,
+    ) -> None:
+        """Crop and save the figures of the page"""
+        scale = float(pil_image.size[0]) / self.layout.width
+
+        for idx, fig in enumerate(page.figures):
+            # 원래 좌표
+            x0 = fig.bbox.x * scale
+            y0 = fig.bbox.y * scale
+            x1 = fig.bbox.x1 * scale
+            y1 = fig.bbox.y1 * scale
+
+            # 너비 높이
+            width = x1 - x0
+            height = y1 - y0
+
+            # 비율 계산
+            delta_w = width * (scale_percentage / 100.)
+            delta_h = height * (scale_percentage / 100.)
+
+            # 조정 좌표
+            crop_box = [
+                x0 - delta_w,
+                y0 - delta_h,
+                x1 + delta_w,
+                y1 + delta_h,
+            ]
+
+            extracted_fig = pil_image.crop(crop_box)
+            fig_name = self._fig_name(prefix, page, idx)
+            fig_path = self.data_path / fig_name
+            extracted_fig.save(fig_path)
+            extracted_fig.close()
 
     def export_metadata(self, prefix: None):
         """Export extracted metadata to disk"""
@@ -367,7 +640,12 @@ class Document:
 
         for idx, page in enumerate(pages):
             candidates, cnts, orig_cnts = cnt.get_candidates(
-                str(self.xpdf_path), page, self.layout, page.captions
+                str(self.xpdf_path),
+                page,
+                self.layout,
+                page.captions,
+                pyramid_scale=self.pyramid_scale,
+                furniture=self._page_furniture(page),
             )
             col = idx % n_cols
             row = int(idx / n_cols)
@@ -0,0 +1,163 @@
+""" Ingestion backends turning a PDF into HtmlPage objects.
+- xpdf: pdftohtml writes one html page and one background PNG per PDF page.
+  The text boxes are then measured with a measurement backend.
+- pdf: the text lines are read straight from the PDF content stream with
+  pdfminer.six, and ghostscript renders the background images without text.
+  No html pages or browser are involved.
+Both backends produce pages in the pdftohtml coordinate system: pixels at 72
+dpi with the origin at the top left corner of the page crop box.
+The placements of the images and vector drawings in the PDF can also be read
+with extract_graphics_boxes to find figure candidates without the page PNGs.
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from numpy import array, float64, ndarray
+
+from pdfigcapx.page import HtmlPage
+from pdfigcapx.utils import build_html_page
+
+XPDF = "xpdf"
+PDF = "pdf"
+INGESTION_BACKENDS = [XPDF, PDF]
+
+MISSING_PDFMINER = (
+    "the pdf ingestion backend requires pdfminer.six: pip install pdfminer.six"
+)
+
+# graphics covering this fraction of the page are backgrounds, not figures
+BACKGROUND_RATIO = 0.9
+
+
+def _page_layouts(
+    pdf_path: Union[str, Path], analyze_text=True
+) -> Iterator[Tuple[object, object]]:
+    """Yield every pdfminer page with its layout. Text lines are only grouped
+    when analyze_text is set."""
+    try:
+        # pylint: disable=import-outside-toplevel
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+    except ImportError as error:
+        raise ImportError(MISSING_PDFMINER) from error
+
+    resource_manager = PDFResourceManager()
+    laparams = LAParams() if analyze_text else None
+    device = PDFPageAggregator(resource_manager, laparams=laparams)
+    interpreter = PDFPageInterpreter(resource_manager, device)
+    with open(pdf_path, "rb") as f_in:
+        for pdf_page in PDFPage.get_pages(f_in):
+            interpreter.process_page(pdf_page)
+            yield pdf_page, device.get_result()
+
+
+def _text_lines(layout_obj) -> Iterator[object]:
+    """Traverse the layout in reading order and yield the horizontal text lines"""
+    # pylint: disable=import-outside-toplevel
+    from pdfminer.layout import LTTextLineHorizontal
+
+    for child in layout_obj:
+        if isinstance(child, LTTextLineHorizontal):
+            yield child
+        elif hasattr(child, "__iter__"):
+            yield from _text_lines(child)
+
+
+def page_transform(pdf_page, layout) -> Tuple[float, float, float, float]:
+    """Offsets and size to move pdfminer coordinates (origin at the bottom left
+    of the media box) to pdftohtml coordinates (origin at the top left of the
+    crop box). Returns (x_offset, y_top, width, height)."""
+    x0, y0, x1, y1 = layout.bbox
+    if pdf_page.rotate % 360 == 0 and pdf_page.cropbox is not None:
+        media_x0, media_y0 = pdf_page.mediabox[0], pdf_page.mediabox[1]
+        crop_x0, crop_y0, crop_x1, crop_y1 = pdf_page.cropbox
+        x0, y0 = crop_x0 - media_x0, crop_y0 - media_y0
+        x1, y1 = crop_x1 - media_x0, crop_y1 - media_y0
+    return x0, y1, x1 - x0, y1 - y0
+
+
+def extract_pdf_pages(pdf_path: Union[str, Path]) -> List[HtmlPage]:
+    """Build the document pages from the text lines in the PDF content stream.
+    Every text line becomes a text box, similar to a div in pdftohtml pages,
+    and the pages point to the background images named page1.png, page2.png,
+    etc.
+    """
+    pages = []
+    for number, (pdf_page, layout) in enumerate(_page_layouts(pdf_path), start=1):
+        x_offset, y_top, width, height = page_transform(pdf_page, layout)
+        boxes = [
+            (
+                line.x0 - x_offset,
+                y_top - line.y1,
+                line.width,
+                line.height,
+                line.get_text().rstrip("\n"),
+            )
+            for line in _text_lines(layout)
+        ]
+        page = build_html_page(f"page{number}.html", round(width), round(height), boxes)
+        pages.append(page)
+    return pages
+
+
+def _graphics_objects(
+    layout_obj, is_background: Callable[[object], bool]
+) -> Iterator[object]:
+    """Yield the placed images, form XObjects and vector paths in the layout.
+    Form XObjects are yielded whole instead of their content, except for
+    backgrounds, e.g., a form wrapping the whole page in stamped PDFs or in
+    pages imported by pdfTeX, whose content is yielded instead."""
+    # pylint: disable=import-outside-toplevel
+    from pdfminer.layout import LTCurve, LTFigure, LTImage
+
+    for child in layout_obj:
+        if isinstance(child, LTFigure) and is_background(child):
+            yield from _graphics_objects(child, is_background)
+        elif isinstance(child, (LTFigure, LTImage, LTCurve)):
+            yield child
+        elif hasattr(child, "__iter__"):
+            yield from _graphics_objects(child, is_background)
+
+
+def _page_box(
+    obj, transform: Tuple[float, float, float, float]
+) -> Optional[List[float]]:
+    """Box [x, y, width, height] of the layout object in pdftohtml coordinates
+    clipped to the page, None when the object lies outside the page"""
+    x_offset, y_top, width, height = transform
+    x0, x1 = obj.x0 - x_offset, obj.x1 - x_offset
+    y0, y1 = y_top - obj.y1, y_top - obj.y0
+    if x1 <= 0 or y1 <= 0 or x0 >= width or y0 >= height:
+        return None
+    x0, x1 = max(x0, 0), min(x1, width)
+    y0, y1 = max(y0, 0), min(y1, height)
+    return [x0, y0, x1 - x0, y1 - y0]
+
+
+def extract_graphics_boxes(pdf_path: Union[str, Path]) -> Dict[int, ndarray]:
+    """Bounding boxes of the images and vector drawings of every page, by page
+    number, in pdftohtml coordinates as rows of [x, y, width, height]. Boxes
+    are clipped to the page, and page backgrounds and graphics outside the
+    page are left out.
+    """
+    graphics = {}
+    pages = _page_layouts(pdf_path, analyze_text=False)
+    for number, (pdf_page, layout) in enumerate(pages, start=1):
+        transform = page_transform(pdf_page, layout)
+        background_area = BACKGROUND_RATIO * transform[2] * transform[3]
+
+        def is_background(obj, transform=transform, area=background_area):
+            box = _page_box(obj, transform)
+            return box is not None and box[2] * box[3] >= area
+
+        boxes = []
+        for obj in _graphics_objects(layout, is_background):
+            box = _page_box(obj, transform)
+            if box is None or box[2] * box[3] >= background_area:
+                continue
+            if box[2] > 0 or box[3] > 0:
+                boxes.append(box)
+        graphics[number] = array(boxes, dtype=float64).reshape(-1, 4)
+    return graphics
@@ -1,7 +1,135 @@
 from pdfigcapx.models import Bbox, Layout
 from pdfigcapx.page import HtmlPage
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from math import floor
+from bisect import bisect_left, bisect_right
+from numpy import argmax, argmin, argsort, array, flatnonzero, float64, ndarray, unique
+
+
+# pages measured before the first layout estimate of a sample
+LAYOUT_MIN_PAGES = 3
+# consecutive equal estimates to fix the layout of a sample
+LAYOUT_STABLE_ESTIMATES = 3
+
+
+class UnsupportedLayoutError(Exception):
+    """The document has a number of columns other than one or two"""
+
+    def __init__(self, num_cols: int):
+        super().__init__(
+            f"The document has {num_cols} columns. We only support a maximum of two."
+        )
+        self.num_cols = num_cols
+
+
+class TextBoxCoords:
+    """Coordinates of every text box in the document, gathered once so that
+    the layout statistics are computed with array operations instead of walking
+    the pages for every statistic. The measured values are kept next to the
+    arrays, and the statistics return them, so the layout keeps the exact
+    values and types measured by the browser.
+    """
+
+    FIELDS = ("x", "y", "width", "height", "x1", "y1")
+
+    def __init__(self, pages: List[HtmlPage]):
+        boxes = [tb for page in pages for tb in page.text_boxes]
+        self.values: Dict[str, list] = {
+            field: [getattr(tb, field) for tb in boxes] for field in self.FIELDS
+        }
+        self.arrays: Dict[str, ndarray] = {
+            field: array(values, dtype=float64) for field, values in self.values.items()
+        }
+
+    def _select(self, field: str, mask: Optional[ndarray]):
+        """Field values selected by mask and their positions, if masked"""
+        if mask is None:
+            return self.arrays[field], None
+        idxs = flatnonzero(mask)
+        return self.arrays[field][idxs], idxs
+
+    def _value(self, field: str, idxs: Optional[ndarray], idx: int):
+        return self.values[field][int(idx if idxs is None else idxs[idx])]
+
+    def value_counts(self, field: str, mask: Optional[ndarray] = None) -> list:
+        """Same pairs in the same order as [(i, xs.count(i)) for i in set(xs)],
+        with xs the field values selected by mask, so that sorting by count
+        breaks ties exactly as before."""
+        values, idxs = self._select(field, mask)
+        if len(values) == 0:
+            return []
+        _, first, counts = unique(values, return_index=True, return_counts=True)
+        order = argsort(first)
+        # a set built from the distinct values in order of first occurrence
+        # iterates like the set built from all the values
+        distinct = [self._value(field, idxs, i) for i in first[order].tolist()]
+        counts = dict(zip(distinct, counts[order].tolist()))
+        return [(i, counts[i]) for i in set(distinct)]
+
+    def min(self, field: str, mask: Optional[ndarray] = None):
+        values, idxs = self._select(field, mask)
+        return self._value(field, idxs, argmin(values))
+
+    def max(self, field: str, mask: Optional[ndarray] = None):
+        values, idxs = self._select(field, mask)
+        return self._value(field, idxs, argmax(values))
+
+
+def cluster_points(
+    points: List[Tuple[float, int]], padding_threshold=10
+) -> List[Tuple[float, int]]:
+    """Merge the (x, count) points within the padding threshold of a more
+    frequent point, e.g., text starting at a column with and without
+    indentation or a few pixels off due to the html conversion. The points are
+    sorted by x once, and every point, from the most to the least frequent,
+    takes the window of remaining points within the threshold in one sweep,
+    skipping the points already merged.
+    Parameters:
+    ----------
+    - points: list of (x, count), ties in count are broken by list order
+    - padding_threshold: max distance to the most frequent point in a cluster
+    returns:
+    - list of (x, total count) per cluster sorted by total count, where x is
+        the coordinate of the most frequent point in the cluster
+    """
+    by_x = sorted(range(len(points)), key=lambda idx: points[idx][0])
+    xs = [points[idx][0] for idx in by_x]
+    rank = [0] * len(points)
+    for pos, idx in enumerate(by_x):
+        rank[idx] = pos
+    # next position not merged yet, with path halving
+    next_pos = list(range(len(points) + 1))
+
+    def find(pos: int) -> int:
+        while next_pos[pos] != pos:
+            next_pos[pos] = next_pos[next_pos[pos]]
+            pos = next_pos[pos]
+        return pos
+
+    clusters = []
+    for idx in sorted(range(len(points)), key=lambda idx: points[idx][1], reverse=True):
+        if find(rank[idx]) != rank[idx]:
+            continue  # merged into a more frequent point
+        x, total = points[idx]
+        lo = bisect_left(xs, x - padding_threshold)
+        hi = bisect_right(xs, x + padding_threshold)
+        # keep the exact float comparison at the window edges
+        while lo > 0 and abs(x - xs[lo - 1]) <= padding_threshold:
+            lo -= 1
+        while lo < hi and abs(x - xs[lo]) > padding_threshold:
+            lo += 1
+        while hi < len(xs) and abs(x - xs[hi]) <= padding_threshold:
+            hi += 1
+        while hi > lo and abs(x - xs[hi - 1]) > padding_threshold:
+            hi -= 1
+        pos = find(lo)
+        while pos < hi:
+            if pos != rank[idx]:
+                total += points[by_x[pos]][1]
+            next_pos[pos] = pos + 1
+            pos = find(pos + 1)
+        clusters.append((x, total))
+    return sorted(clusters, key=lambda x: x[1], reverse=True)
 
 
 class LayoutBuilder:
@@ -9,16 +137,15 @@ class LayoutBuilder:
         layout = LayoutBuilder._calculate_layout(pages, threshold=min_width)
         return layout
 
-    def _calculate_row_size(pages: List[HtmlPage], threshold=30) -> Tuple[int, int]:
-        widths = [y.width for x in pages for y in x.text_boxes if y.width > threshold]
-        heights = [y.height for x in pages for y in x.text_boxes if y.width > threshold]
+    def _calculate_row_size(coords: TextBoxCoords, threshold=30) -> Tuple[int, int]:
+        wide = coords.arrays["width"] > threshold
         sorted_widths = sorted(
-            [(i, widths.count(i)) for i in set(widths)],
+            coords.value_counts("width", wide),
             key=lambda x: (x[1], x[0]),
             reverse=True,
         )
         sorted_heights = sorted(
-            [(i, heights.count(i)) for i in set(heights)],
+            coords.value_counts("height", wide),
             key=lambda x: x[1],
             reverse=True,
         )
@@ -48,67 +175,47 @@ class LayoutBuilder:
         sorted_points: list[tuple[int, int]], padding_threshold=10
     ) -> list[tuple[int, int]]:
         """Update the sorted counts by merging padded text elements"""
-        left_points = sorted_points.copy()
-        i = 0
-        while i < len(left_points):
-            j = i + 1
-            while j < len(left_points):
-                if abs(left_points[i][0] - left_points[j][0]) <= padding_threshold:
-                    left_points[i] = (
-                        left_points[i][0],
-                        left_points[i][1] + left_points[j][1],
-                    )
-                    del left_points[j]
-                else:
-                    j = j + 1
-            i = i + 1
-        return sorted(left_points, key=lambda x: x[1], reverse=True)
+        return cluster_points(sorted_points, padding_threshold)
 
     def _find_content_region(
-        pages: List[HtmlPage], main_size: Tuple[int, int], threshold=30
+        coords: TextBoxCoords, main_size: Tuple[int, int], threshold=30
     ):
         """
         There may be a case when there are more rows on the right side, so use page_width to filter
         """
         page_width, page_height = main_size
-        x0s = [
-            y.x
-            for x in pages
-            for y in x.text_boxes
-            if y.width > threshold and y.x < page_width / 2
-        ]
-        y0s = [y.y for x in pages for y in x.text_boxes if y.width > threshold]
-        x1s = [y.x1 for x in pages for y in x.text_boxes if y.width > threshold]
+        xs, x1s = coords.arrays["x"], coords.arrays["x1"]
+        ys, y1s = coords.arrays["y"], coords.arrays["y1"]
+        wide = coords.arrays["width"] > threshold
         sorted_x0s = sorted(
-            [(i, x0s.count(i)) for i in set(x0s)], key=lambda x: x[1], reverse=True
+            coords.value_counts("x", wide & (xs < page_width / 2)),
+            key=lambda x: x[1],
+            reverse=True,
         )
         sorted_x0s = LayoutBuilder._merge_left_padded_points(sorted_x0s)
 
         # content region
         cr_x0 = sorted_x0s[0][0]
-        cr_y0 = max(0, min(y0s))
+        cr_y0 = max(0, coords.min("y", wide))
         # The converted html file may have some overflowing divs due to conversion
         # errors. In case of overflow, assume a similar padding like the left side
-        cr_x1 = min(page_width - cr_x0, max(x1s))
-
-        cand_y1s = [  # y1s constrained to other three coordinates and page height
-            y.y1
-            for x in pages
-            for y in x.text_boxes
-            if y.x >= cr_x0 and y.x1 <= cr_x1 and y.y >= cr_y0 and y.y1 <= page_height
-        ]
-        if len(cand_y1s) == 0:
+        cr_x1 = min(page_width - cr_x0, coords.max("x1", wide))
+
+        # y1s constrained to other three coordinates and page height
+        cand_y1s = (xs >= cr_x0) & (x1s <= cr_x1) & (ys >= cr_y0) & (y1s <= page_height)
+        if not cand_y1s.any():
             raise Exception("could not find a suitable y1 for content region")
 
-        cr_y1 = max(cand_y1s)
+        cr_y1 = coords.max("y1", cand_y1s)
         cr = {"x": cr_x0, "y": cr_y0, "width": cr_x1 - cr_x0, "height": cr_y1 - cr_y0}
         return Bbox(**cr)
 
     def _calculate_layout(pages: List[HtmlPage], threshold):
-        row_width, row_height = LayoutBuilder._calculate_row_size(pages, threshold)
+        coords = TextBoxCoords(pages)
+        row_width, row_height = LayoutBuilder._calculate_row_size(coords, threshold)
         width, height = LayoutBuilder._calc_main_content_page_size(pages)
         content_region = LayoutBuilder._find_content_region(
-            pages, (width, height), threshold
+            coords, (width, height), threshold
         )
 
         # number of columns
@@ -119,30 +226,23 @@ class LayoutBuilder:
             # safety check for one column papers with the column not occupying
             # the whole width -> this is a workaround for PlosOne papers
             if content_region.x > width / 4:
-                left_most_x = sorted([el.x for x in pages for el in x.text_boxes])
-                right_most_x = sorted(
-                    [el.x1 for x in pages for el in x.text_boxes],
-                    reverse=True,
+                content_region = content_region.with_edges(
+                    x=coords.min("x"), x1=coords.max("x1")
                 )
-                content_region.x = left_most_x[0]
-                content_region.x1 = right_most_x[0]
-                content_region.update_width()
             col_coords = [content_region.x]
         elif number_cols == 2:
-            x1s = [
-                y.x
-                for x in pages
-                for y in x.text_boxes
-                if y.x >= content_region.x + row_width
-            ]
             x1s = sorted(
-                [(i, x1s.count(i)) for i in set(x1s)], key=lambda x: x[1], reverse=True
+                coords.value_counts(
+                    "x", coords.arrays["x"] >= content_region.x + row_width
+                ),
+                key=lambda x: x[1],
+                reverse=True,
             )
+            # like the left side, the second column can be padded
+            x1s = cluster_points(x1s)
             col_coords = [content_region.x, x1s[0][0]]
         else:
-            raise Exception(
-                f"The document has {number_cols} columns. We only support a maximum of two."
-            )
+            raise UnsupportedLayoutError(number_cols)
 
         return Layout(
             width=width,
@@ -153,3 +253,76 @@ class LayoutBuilder:
             num_cols=number_cols,
             col_coords=col_coords,
         )
+
+
+class IncrementalLayoutEstimator:
+    """Estimates the layout while the pages are measured, one page at a time.
+    From LAYOUT_MIN_PAGES pages on, every new page updates the estimate on the
+    pages seen so far. Once LAYOUT_STABLE_ESTIMATES consecutive estimates are
+    equal, the layout is fixed and later pages are ignored. If the stable
+    estimate has an unsupported number of columns, add_page raises
+    UnsupportedLayoutError so the document can be abandoned before measuring
+    the remaining pages.
+    Parameters:
+    ----------
+    - max_pages: pages in the sample. Without a stable estimate by then, the
+        layout is not fixed and should be built from every page
+    - min_width: min width of the text boxes used for the row size
+    """
+
+    def __init__(self, max_pages=12, min_width=30):
+        self.max_pages = max_pages
+        self.min_width = min_width
+        self.pages: List[HtmlPage] = []
+        self.layout: Optional[Layout] = None
+        self.estimate = None  # last Layout or UnsupportedLayoutError estimated
+        self.stable_estimates = 0
+
+    @property
+    def confidence(self) -> float:
+        """Share of the consecutive equal estimates needed to fix the layout"""
+        return min(1.0, self.stable_estimates / LAYOUT_STABLE_ESTIMATES)
+
+    @property
+    def done(self) -> bool:
+        """Whether the layout is fixed or the sample is exhausted"""
+        return self.layout is not None or len(self.pages) >= self.max_pages
+
+    def add_page(self, page: HtmlPage) -> Optional[Layout]:
+        """Update the estimate with the page and return the fixed layout, if any"""
+        if self.done:
+            return self.layout
+        self.pages.append(page)
+        if len(self.pages) < LAYOUT_MIN_PAGES:
+            return None
+
+        estimate = self._estimate()
+        if estimate is not None and self._same_estimate(estimate, self.estimate):
+            self.stable_estimates += 1
+        else:
+            self.stable_estimates = 1 if estimate is not None else 0
+        self.estimate = estimate
+
+        if self.confidence == 1.0:
+            if isinstance(estimate, UnsupportedLayoutError):
+                raise estimate
+            self.layout = estimate
+        return self.layout
+
+    def _estimate(self):
+        try:
+            return LayoutBuilder.build(self.pages, min_width=self.min_width)
+        except UnsupportedLayoutError as error:
+            return error
+        # pylint: disable=W0718:broad-exception-caught
+        except Exception:
+            # e.g., no text boxes wide enough yet, wait for more pages
+            return None
+
+    def _same_estimate(self, estimate, previous) -> bool:
+        if isinstance(estimate, UnsupportedLayoutError):
+            return (
+                isinstance(previous, UnsupportedLayoutError)
+                and estimate.num_cols == previous.num_cols
+            )
+        return isinstance(previous, Layout) and repr(estimate) == repr(previous)
@@ -0,0 +1,109 @@
+""" Persistent cache of publisher layout templates.
+Papers from the same journal template share the page size, the row size and
+the column positions, so once a template has been seen the layout of a new
+paper can be taken from the cache instead of computing the statistics over
+every text box. Templates are keyed by a fingerprint of the first pages: the
+page size and the dominant row width, row height and left margin. Every entry
+is a JSON file with the layout and the number of documents that reproduced
+it; a template is only used after TEMPLATE_MIN_DOCUMENTS documents agreed on
+it and when the text of the first pages fits its content region.
+"""
+
+from dataclasses import asdict
+from hashlib import sha256
+from json import dumps as json_dumps
+from json import loads as json_loads
+from os import getpid, makedirs, replace
+from pathlib import Path
+from typing import List, Optional, Union
+
+from pdfigcapx.layout import LayoutBuilder, TextBoxCoords, cluster_points
+from pdfigcapx.models import Bbox, Layout
+from pdfigcapx.page import HtmlPage
+
+# pages used to fingerprint the document and check a template
+TEMPLATE_PAGES = 3
+# documents with the same fingerprint and layout before using a template
+TEMPLATE_MIN_DOCUMENTS = 2
+# min share of the wide text boxes of the first pages in the content region
+TEMPLATE_MIN_INSIDE = 0.9
+# tolerance in pixels around the content region
+TEMPLATE_PADDING = 10
+
+
+class LayoutTemplateCache:
+    """Layout templates stored in cache_path"""
+
+    def __init__(self, cache_path: Union[str, Path], min_width=30):
+        self.cache_path = Path(cache_path)
+        self.min_width = min_width
+        makedirs(self.cache_path, exist_ok=True)
+
+    def fingerprint(self, pages: List[HtmlPage]) -> Optional[str]:
+        """Hash of the page size and the dominant text geometry of the first
+        pages, None if they have no text wide enough to describe a template"""
+        sample = pages[:TEMPLATE_PAGES]
+        if len(sample) == 0:
+            return None
+        coords = TextBoxCoords(sample)
+        wide = coords.arrays["width"] > self.min_width
+        if not wide.any():
+            return None
+        row_width, row_height = LayoutBuilder._calculate_row_size(
+            coords, self.min_width
+        )
+        x0s = sorted(coords.value_counts("x", wide), key=lambda x: x[1], reverse=True)
+        margin = cluster_points(x0s)[0][0]
+        geometry = [sample[0].width, sample[0].height, row_width, row_height, margin]
+        return sha256(json_dumps([round(el) for el in geometry]).encode()).hexdigest()
+
+    def _template_path(self, key: str) -> Path:
+        return self.cache_path / f"{key}.json"
+
+    def load(self, key: str, pages: List[HtmlPage]) -> Optional[Layout]:
+        """Return the template layout on a confident match, None otherwise"""
+        template_path = self._template_path(key)
+        if not template_path.exists():
+            return None
+        entry = json_loads(template_path.read_text(encoding="utf-8"))
+        if entry["documents"] < TEMPLATE_MIN_DOCUMENTS:
+            return None
+        layout = _layout_from_dict(entry["layout"])
+        if self._inside_ratio(layout, pages[:TEMPLATE_PAGES]) < TEMPLATE_MIN_INSIDE:
+            return None
+        return layout
+
+    def save(self, key: str, layout: Layout) -> None:
+        """Record the layout computed for a document with the fingerprint key.
+        A different layout replaces the template and restarts the count."""
+        template_path = self._template_path(key)
+        documents = 0
+        if template_path.exists():
+            entry = json_loads(template_path.read_text(encoding="utf-8"))
+            if _layout_from_dict(entry["layout"]) == layout:
+                documents = entry["documents"]
+        entry = {"documents": documents + 1, "layout": asdict(layout)}
+        tmp_path = self.cache_path / f".{template_path.name}.{getpid()}.tmp"
+        tmp_path.write_text(json_dumps(entry), encoding="utf-8")
+        replace(tmp_path, template_path)
+
+    def _inside_ratio(self, layout: Layout, pages: List[HtmlPage]) -> float:
+        """Share of the wide text boxes inside the content region"""
+        coords = TextBoxCoords(pages)
+        wide = coords.arrays["width"] > self.min_width
+        if not wide.any():
+            return 0.0
+        region = layout.content_region
+        inside = (
+            (coords.arrays["x"] >= region.x - TEMPLATE_PADDING)
+            & (coords.arrays["y"] >= region.y - TEMPLATE_PADDING)
+            & (coords.arrays["x1"] <= region.x1 + TEMPLATE_PADDING)
+            & (coords.arrays["y1"] <= region.y1 + TEMPLATE_PADDING)
+        )
+        return float((inside & wide).sum() / wide.sum())
+
+
+def _layout_from_dict(values: dict) -> Layout:
+    region = values["content_region"]
+    content_region = Bbox(region["x"], region["y"], region["width"], region["height"])
+    return Layout(**{**values, "content_region": content_region})
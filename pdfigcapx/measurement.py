@@ -0,0 +1,326 @@
+""" Backends measuring the size of the text divs in the pdftohtml pages.
+xpdf's pdftohtml positions every div.txt with left and top styles, but the
+layout analysis also needs the width and height of each div:
+- ChromeMeasurement: loads every page in headless Chrome and reads the
+  rendered boxes. Exact, but requires Chrome and chromedriver.
+- FontMetricsMeasurement: computes the sizes from the font family and size
+  declared in the page CSS and the glyph advances of a matching font file.
+  Does not need a browser at the cost of a small geometric error.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from os import walk
+from os.path import join
+from pathlib import Path
+from re import compile as re_compile
+from statistics import mean
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import cssutils
+from bs4 import BeautifulSoup, NavigableString
+from matplotlib import get_data_path
+from PIL import ImageFont
+
+from pdfigcapx.browser_pool import BrowserPool
+from pdfigcapx.page import HtmlPage
+from pdfigcapx.utils import build_html_page, extract_page_text_content
+
+cssutils.log.setLevel(logging.CRITICAL)
+
+CHROME = "chrome"
+FONTS = "fonts"
+
+FONT_DIRS = [
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    str(Path.home() / ".fonts"),
+    join(get_data_path(), "fonts", "ttf"),  # DejaVu fonts shipped by matplotlib
+]
+# font files by generic family and (bold, italic) in order of preference.
+# Liberation fonts are metric compatible with Times, Arial and Courier.
+GENERIC_FONT_FILES = {
+    "serif": {
+        (False, False): ["LiberationSerif-Regular.ttf", "DejaVuSerif.ttf"],
+        (True, False): ["LiberationSerif-Bold.ttf", "DejaVuSerif-Bold.ttf"],
+        (False, True): ["LiberationSerif-Italic.ttf", "DejaVuSerif-Italic.ttf"],
+        (True, True): ["LiberationSerif-BoldItalic.ttf", "DejaVuSerif-BoldItalic.ttf"],
+    },
+    "sans-serif": {
+        (False, False): ["LiberationSans-Regular.ttf", "DejaVuSans.ttf"],
+        (True, False): ["LiberationSans-Bold.ttf", "DejaVuSans-Bold.ttf"],
+        (False, True): ["LiberationSans-Italic.ttf", "DejaVuSans-Oblique.ttf"],
+        (True, True): ["LiberationSans-BoldItalic.ttf", "DejaVuSans-BoldOblique.ttf"],
+    },
+    "monospace": {
+        (False, False): ["LiberationMono-Regular.ttf", "DejaVuSansMono.ttf"],
+        (True, False): ["LiberationMono-Bold.ttf", "DejaVuSansMono-Bold.ttf"],
+        (False, True): ["LiberationMono-Italic.ttf", "DejaVuSansMono-Oblique.ttf"],
+        (True, True): [
+            "LiberationMono-BoldItalic.ttf",
+            "DejaVuSansMono-BoldOblique.ttf",
+        ],
+    },
+}
+# (average advance, ascent, descent) in em units when no font file is found
+FALLBACK_METRICS = {
+    "serif": (0.45, 0.891, 0.216),
+    "sans-serif": (0.5, 0.905, 0.212),
+    "monospace": (0.6, 0.833, 0.300),
+}
+# Chrome's default font for the div itself, whose strut sets a minimum line height
+DEFAULT_FONT = ("serif", False, False)
+DEFAULT_FONT_SIZE = 16.0
+REFERENCE_SIZE = 1000  # load fonts at a large size and scale to avoid hinting
+
+FontKey = Tuple[str, bool, bool]  # (family or font file, bold, italic)
+MeasuredBox = Tuple[float, float, float, float, str]  # (x, y, width, height, text)
+
+STYLE_LEFT = re_compile(r"left:\s*(-?[\d.]+)px")
+STYLE_TOP = re_compile(r"top:\s*(-?[\d.]+)px")
+STYLE_FONT_SIZE = re_compile(r"font-size:\s*([\d.]+)px")
+
+
+class MeasurementBackend(ABC):
+    """Interface for measuring the text boxes in pdftohtml pages"""
+
+    name = ""
+
+    @abstractmethod
+    def extract_pages(self, page_paths: List[Path]) -> Iterator[HtmlPage]:
+        """Yield the pages in the same order as page_paths"""
+
+
+class ChromeMeasurement(MeasurementBackend):
+    """Measure the rendered divs in headless Chrome. Browsers are borrowed from
+    the browser_pool for the time it takes to iterate the pages.
+    """
+
+    name = CHROME
+
+    def __init__(self, browser_pool: Optional[BrowserPool] = None):
+        self.browser_pool = browser_pool
+
+    def extract_pages(self, page_paths: List[Path]) -> Iterator[HtmlPage]:
+        # without a shared pool, the browser is not reused after these pages
+        pool = self.browser_pool or BrowserPool(max_pages=0)
+        with pool.borrow() as lease:
+            for page_path in page_paths:
+                page = extract_page_text_content(lease.browser, page_path)
+                lease.pages += 1
+                yield page
+
+
+class FontMetrics:
+    """Glyph advance and line metrics for the fonts used by pdftohtml. Text
+    widths are cached by (font, size, string).
+    """
+
+    def __init__(self, font_dirs: List[str] = None, cache_size=2**16):
+        self.font_dirs = FONT_DIRS if font_dirs is None else font_dirs
+        self._font_files: Optional[Dict[str, str]] = None
+        self._fonts: Dict[FontKey, Optional[ImageFont.FreeTypeFont]] = {}
+        self.text_width = lru_cache(maxsize=cache_size)(self._text_width)
+
+    def _text_width(self, font_key: FontKey, size: float, text: str) -> float:
+        font = self.font(font_key)
+        if font is None:
+            advance, _, _ = FALLBACK_METRICS[self._generic(font_key)]
+            return advance * size * len(text)
+        return font.getlength(text) * size / REFERENCE_SIZE
+
+    def line_metrics(self, font_key: FontKey, size: float) -> Tuple[float, float]:
+        """Ascent and descent for a line-height: normal"""
+        font = self.font(font_key)
+        if font is None:
+            _, ascent, descent = FALLBACK_METRICS[self._generic(font_key)]
+            return ascent * size, descent * size
+        ascent, descent = font.getmetrics()
+        return ascent * size / REFERENCE_SIZE, descent * size / REFERENCE_SIZE
+
+    def font(self, font_key: FontKey) -> Optional[ImageFont.FreeTypeFont]:
+        if font_key not in self._fonts:
+            self._fonts[font_key] = self._load_font(font_key)
+        return self._fonts[font_key]
+
+    def _load_font(self, font_key: FontKey) -> Optional[ImageFont.FreeTypeFont]:
+        family, bold, italic = font_key
+        if family not in GENERIC_FONT_FILES:
+            # embedded font file referenced by the pdftohtml CSS
+            paths = [family]
+        else:
+            files = self._find_font_files()
+            names = GENERIC_FONT_FILES[family][(bold, italic)]
+            paths = [files[name] for name in names if name in files]
+        for path in paths:
+            try:
+                return ImageFont.truetype(path, REFERENCE_SIZE)
+            except OSError:
+                logging.debug("could not load font %s", path)
+        return None
+
+    def _find_font_files(self) -> Dict[str, str]:
+        if self._font_files is None:
+            self._font_files = {}
+            for font_dir in self.font_dirs:
+                for root, _, files in walk(font_dir):
+                    for name in files:
+                        self._font_files.setdefault(name, join(root, name))
+        return self._font_files
+
+    def _generic(self, font_key: FontKey) -> str:
+        family = font_key[0]
+        return family if family in FALLBACK_METRICS else "serif"
+
+
+def generic_family(font_family: str) -> str:
+    """Map a CSS font-family list to serif, sans-serif or monospace"""
+    names = [el.strip().strip("'\"").lower() for el in font_family.split(",")]
+    for name in names:
+        if "mono" in name or "courier" in name:
+            return "monospace"
+        if "sans" in name or "arial" in name or "helvetica" in name:
+            return "sans-serif"
+        if "serif" in name or "times" in name:
+            return "serif"
+    # Chrome falls back to its standard font, which is a serif font
+    return "serif"
+
+
+def parse_font_rules(soup: BeautifulSoup, base_path: Path) -> Dict[str, FontKey]:
+    """Read the #fN font rules (and @font-face files if embedded) from the
+    pdftohtml stylesheet"""
+    font_faces = {}
+    rules = {}
+    for style in soup.find_all("style"):
+        sheet = cssutils.parseString(style.get_text())
+        for rule in sheet:
+            if rule.type == rule.FONT_FACE_RULE:
+                family = rule.style.getPropertyValue("font-family").strip("'\"")
+                src = rule.style.getPropertyValue("src")
+                if src.startswith("url("):
+                    file_name = src[4:].split(")")[0].strip("'\"")
+                    font_faces[family] = str((base_path / file_name).resolve())
+            elif rule.type == rule.STYLE_RULE:
+                for selector in rule.selectorList:
+                    if selector.selectorText.startswith("#"):
+                        rules[selector.selectorText[1:]] = rule.style
+
+    fonts = {}
+    for font_id, style in rules.items():
+        family = style.getPropertyValue("font-family")
+        bold = style.getPropertyValue("font-weight") in ("bold", "700", "800", "900")
+        italic = style.getPropertyValue("font-style") in ("italic", "oblique")
+        first_family = family.split(",")[0].strip().strip("'\"")
+        if first_family in font_faces:
+            fonts[font_id] = (font_faces[first_family], bold, italic)
+        else:
+            fonts[font_id] = (generic_family(family), bold, italic)
+    return fonts
+
+
+class FontMetricsMeasurement(MeasurementBackend):
+    """Measure the divs without a browser. The width of a div is the sum of the
+    advances of its spans and the height follows the normal line height of
+    the largest font in the line, including the strut of the div default font.
+    """
+
+    name = FONTS
+
+    def __init__(self, metrics: Optional[FontMetrics] = None):
+        self.metrics = metrics or FontMetrics()
+
+    def extract_pages(self, page_paths: List[Path]) -> Iterator[HtmlPage]:
+        for page_path in page_paths:
+            yield self.extract_page(page_path)
+
+    def extract_page(self, html_page_path: Union[str, Path]) -> HtmlPage:
+        html_path = Path(html_page_path)
+        with open(html_path, "r", encoding="utf-8", errors="replace") as f_in:
+            soup = BeautifulSoup(f_in.read(), "html.parser")
+        fonts = parse_font_rules(soup, html_path.parent)
+        img = soup.find("img")
+        boxes = [
+            self._measure_div(div, fonts) for div in soup.find_all("div", class_="txt")
+        ]
+        return build_html_page(html_path, int(img["width"]), int(img["height"]), boxes)
+
+    def _measure_div(self, div, fonts: Dict[str, FontKey]) -> MeasuredBox:
+        style = div.get("style", "")
+        left = STYLE_LEFT.search(style)
+        top = STYLE_TOP.search(style)
+        x = float(left.group(1)) if left else 0.0
+        y = float(top.group(1)) if top else 0.0
+
+        width = 0.0
+        ascent, descent = self.metrics.line_metrics(DEFAULT_FONT, DEFAULT_FONT_SIZE)
+        for child in div.children:
+            if isinstance(child, NavigableString):
+                font_key, size, text = DEFAULT_FONT, DEFAULT_FONT_SIZE, str(child)
+            else:
+                font_key = fonts.get(child.get("id"), DEFAULT_FONT)
+                font_size = STYLE_FONT_SIZE.search(child.get("style", ""))
+                size = float(font_size.group(1)) if font_size else DEFAULT_FONT_SIZE
+                text = child.get_text()
+            width += self.metrics.text_width(font_key, size, text)
+            child_ascent, child_descent = self.metrics.line_metrics(font_key, size)
+            ascent = max(ascent, child_ascent)
+            descent = max(descent, child_descent)
+        return (x, y, width, ascent + descent, div.get_text())
+
+
+def get_measurement_backend(
+    name: str, browser_pool: Optional[BrowserPool] = None
+) -> MeasurementBackend:
+    """Instantiate a measurement backend by name"""
+    if name == CHROME:
+        return ChromeMeasurement(browser_pool)
+    elif name == FONTS:
+        return FontMetricsMeasurement()
+    else:
+        raise Exception(f"Measurement backend {name} not supported")
+
+
+def compare_measurements(
+    page_paths: List[Path],
+    reference: MeasurementBackend,
+    candidate: MeasurementBackend,
+) -> dict:
+    """Accuracy report of the candidate backend against the reference backend
+    on the same pages. Boxes are paired by their position in the document.
+    Returns the mean absolute error in width and height, the mean IoU and the
+    fraction of boxes with an IoU under 0.5, overall and per page.
+    """
+    report = {"reference": reference.name, "candidate": candidate.name, "pages": []}
+    all_stats = []
+    pairs = zip(
+        reference.extract_pages(page_paths), candidate.extract_pages(page_paths)
+    )
+    for ref_page, cand_page in pairs:
+        ref_boxes = {tb.id: tb for tb in ref_page.text_boxes + ref_page.captions}
+        cand_boxes = {tb.id: tb for tb in cand_page.text_boxes + cand_page.captions}
+        stats = [
+            (
+                abs(ref_boxes[idx].width - cand_boxes[idx].width),
+                abs(ref_boxes[idx].height - cand_boxes[idx].height),
+                ref_boxes[idx].iou(cand_boxes[idx]),
+            )
+            for idx in ref_boxes
+            if idx in cand_boxes
+        ]
+        all_stats += stats
+        report["pages"].append({"name": ref_page.name, **_summarize(stats)})
+    report.update(_summarize(all_stats))
+    return report
+
+
+def _summarize(stats: List[Tuple[float, float, float]]) -> dict:
+    if len(stats) == 0:
+        return {"boxes": 0}
+    return {
+        "boxes": len(stats),
+        "width_mae": mean([el[0] for el in stats]),
+        "height_mae": mean([el[1] for el in stats]),
+        "mean_iou": mean([el[2] for el in stats]),
+        "low_iou_ratio": sum([1 for el in stats if el[2] < 0.5]) / len(stats),
+    }
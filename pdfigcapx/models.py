@@ -1,13 +1,44 @@
-from typing import Optional, List, Union
-from dataclasses import dataclass, field
+from typing import Iterator, Optional, List, Union
+from dataclasses import FrozenInstanceError, dataclass, field
 from re import search as re_search
 from re import IGNORECASE
 from enum import Enum
+from numpy import (
+    arange,
+    asarray,
+    concatenate,
+    cumsum,
+    float64,
+    int32,
+    int64,
+    integer,
+    issubdtype,
+    maximum,
+    minimum,
+    ndarray,
+    where,
+    zeros,
+)
 
 
-@dataclass()
-class Bbox:
-    """Bounding box that surrounds text or images
+class _BboxSlots:
+    """Storage of the Bbox fields. The slots live in a base class because
+    dataclass fields declared with field() cannot share the class body with
+    __slots__ before Python 3.10 (i.e., dataclass(slots=True))."""
+
+    __slots__ = ("x", "y", "width", "height", "x1", "y1")
+
+
+def _set(obj, **values) -> None:
+    """Assign the fields of a frozen model while it is built"""
+    for name, value in values.items():
+        object.__setattr__(obj, name, value)
+
+
+@dataclass(frozen=True)
+class Bbox(_BboxSlots):
+    """Bounding box that surrounds text or images. Boxes are immutable, use
+    with_edges to get a moved copy.
     Parameters:
     ----------
     - x: int
@@ -18,7 +49,8 @@ class Bbox:
     - height: int
     """
 
-    __slot__ = ("x", "y", "width", "height", "x1", "y1")
+    __slots__ = ()
+    _STATE = ("x", "y", "width", "height", "x1", "y1")
     x: int
     y: int
     width: int
@@ -28,8 +60,18 @@ class Bbox:
 
     def __post_init__(self):
         # save values for clarity during processing
-        self.x1 = self.x + self.width
-        self.y1 = self.y + self.height
+        _set(self, x1=self.x + self.width, y1=self.y + self.height)
+
+    def __getstate__(self):
+        return tuple([getattr(self, name) for name in self._STATE])
+
+    def __setstate__(self, state):
+        _set(self, **dict(zip(self._STATE, state)))
+
+    def __copy__(self):
+        bbox = object.__new__(type(self))
+        bbox.__setstate__(self.__getstate__())
+        return bbox
 
     def to_arr(self):
         """Convert bounding box to array [x,y,w,h]"""
@@ -43,11 +85,19 @@ class Bbox:
             and self.height == other.height
         )
 
-    def update_width(self):
-        self.width = self.x1 - self.x
-
-    def update_height(self):
-        self.height = self.y1 - self.y
+    def with_edges(self, x=None, y=None, x1=None, y1=None) -> "Bbox":
+        """Copy of the box with the given edges moved. The width is computed
+        again when x or x1 move, and the height when y or y1 move."""
+        bbox = self.__copy__()
+        edges = {"x": x, "y": y, "x1": x1, "y1": y1}
+        _set(
+            bbox, **{name: value for name, value in edges.items() if value is not None}
+        )
+        if x is not None or x1 is not None:
+            _set(bbox, width=bbox.x1 - bbox.x)
+        if y is not None or y1 is not None:
+            _set(bbox, height=bbox.y1 - bbox.y)
+        return bbox
 
     def intersect_area(self, other) -> float:
         x = max(self.x, other.x)
@@ -66,6 +116,12 @@ class Bbox:
     def area(self):
         return self.width * self.height
 
+    def iou(self, other) -> float:
+        """Intersection over union"""
+        intersection = self.intersect_area(other)
+        union = self.area() + other.area() - intersection
+        return 0.0 if union <= 0 else intersection / union
+
     def merge_bboxes(bboxes):
         x0 = min([el.x for el in bboxes])
         y0 = min([el.y for el in bboxes])
@@ -74,6 +130,135 @@ class Bbox:
         return Bbox(x0, y0, x1 - x0, y1 - y0)
 
 
+def _number(value: Union[int, float]) -> Union[int, float]:
+    """Integral values as int, like the sizes returned by chromedriver"""
+    return int(value) if float(value).is_integer() else value
+
+
+_COLUMNS = ("x", "y", "width", "height", "x1", "y1")
+
+
+def _bbox(values: list) -> Bbox:
+    """Bbox from the column values, keeping x1 and y1 as stored"""
+    x, y, width, height, x1, y1 = [_number(el) for el in values]
+    bbox = Bbox(x, y, width, height)
+    _set(bbox, x1=x1, y1=y1)
+    return bbox
+
+
+class BboxArray:
+    """Bounding boxes stored as NumPy columns instead of a list of Bbox, for
+    the stages computing geometry over every box of a page. Like Bbox, x1 and
+    y1 are columns of their own, set from the width and height on creation.
+    Contour boxes are stored as int32; boxes with fractional coordinates,
+    e.g., text boxes or contours trimmed by a caption, as float64. Indexing
+    with an int returns the box as a Bbox, any other index returns a
+    BboxArray. Integral values are returned as int, see _number.
+    Parameters:
+    ----------
+    - boxes: array-like of rows [x, y, width, height]
+    - ids: id of every box, e.g., TextBox.id. Defaults to the row positions
+    """
+
+    __slots__ = ("x", "y", "width", "height", "x1", "y1", "ids")
+
+    def __init__(self, boxes, ids: Optional[ndarray] = None):
+        boxes = asarray(boxes)
+        dtype = int32 if issubdtype(boxes.dtype, integer) else float64
+        boxes = boxes.astype(dtype, copy=False).reshape(-1, 4)
+        self.x = boxes[:, 0].copy()
+        self.y = boxes[:, 1].copy()
+        self.width = boxes[:, 2].copy()
+        self.height = boxes[:, 3].copy()
+        self.x1 = self.x + self.width
+        self.y1 = self.y + self.height
+        self.ids = arange(len(boxes), dtype=int64) if ids is None else asarray(ids)
+
+    @classmethod
+    def _from_columns(cls, columns: dict, ids: ndarray) -> "BboxArray":
+        boxes = cls.__new__(cls)
+        for name in ("x", "y", "width", "height", "x1", "y1"):
+            setattr(boxes, name, columns[name])
+        boxes.ids = ids
+        return boxes
+
+    @classmethod
+    def from_bboxes(cls, bboxes: List[Bbox]) -> "BboxArray":
+        columns = [[getattr(el, name) for el in bboxes] for name in _COLUMNS]
+        columns = asarray(columns).reshape(len(_COLUMNS), -1)
+        dtype = int32 if issubdtype(columns.dtype, integer) else float64
+        ids = [getattr(el, "id", idx) for idx, el in enumerate(bboxes)]
+        return cls._from_columns(
+            dict(zip(_COLUMNS, columns.astype(dtype))), asarray(ids, dtype=int64)
+        )
+
+    @classmethod
+    def concat(cls, arrays: List["BboxArray"]) -> "BboxArray":
+        columns = {
+            name: concatenate([getattr(el, name) for el in arrays]) for name in _COLUMNS
+        }
+        return cls._from_columns(columns, concatenate([el.ids for el in arrays]))
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __getitem__(self, key) -> Union[Bbox, "BboxArray"]:
+        if isinstance(key, (int, integer)):
+            return self.bbox(int(key))
+        columns = {name: getattr(self, name)[key] for name in _COLUMNS}
+        return BboxArray._from_columns(columns, self.ids[key])
+
+    def __iter__(self) -> Iterator[Bbox]:
+        for idx in range(len(self)):
+            yield self.bbox(idx)
+
+    def bbox(self, idx: int) -> Bbox:
+        """The box at idx as a Bbox"""
+        return _bbox([getattr(self, name)[idx].item() for name in _COLUMNS])
+
+    def to_bboxes(self) -> List[Bbox]:
+        rows = asarray([getattr(self, name) for name in _COLUMNS]).T.tolist()
+        return [_bbox(row) for row in rows]
+
+    def to_arr(self) -> ndarray:
+        """Boxes as rows [x,y,w,h]"""
+        return asarray([self.x, self.y, self.width, self.height]).T.reshape(-1, 4)
+
+    def with_columns(self, **columns) -> "BboxArray":
+        """Copy with the given columns among x, y, x1 and y1 replaced, and the
+        width and height computed again from the edges"""
+        updated = {name: columns.get(name, getattr(self, name)) for name in _COLUMNS}
+        updated["width"] = updated["x1"] - updated["x"]
+        updated["height"] = updated["y1"] - updated["y"]
+        return BboxArray._from_columns(updated, self.ids)
+
+    def area(self) -> ndarray:
+        return self.width * self.height
+
+    def intersect_area(self, other: Bbox) -> ndarray:
+        """Bbox.intersect_area of every box with other"""
+        w = minimum(self.x1, other.x1) - maximum(self.x, other.x)
+        h = minimum(self.y1, other.y1) - maximum(self.y, other.y)
+        return where((w < 0) | (h < 0), 0, w * h)
+
+    def overlap_ratio(self, other: Bbox) -> ndarray:
+        """Share of the area of every box covered by other, 0 for empty boxes,
+        i.e., utils.overlap_ratio_based(box, other) for every box"""
+        area = self.area()
+        ratios = zeros(len(self), dtype=float64)
+        nonzero_area = area != 0
+        ratios[nonzero_area] = (
+            self.intersect_area(other)[nonzero_area] / area[nonzero_area]
+        )
+        return ratios
+
+    def merge(self) -> Bbox:
+        """Bbox.merge_bboxes of every box"""
+        x0, y0 = self.x.min().item(), self.y.min().item()
+        x1, y1 = self.x1.max().item(), self.y1.max().item()
+        return Bbox(_number(x0), _number(y0), _number(x1 - x0), _number(y1 - y0))
+
+
 def build_regex_for_caption(type="figure") -> str:
     """Helper to build regular expressions to find figure or table text in sentence.
     We assume that the figure or table names are the first words in a caption.
@@ -93,6 +278,33 @@ class AlignmentType(Enum):
     UNKNOWN = 4
 
 
+class PageText:
+    """Text of every box in a page stored as one string. The text at index
+    i is buffer[offsets[i]:offsets[i + 1]], text boxes only keep their index.
+    Parameters:
+    ----------
+    - page_number: int
+    - buffer: str
+    - offsets: start of every text in buffer plus the end of the last one
+    """
+
+    __slots__ = ("page_number", "buffer", "offsets")
+
+    def __init__(self, page_number: int, buffer: str, offsets):
+        self.page_number = page_number
+        self.buffer = buffer
+        self.offsets = asarray(offsets, dtype=int64)
+
+    @classmethod
+    def from_texts(cls, page_number: int, texts: List[str]) -> "PageText":
+        offsets = zeros(len(texts) + 1, dtype=int64)
+        offsets[1:] = cumsum([len(text) for text in texts])
+        return cls(page_number, "".join(texts), offsets)
+
+    def text(self, index: int) -> str:
+        return self.buffer[self.offsets[index] : self.offsets[index + 1]]
+
+
 class TextBox(Bbox):
     """Represents a div with text in the document page. (x0,y0) is the top left
     corner while (x1,y1) is the bottom right corner.
@@ -103,8 +315,14 @@ class TextBox(Bbox):
         Page where the content is located. Useful for matching images and captions
         located in consecutive pages
     - text: str
+    The text and page number are read from the PageText shared by the boxes of
+    the page, see from_page_text. Like Bbox, text boxes are immutable: with_text
+    returns a copy whose text is stored in a PageText of its own.
     """
 
+    __slots__ = ("id", "alignment", "_page_text", "_index")
+    _STATE = Bbox._STATE + __slots__
+
     def __init__(
         self,
         x: int,
@@ -116,10 +334,61 @@ class TextBox(Bbox):
         text: str,
     ):
         super().__init__(x, y, width, height)
-        self.id = id
-        self.page_number = page_number
-        self.text = text
-        self.alignment = AlignmentType.UNKNOWN
+        _set(
+            self,
+            id=id,
+            alignment=AlignmentType.UNKNOWN,
+            _page_text=PageText(page_number, text, [0, len(text)]),
+            _index=0,
+        )
+
+    @classmethod
+    def from_page_text(
+        cls,
+        x: int,
+        y: int,
+        width: int,
+        height: int,
+        id: int,
+        page_text: PageText,
+        index: int,
+    ) -> "TextBox":
+        """Text box whose text is page_text.text(index)"""
+        text_box = cls.__new__(cls)
+        Bbox.__init__(text_box, x, y, width, height)
+        _set(
+            text_box,
+            id=id,
+            alignment=AlignmentType.UNKNOWN,
+            _page_text=page_text,
+            _index=index,
+        )
+        return text_box
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field {name!r}")
+
+    @property
+    def page_number(self) -> int:
+        return self._page_text.page_number
+
+    @property
+    def text(self) -> str:
+        return self._page_text.text(self._index)
+
+    def with_text(self, text: str) -> "TextBox":
+        text_box = self.__copy__()
+        page_text = PageText(self.page_number, text, [0, len(text)])
+        _set(text_box, _page_text=page_text, _index=0)
+        return text_box
+
+    def with_alignment(self, alignment: AlignmentType) -> "TextBox":
+        text_box = self.__copy__()
+        _set(text_box, alignment=alignment)
+        return text_box
 
     def can_be_caption(self, type="figure") -> bool:
         """Check whether a sentence qualifies as a potential caption
@@ -1,6 +1,8 @@
-from copy import deepcopy
-from typing import List
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Set
+from numpy import ndarray
 from pdfigcapx.models import TextBox, Layout, AlignmentType, Figure
+from pdfigcapx.spatial_index import GridIndex
 
 
 class HtmlPage:
@@ -9,7 +11,9 @@ class HtmlPage:
     - name:   File name
     - width:  Width of HTML page which differs from the width of the PNG file
     - height: Height of HTML page which differs from the height of the PNG file
-    - text_boxes: Every div inside the HTML containing text
+    - text_boxes: Every div inside the HTML containing text, in document order,
+        except the ones merged into a caption. Assign a new list instead of
+        modifying it in place, the page keeps an index sorted by y over it.
     - img_name: Associated PNG filename
     - page_number: Page number in PDF
     - orphan_figure: Figure in page built from remaining contour candidates
@@ -20,6 +24,12 @@ class HtmlPage:
     - orphan_captions: div containing the starting word 'figure' that were
         not matched to any candidate region on the page after sweeping the
         page downwards, upwards and sidewards.
+    - cache_key: Content hash of the page when stored in a PageCache
+    - raw_contours: Bounding boxes of the contours found on the page PNG
+        before any filtering, in html coordinates, as an array of rows
+        [x, y, width, height]. Computed once by contours.get_candidates.
+    - has_graphics: Whether the page PNG has any graphical content, None until
+        checked with contours.has_graphics
     """
 
     def __init__(
@@ -42,6 +52,70 @@ class HtmlPage:
         self.figures: List[Figure] = []
         self.orphan_captions = []
         self.orphan_figure = None
+        self.cache_key: Optional[str] = None
+        self.raw_contours: Optional[ndarray] = None
+        self.has_graphics: Optional[bool] = None
+
+    @property
+    def text_boxes(self) -> List[TextBox]:
+        if self._text_boxes is None:
+            self._text_boxes = [
+                tb for tb in self._all_text_boxes if tb.id not in self._removed_ids
+            ]
+        return self._text_boxes
+
+    @text_boxes.setter
+    def text_boxes(self, text_boxes: List[TextBox]):
+        self._all_text_boxes = text_boxes
+        self._text_boxes = text_boxes
+        self._removed_ids: Set[int] = set()
+        self._boxes_by_y: Optional[List[TextBox]] = None
+        self._ys: Optional[list] = None
+        self._grid: Optional[GridIndex] = None
+
+    def _remove_text_boxes(self, ids: Iterable[int]) -> None:
+        """Leave the text boxes with these ids out of text_boxes"""
+        self._removed_ids.update(ids)
+        self._text_boxes = None
+
+    def _y_index(self):
+        """Every text box sorted by y, ties in document order, and their y
+        values to bisect. Removed boxes stay in the index."""
+        if self._boxes_by_y is None:
+            self._boxes_by_y = sorted(self._all_text_boxes, key=lambda tb: tb.y)
+            self._ys = [tb.y for tb in self._boxes_by_y]
+        return self._boxes_by_y, self._ys
+
+    def text_boxes_in(
+        self, x0: float, y0: float, x1: float, y1: float
+    ) -> List[TextBox]:
+        """Text boxes, in document order, that may touch the window. Every
+        box of text_boxes touching it is included, see GridIndex.query. The
+        grid is built on the first query."""
+        if self._grid is None:
+            self._grid = GridIndex(self._all_text_boxes, self.width, self.height)
+        boxes = [self._all_text_boxes[idx] for idx in self._grid.query(x0, y0, x1, y1)]
+        return [tb for tb in boxes if tb.id not in self._removed_ids]
+
+    def release_text_boxes(self) -> None:
+        """Drop the text boxes that are not captions, e.g., once the figures
+        are extracted. The captions left get their own copy of their text, so
+        that the text buffer shared by the page is released as well."""
+        detached = {}
+
+        def detach(caption: Optional[TextBox]) -> Optional[TextBox]:
+            if caption is None:
+                return None
+            if id(caption) not in detached:
+                detached[id(caption)] = caption.with_text(caption.text)
+            return detached[id(caption)]
+
+        self.captions = [detach(el) for el in self.captions]
+        self.orphan_captions = [detach(el) for el in self.orphan_captions]
+        for figure in self.figures + [self.orphan_figure]:
+            if figure is not None:
+                figure.caption = detach(figure.caption)
+        self.text_boxes = []
 
     def expand_captions(self, layout: Layout):
         updated_captions = []
@@ -55,45 +129,44 @@ class HtmlPage:
 
         if caption.x < layout.width / 2 and caption.x1 > layout.width / 2:
             alignment = AlignmentType.MULTICOLUMN
-            sentences = [
-                box
-                for box in self.text_boxes
-                if box.y > caption.y and abs(caption.x - box.x) < layout.row_width / 2
-            ]
+            edge = "x"
         elif caption.x1 < layout.width / 2:
             alignment = AlignmentType.LEFT
-            sentences = [
-                box
-                for box in self.text_boxes
-                if box.y > caption.y and abs(caption.x - box.x) < layout.row_width / 2
-            ]
+            edge = "x"
         else:
             alignment = AlignmentType.RIGHT
-            sentences = [
-                box
-                for box in self.text_boxes
-                if box.y > caption.y and abs(caption.x1 - box.x1) < layout.row_width / 2
-            ]
+            edge = "x1"
+        caption_edge = getattr(caption, edge)
 
+        # walk the boxes below the caption in y order, skipping the boxes not
+        # aligned with the caption.
         # the filtering is dropping the last sentence by mistake because the length
         # is smaller than row_width / 2
-        sentences = sorted(sentences, key=lambda el: el.y)
+        boxes_by_y, ys = self._y_index()
         sweep_y = caption.y1
 
-        new_caption = deepcopy(caption)
-        for sentence in sentences:
+        texts = [caption.text]
+        for idx in range(bisect_right(ys, caption.y), len(boxes_by_y)):
+            sentence = boxes_by_y[idx]
+            if sentence.y - sweep_y >= layout.row_height * 1.5:
+                # any aligned box from here on is too far below
+                break
+            if sentence.id in self._removed_ids or not (
+                abs(caption_edge - getattr(sentence, edge)) < layout.row_width / 2
+            ):
+                continue
             if abs(sentence.y - sweep_y) < layout.row_height * 1.5:
                 # could modify width but it would be not convenient for captions
                 # surrounding images
-                new_caption.y1 = sentence.y1
-                new_caption.update_height()
-                new_caption.text += f" {sentence.text}"
+                caption = caption.with_edges(y1=sentence.y1)
+                texts.append(sentence.text)
                 sweep_y = sentence.y
 
                 ids_to_remove.append(sentence.id)
             else:
                 break
 
-        self.text_boxes = [tb for tb in self.text_boxes if tb.id not in ids_to_remove]
-        new_caption.alignment = alignment
-        return new_caption
+        self._remove_text_boxes(ids_to_remove)
+        if len(texts) > 1:
+            caption = caption.with_text(" ".join(texts))
+        return caption.with_alignment(alignment)
@@ -0,0 +1,151 @@
+""" Persistent cache of parsed pages keyed by the page content.
+Measuring the text boxes and finding the contours of a page only depend on
+the html page and its background PNG, so reprocessing a document, or a new
+version of a preprint sharing most pages, can reuse the results for every
+page whose content did not change. Every entry is a NumPy .npz file with the
+page size, the text box geometry, ids and caption flags, and the text stored
+as one utf-8 buffer plus offsets. The raw contour boxes are stored in a
+separate .npy file once computed.
+"""
+
+from hashlib import sha256
+from os import getpid, makedirs, replace
+from pathlib import Path
+from typing import Optional, Union
+from numpy import (
+    array,
+    bool_,
+    cumsum,
+    float64,
+    frombuffer,
+    int32,
+    int64,
+    load,
+    ndarray,
+    save,
+    savez_compressed,
+    uint8,
+    zeros,
+)
+
+from pdfigcapx.models import PageText, TextBox
+from pdfigcapx.page import HtmlPage
+
+
+def _number(value: float) -> Union[int, float]:
+    """chromedriver returns integral sizes as int, keep the same types"""
+    return int(value) if value.is_integer() else value
+
+
+class PageCache:
+    """Page-level memo stored in cache_path"""
+
+    def __init__(self, cache_path: Union[str, Path]):
+        self.cache_path = Path(cache_path)
+        makedirs(self.cache_path, exist_ok=True)
+
+    def key(
+        self, html_path: Union[str, Path], png_path: Union[str, Path], salt=""
+    ) -> str:
+        """Hash of the html page and PNG content. Use the salt to separate
+        results from different measurement backends."""
+        digest = sha256(salt.encode())
+        for path in (html_path, png_path):
+            with open(path, "rb") as f_in:
+                digest.update(f_in.read())
+        return digest.hexdigest()
+
+    def _page_path(self, key: str) -> Path:
+        return self.cache_path / key[:2] / f"{key}.npz"
+
+    def _contours_path(self, key: str, variant: str) -> Path:
+        return self.cache_path / key[:2] / f"{key}{variant}.cnt.npy"
+
+    def load_page(
+        self, key: str, html_path: Union[str, Path], contours_variant=""
+    ) -> Optional[HtmlPage]:
+        """Return the cached page, or None on a cache miss. The contours are
+        loaded from the contours_variant, see save_contours."""
+        page_path = self._page_path(key)
+        if not page_path.exists():
+            return None
+        with load(page_path, allow_pickle=False) as entry:
+            width, height, number = entry["page"].tolist()
+            geometry = entry["geometry"].tolist()
+            ids = entry["ids"].tolist()
+            is_caption = entry["is_caption"].tolist()
+            offsets = entry["offsets"]
+            text = entry["text"].tobytes().decode("utf-8", "surrogatepass")
+
+        page_text = PageText(int(number), text, offsets)
+        text_boxes, captions = [], []
+        for idx, (x, y, box_width, box_height) in enumerate(geometry):
+            text_box = TextBox.from_page_text(
+                _number(x),
+                _number(y),
+                _number(box_width),
+                _number(box_height),
+                ids[idx],
+                page_text,
+                idx,
+            )
+            (captions if is_caption[idx] else text_boxes).append(text_box)
+
+        html_path = Path(html_path)
+        page = HtmlPage(
+            name=html_path.name,
+            img_name=f"{html_path.stem}.png",
+            width=_number(width),
+            height=_number(height),
+            number=int(number),
+            text_boxes=text_boxes,
+            captions=captions,
+        )
+        page.cache_key = key
+        page.raw_contours = self.load_contours(key, contours_variant)
+        return page
+
+    def save_page(self, key: str, page: HtmlPage) -> None:
+        """Store the page as measured, i.e., before expanding the captions"""
+        boxes = sorted(page.text_boxes + page.captions, key=lambda tb: tb.id)
+        caption_ids = set([tb.id for tb in page.captions])
+        # offsets are counted in characters to slice the decoded buffer
+        offsets = zeros(len(boxes) + 1, dtype=int64)
+        offsets[1:] = cumsum([len(tb.text) for tb in boxes])
+        text = "".join([tb.text for tb in boxes]).encode("utf-8", "surrogatepass")
+
+        self._atomic_write(
+            self._page_path(key),
+            lambda f_out: savez_compressed(
+                f_out,
+                page=array([page.width, page.height, page.number], dtype=float64),
+                geometry=array(
+                    [[tb.x, tb.y, tb.width, tb.height] for tb in boxes], dtype=float64
+                ).reshape(-1, 4),
+                ids=array([tb.id for tb in boxes], dtype=int32),
+                is_caption=array([tb.id in caption_ids for tb in boxes], dtype=bool_),
+                offsets=offsets,
+                text=frombuffer(text, dtype=uint8),
+            ),
+        )
+        page.cache_key = key
+
+    def load_contours(self, key: str, variant="") -> Optional[ndarray]:
+        contours_path = self._contours_path(key, variant)
+        if not contours_path.exists():
+            return None
+        return load(contours_path, allow_pickle=False)
+
+    def save_contours(self, key: str, contours: ndarray, variant="") -> None:
+        """Store the raw contours of the page. Contours found with different
+        detection settings are stored apart under their own variant name."""
+        boxes = array(contours, dtype=int32).reshape(-1, 4)
+        path = self._contours_path(key, variant)
+        self._atomic_write(path, lambda f_out: save(f_out, boxes))
+
+    def _atomic_write(self, path: Path, writer) -> None:
+        makedirs(path.parent, exist_ok=True)
+        tmp_path = path.parent / f".{path.name}.{getpid()}.tmp"
+        with open(tmp_path, "wb") as f_out:
+            writer(f_out)
+        replace(tmp_path, path)
@@ -13,12 +13,35 @@ poetry run python pdfigcapx/src/batch_preprocessing.py
                                a multiprocessing instance. Large numbers can 
                                flood the memory.
     --logs_path             -> folder to store logs, if NULL, same as OUTPUT FOLDER
+    --browser_max_pages     -> pages a worker's browser loads before being recycled
+    --measurement           -> chrome (default) or fonts to measure the text
+                               boxes from font metrics without a browser
+    --backend               -> xpdf (default) or pdf to read the text directly
+                               from the PDF instead of the pdftohtml pages
+    --artifacts_max_gb      -> size budget for ARTIFACTS_FOLDER, evicting the
+                               least recently used artifacts when exceeded
+    --page_cache_path       -> folder to cache the parsed pages, so that pages
+                               already seen are not measured again
+    --render_workers        -> ghostscript processes rendering the pages of
+                               each document when exporting the figures
+    --pyramid_scale         -> 1 (default), 2, 4 or 8 to find the figure
+                               candidates on page images reduced by this factor
+    --candidates            -> raster (default) or objects to take the figure
+                               candidates from the images and drawings placed
+                               in the PDF, falling back to raster per page
+    --layout_sample         -> max pages measured to fix the layout early and
+                               abandon unsupported layouts, 0 (default) for all
+    --layout_cache_path     -> folder to cache the layouts of publisher
+                               templates, reused for papers of known templates
+    --remove_furniture      -> add to leave out logos and rules repeated on
+                               most pages as figure candidates
     --reprocess-errors      -> add to reprocess PDFs marked as errors
 
 The artifacts are PDF pages as images used to find the image and caption 
 coordinates. They can be re-generated, but in case something goes wrong, 
 reprocessing a PDF can re-read these artifacts and avoid re-creating them. We
-recommend to set a temporary location for these elements.
+recommend to set a temporary location for these elements. Artifacts are stored
+by the SHA-256 of the PDF content, so identical PDFs share one conversion.
 """
 
 from sys import argv
@@ -45,6 +68,24 @@ def parse_args(args) -> Namespace:
     parser.set_defaults(create_folders=True)
     parser.add_argument("--num_workers", type=int, default=10)
     parser.add_argument("--batch_size", type=int, default=256)
+    parser.add_argument("--browser_max_pages", type=int, default=500)
+    parser.add_argument(
+        "--measurement", type=str, choices=["chrome", "fonts"], default="chrome"
+    )
+    parser.add_argument("--backend", type=str, choices=["xpdf", "pdf"], default="xpdf")
+    parser.add_argument("--artifacts_max_gb", type=float, default=None)
+    parser.add_argument("--page_cache_path", type=str, default=None)
+    parser.add_argument("--render_workers", type=int, default=1)
+    parser.add_argument("--pyramid_scale", type=int, choices=[1, 2, 4, 8], default=1)
+    parser.add_argument(
+        "--candidates", type=str, choices=["raster", "objects"], default="raster"
+    )
+    parser.add_argument("--layout_sample", type=int, default=0)
+    parser.add_argument("--layout_cache_path", type=str, default=None)
+    parser.add_argument(
+        "--remove_furniture", dest="remove_furniture", action="store_true"
+    )
+    parser.set_defaults(remove_furniture=False)
     parser.add_argument("--logs_path", type=str, default=None)
     parser.add_argument(
         "--reprocess-errors", dest="reprocess_errors", action="store_true"
@@ -74,8 +115,21 @@ def main():
         "num_workers": args.num_workers,
         "batch_size": args.batch_size,
         "debug": args.debug,
+        "browser_max_pages": args.browser_max_pages,
+        "measurement": args.measurement,
+        "backend": args.backend,
+        "artifacts_max_bytes": (
+            int(args.artifacts_max_gb * 1024**3) if args.artifacts_max_gb else None
+        ),
+        "page_cache_path": args.page_cache_path,
+        "render_workers": args.render_workers,
+        "pyramid_scale": args.pyramid_scale,
+        "candidate_source": args.candidates,
+        "layout_sample": args.layout_sample,
+        "layout_cache_path": args.layout_cache_path,
+        "remove_furniture": args.remove_furniture,
     }
-    bp.process_in_basket_mode(
+    metrics = bp.process_in_basket_mode(
         pdf_paths,
         artifacts_path,
         Path(args.outputs_path),
@@ -83,6 +137,7 @@ def main():
         args.create_folders,
         **opts
     )
+    print(bp.format_run_summary(metrics))
 
 
 if __name__ == "__main__":
@@ -28,6 +28,24 @@ def parse_args(args) -> Namespace:
     parser.add_argument("--logs_path", type=str, default=None)
     parser.add_argument("--num_workers", "-w", type=int, default=6)
     parser.add_argument("--batch_size", type=int, default=256)
+    parser.add_argument("--browser_max_pages", type=int, default=500)
+    parser.add_argument(
+        "--measurement", type=str, choices=["chrome", "fonts"], default="chrome"
+    )
+    parser.add_argument("--backend", type=str, choices=["xpdf", "pdf"], default="xpdf")
+    parser.add_argument("--artifacts_max_gb", type=float, default=None)
+    parser.add_argument("--page_cache_path", type=str, default=None)
+    parser.add_argument("--render_workers", type=int, default=1)
+    parser.add_argument("--pyramid_scale", type=int, choices=[1, 2, 4, 8], default=1)
+    parser.add_argument(
+        "--candidates", type=str, choices=["raster", "objects"], default="raster"
+    )
+    parser.add_argument("--layout_sample", type=int, default=0)
+    parser.add_argument("--layout_cache_path", type=str, default=None)
+    parser.add_argument(
+        "--remove_furniture", dest="remove_furniture", action="store_true"
+    )
+    parser.set_defaults(remove_furniture=False)
     parser.add_argument("--debug", dest="debug", action="store_true")
     parser.set_defaults(debug=False)
     parsed_args = parser.parse_args(args)
@@ -51,8 +69,22 @@ def main():
         "num_workers": args.num_workers,
         "batch_size": args.batch_size,
         "debug": args.debug,
+        "browser_max_pages": args.browser_max_pages,
+        "measurement": args.measurement,
+        "backend": args.backend,
+        "artifacts_max_bytes": (
+            int(args.artifacts_max_gb * 1024**3) if args.artifacts_max_gb else None
+        ),
+        "page_cache_path": args.page_cache_path,
+        "render_workers": args.render_workers,
+        "pyramid_scale": args.pyramid_scale,
+        "candidate_source": args.candidates,
+        "layout_sample": args.layout_sample,
+        "layout_cache_path": args.layout_cache_path,
+        "remove_furniture": args.remove_furniture,
     }
-    bp.process_in_folder_mode(pdf_paths, artifacts_path, logs_path, **opts)
+    metrics = bp.process_in_folder_mode(pdf_paths, artifacts_path, logs_path, **opts)
+    print(bp.format_run_summary(metrics))
 
 
 if __name__ == "__main__":
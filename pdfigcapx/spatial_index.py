@@ -0,0 +1,56 @@
+""" Uniform grid over the boxes of a page for window queries.
+Every box is stored in the cells its extent touches, so a query only reads the
+cells covering the window instead of scanning every box of the page. Queries
+return candidates: every box whose extent touches the window, closed on every
+side, is returned along with other boxes sharing its cells, and callers apply
+their exact predicates on them. Coordinates outside the page fall in the
+border cells.
+"""
+
+from math import ceil
+from typing import List
+
+from pdfigcapx.models import Bbox
+
+# cell side in html pixels, about three text rows at 72 dpi
+GRID_CELL_SIZE = 32
+
+
+class GridIndex:
+    """Grid of cell_size cells over a width x height page. Boxes are referred
+    to by their position in the list given on creation."""
+
+    def __init__(
+        self, boxes: List[Bbox], width: float, height: float, cell_size=GRID_CELL_SIZE
+    ):
+        self.cell_size = cell_size
+        self.n_cols = max(1, ceil(width / cell_size))
+        self.n_rows = max(1, ceil(height / cell_size))
+        self.cells: List[List[int]] = [[] for _ in range(self.n_cols * self.n_rows)]
+        for idx, box in enumerate(boxes):
+            col0, col1 = self._cols(min(box.x, box.x1), max(box.x, box.x1))
+            row0, row1 = self._rows(min(box.y, box.y1), max(box.y, box.y1))
+            for row in range(row0, row1 + 1):
+                for col in range(col0, col1 + 1):
+                    self.cells[row * self.n_cols + col].append(idx)
+
+    def _cell(self, value: float, n_cells: int) -> int:
+        return int(min(max(value / self.cell_size, 0), n_cells - 1))
+
+    def _cols(self, x0: float, x1: float):
+        return self._cell(x0, self.n_cols), self._cell(x1, self.n_cols)
+
+    def _rows(self, y0: float, y1: float):
+        return self._cell(y0, self.n_rows), self._cell(y1, self.n_rows)
+
+    def query(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        """Sorted positions of the boxes that may touch the window. Bounds can
+        be given in any order, and can be infinite, e.g., to query everything
+        above a line."""
+        col0, col1 = self._cols(min(x0, x1), max(x0, x1))
+        row0, row1 = self._rows(min(y0, y1), max(y0, y1))
+        found = set()
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                found.update(self.cells[row * self.n_cols + col])
+        return sorted(found)
@@ -1,9 +1,16 @@
+from math import inf
 import numpy as np
-from pdfigcapx.models import TextBox, Layout, Region, Bbox, Figure, AlignmentType
+from pdfigcapx.models import (
+    TextBox,
+    Layout,
+    Region,
+    Bbox,
+    BboxArray,
+    Figure,
+    AlignmentType,
+)
 from pdfigcapx.page import HtmlPage
-from pdfigcapx.utils import overlap_ratio_based
-from typing import List, Tuple
-from copy import copy, deepcopy
+from typing import List, Tuple, Union
 import logging
 
 from enum import Enum
@@ -185,7 +192,6 @@ def style_cut(bbox: Bbox, caption: TextBox, sweep_type: SweepType, layout: Layou
     TODO: Use the y value from text components to check if there is anything
     over the figure and below the top content region margin
     """
-    out_bbox = deepcopy(bbox)
     threshold_top = 40
     x_padding = 5
 
@@ -196,49 +202,49 @@ def style_cut(bbox: Bbox, caption: TextBox, sweep_type: SweepType, layout: Layou
         else layout.content_region.x1
     )
 
+    y0, y1 = bbox.y, bbox.y1
     if sweep_type == SweepType.CAPTIONS_BELOW_FIGURES:
         # check if there is anything above
-        out_bbox.y1 = max(bbox.y1, caption.y - 1)
+        y1 = max(bbox.y1, caption.y - 1)
 
-        if abs(layout.content_region.y - out_bbox.y) < threshold_top:
-            out_bbox.y = layout.content_region.y + layout.row_height
+        if abs(layout.content_region.y - y0) < threshold_top:
+            y0 = layout.content_region.y + layout.row_height
         else:
-            out_bbox.y -= layout.row_height
+            y0 -= layout.row_height
     elif sweep_type == SweepType.CAPTIONS_OVER_FIGURES:
-        out_bbox.y = min(bbox.y, caption.y - layout.row_height)
-        out_bbox.y1 += layout.row_height
+        y0 = min(bbox.y, caption.y - layout.row_height)
+        y1 += layout.row_height
     else:
-        out_bbox.y1 = max(out_bbox.y1, caption.y1)
+        y1 = max(y1, caption.y1)
+
+    return bbox.with_edges(x=x0, y=y0, x1=x1, y1=y1)
+
 
-    out_bbox.x = x0
-    out_bbox.x1 = x1
-    out_bbox.update_width()
-    out_bbox.update_height()
-    return out_bbox
+def _region_overlap_ratio(region: Bbox, candidates: BboxArray) -> np.ndarray:
+    """utils.overlap_ratio_based(region, candidate) for every candidate"""
+    region_area = region.width * region.height
+    if region_area == 0:
+        return np.zeros(len(candidates), dtype=np.float64)
+    return candidates.intersect_area(region) / region_area
 
 
 def match_figures_with_captions(
-    regions: List[Region], candidates: List[Bbox], sweep_type: str, layout: Layout
-) -> Tuple[List[Figure], List[TextBox], List[Bbox]]:
+    regions: List[Region], candidates: BboxArray, sweep_type: str, layout: Layout
+) -> Tuple[List[Figure], List[TextBox], BboxArray]:
     """Match candidate regions for captions to candidate figures per page"""
     # change the logic here. Every candidate figure inside the region can be
     # merged and be considered a figure.
     figures = []
     unmatched_caption_boxes = []
-    idxs_to_remove = []
+    matched = np.zeros(len(candidates), dtype=bool)
     for region in regions:
-        # keep index for easy removal
-        sparse_figures = [
-            (idx, x)
-            for idx, x in enumerate(candidates)
-            if overlap_ratio_based(x, region.bbox) > 0.5
-            or overlap_ratio_based(region.bbox, x) > 0.5
-        ]
-        bboxes = [x[1] for x in sparse_figures]
-
-        if len(sparse_figures) > 1:
+        sparse_figures = (candidates.overlap_ratio(region.bbox) > 0.5) | (
+            _region_overlap_ratio(region.bbox, candidates) > 0.5
+        )
+
+        if sparse_figures.sum() > 1:
             # check whether region is single column, but image is multicolumn
-            bbox = Bbox.merge_bboxes(bboxes)
+            bbox = candidates[sparse_figures].merge()
             bbox = style_cut(bbox, region.caption, sweep_type, layout)
 
             is_multicol = region.multicolumn
@@ -256,18 +262,15 @@ def match_figures_with_captions(
                 sweep_type=sweep_type,
             )
             figures.append(figure)
-            idxs_to_remove += [x[0] for x in sparse_figures]
+            matched |= sparse_figures
         else:
             unmatched_caption_boxes.append(region.caption)
 
-    remaining_candidates = [
-        x for idx, x in enumerate(candidates) if idx not in idxs_to_remove
-    ]
-    return figures, unmatched_caption_boxes, remaining_candidates
+    return figures, unmatched_caption_boxes, candidates[~matched]
 
 
 def greedy_swap(
-    page: HtmlPage, caption: TextBox, candidates: List[Bbox], layout: Layout
+    page: HtmlPage, caption: TextBox, candidates: BboxArray, layout: Layout
 ):
     """Match the caption with the region with the highest overlap between the
     region and the candidate bounding boxes.
@@ -280,11 +283,9 @@ def greedy_swap(
 
     bboxes = [None, None, None]
     for idx, region in enumerate(regions):
-        filtered_candidates = [
-            c for c in candidates if overlap_ratio_based(c, region.bbox) > 0.1
-        ]
+        filtered_candidates = candidates[candidates.overlap_ratio(region.bbox) > 0.1]
         if len(filtered_candidates) > 0:
-            bboxes[idx] = Bbox.merge_bboxes(filtered_candidates)
+            bboxes[idx] = filtered_candidates.merge()
             overlaps[idx] = region.bbox.intersect_area(bboxes[idx])
         else:
             overlaps[idx] = 0
@@ -302,28 +303,26 @@ def greedy_swap(
         )
         figure.identifier = regions[max_region_idx].caption.get_caption_identifier()
 
+        bbox = figure.bbox
         if max_region_idx == 0:  # image on top
             # sometimes text between figure and text is not captured by
             # the bounding box because it's not graphical content but text
-            figure.bbox.y1 = max(caption.y - layout.row_height, figure.bbox.y1)
+            bbox = bbox.with_edges(y1=max(caption.y - layout.row_height, bbox.y1))
             # move y a bit up in case we are missing any text
-            figure.bbox.y = _max_any_text_above(page, figure.bbox, layout, caption)
+            bbox = bbox.with_edges(y=_max_any_text_above(page, bbox, layout, caption))
         elif max_region_idx == 2:
-            figure.bbox.y = min(figure.bbox.y, caption.y - layout.row_height)
-            figure.bbox.update_height()
+            figure.bbox = bbox.with_edges(y=min(bbox.y, caption.y - layout.row_height))
             return figure
 
         if caption.alignment == AlignmentType.LEFT:
-            figure.bbox.x = layout.content_region.x
-            figure.bbox.x1 = layout.col_coords[1]
+            x0, x1 = layout.content_region.x, layout.col_coords[1]
         elif caption.alignment == AlignmentType.RIGHT:
-            figure.bbox.x = layout.col_coords[1]
-            figure.bbox.x1 = max(layout.content_region.x1, figure.bbox.x1)
+            x0 = layout.col_coords[1]
+            x1 = max(layout.content_region.x1, bbox.x1)
         else:  # AlignmentType.MULTICOLUMN
-            figure.bbox.x = max(layout.content_region.x, min(figure.bbox.x, caption.x))
-            figure.bbox.x1 = _min_any_text_to_the_right(page, figure.bbox, caption)
-        figure.bbox.update_height()
-        figure.bbox.update_width()
+            x0 = max(layout.content_region.x, min(bbox.x, caption.x))
+            x1 = _min_any_text_to_the_right(page, bbox, caption)
+        figure.bbox = bbox.with_edges(x=x0, y=bbox.y, x1=x1, y1=bbox.y1)
         return figure
     else:
         return None
@@ -342,10 +341,11 @@ def _max_any_text_above(
         min_x = layout.content_region.x
         max_x = layout.content_region.x1
 
+    max_y = bbox.y - 2 * layout.row_height
     text_boxes = [
         tb
-        for tb in page.text_boxes
-        if tb.y1 < bbox.y - 2 * layout.row_height and tb.x >= min_x and tb.x1 <= max_x
+        for tb in page.text_boxes_in(min_x, -inf, max_x, max_y)
+        if tb.y1 < max_y and tb.x >= min_x and tb.x1 <= max_x
         # this last option can be better optimized, probably I need to label
         # the text to know if it's part of a paragraph or a title to avoid them
         and tb.width > bbox.width / 2
@@ -368,7 +368,7 @@ def _min_any_text_to_the_right(page: HtmlPage, bbox: Bbox, caption: TextBox) ->
     """
     text_boxes = [
         tb
-        for tb in page.text_boxes
+        for tb in page.text_boxes_in(bbox.x1, bbox.y, inf, bbox.y1)
         if tb.x > bbox.x1 and tb.y > bbox.y and tb.y1 < bbox.y1
     ]
     min_x1 = None
@@ -383,15 +383,15 @@ def _min_any_text_to_the_right(page: HtmlPage, bbox: Bbox, caption: TextBox) ->
 
 def get_figures(
     page: HtmlPage,
-    candidates: List[Bbox],
+    candidates: BboxArray,
     captions: List[TextBox],
     layout: Layout,
     sweep_type: str,
-) -> Tuple[List[Figure], List[TextBox], List[Bbox]]:
+) -> Tuple[List[Figure], List[TextBox], BboxArray]:
     if len(captions) == 1 and len(candidates) > 0:
         figure = greedy_swap(page, captions[0], candidates, layout)
         if figure:
-            return [figure], [], []
+            return [figure], [], candidates[:0]
         else:
             return [], captions, candidates
 
@@ -411,7 +411,7 @@ def get_figures(
 
 def sweep_regions(
     page: HtmlPage,
-    candidates: List[Bbox],
+    candidates: Union[BboxArray, List[Bbox]],
     fig_captions: List[TextBox],
     table_captions: List[TextBox],
     layout: Layout,
@@ -422,8 +422,10 @@ def sweep_regions(
         (SweepType.CAPTIONS_NEXT_TO_FIGURES, "figures"),
     ]
 
-    remaining_candidates = deepcopy(candidates)
-    remaining_captions = deepcopy(fig_captions)
+    if not isinstance(candidates, BboxArray):
+        candidates = BboxArray.from_bboxes(candidates)
+    remaining_candidates = candidates
+    remaining_captions = fig_captions
     for strategy, _ in sweep_strategy:
         figures, remaining_captions, remaining_candidates = get_figures(
             page, remaining_candidates, remaining_captions, layout, strategy
@@ -435,7 +437,7 @@ def sweep_regions(
 
     # saving orphans
     if len(remaining_candidates) > 0:
-        orphan_bbox = Bbox.merge_bboxes(remaining_candidates)
+        orphan_bbox = remaining_candidates.merge()
         page.orphan_figure = Figure(
             bbox=orphan_bbox, sweep_type="orphan", multicolumn=True, caption=None
         )
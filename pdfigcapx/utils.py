@@ -1,18 +1,20 @@
 """ Utility functions invoking system packages to process PDFs """
 
-from os import system
 from os.path import exists, join
 from pathlib import Path
 from re import split as re_split
-from subprocess import check_output
-from typing import List
+from subprocess import PIPE, CalledProcessError, Popen, check_output
+from queue import Full, Queue
+from tempfile import TemporaryFile
+from threading import Event, Thread
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from numpy import ndarray
+from PIL import Image as PILImage
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup
 
-from pdfigcapx.models import TextBox, Bbox
+from pdfigcapx.models import PageText, TextBox, Bbox, BboxArray
 from pdfigcapx.page import HtmlPage
 
 
@@ -28,11 +30,205 @@ def natural_sort(arr: List[str]) -> List[str]:
 
 
 def pdf2images(file_path: str, output_path: str, dpi=300) -> None:
-    """convert PDF to images and save them on output location"""
-    gs_cmd = f"gs -q -sDEVICE=png16m \
-        -o {join(output_path, 'file-%02d.png')} -r{dpi} {file_path}"
-    # TODO: how to capture an error from the ghostscript command?
-    system(gs_cmd)
+    """convert PDF to images and save them on output location
+    Raises
+    ------
+    CalledProcessError
+        If ghostscript fails to render the document
+    """
+    check_output(
+        [
+            "gs",
+            "-q",
+            "-dSAFER",
+            "-dBATCH",
+            "-dNOPAUSE",
+            "-sDEVICE=png16m",
+            f"-r{dpi}",
+            f"-o{join(output_path, 'file-%02d.png')}",
+            str(file_path),
+        ]
+    )
+
+
+def _read_ppm_token(stream: BinaryIO) -> Optional[bytes]:
+    """Read the next whitespace separated token of a PPM header, skipping
+    comments. Returns None at the end of the stream."""
+    token = b""
+    while True:
+        char = stream.read(1)
+        if not char:
+            return token or None
+        if char == b"#" and not token:
+            stream.readline()
+        elif char.isspace():
+            if token:
+                return token
+        else:
+            token += char
+
+
+def read_ppm_frame(stream: BinaryIO) -> Optional[PILImage.Image]:
+    """Decode the next binary PPM (P6) image in the stream, or None when the
+    stream is exhausted"""
+    magic = _read_ppm_token(stream)
+    if magic is None:
+        return None
+    if magic != b"P6":
+        raise Exception(f"unexpected PPM frame {magic!r}")
+    width, height, max_value = [int(_read_ppm_token(stream)) for _ in range(3)]
+    if max_value != 255:
+        raise Exception(f"unsupported PPM max value {max_value}")
+    size = width * height * 3
+    pixels = stream.read(size)
+    if len(pixels) != size:
+        raise Exception("truncated PPM frame")
+    return PILImage.frombuffer("RGB", (width, height), pixels, "raw", "RGB", 0, 1)
+
+
+def stream_pdf_images(
+    file_path: str, dpi=300, pages: Optional[List[int]] = None
+) -> Iterator[PILImage.Image]:
+    """Render the PDF pages with ghostscript and yield them one at a time as
+    RGB images. Pages are piped from ghostscript as PPM frames, so there are no
+    intermediate files and only the page being decoded is held in memory.
+    Parameters:
+    ----------
+    - pages: List[int]
+        Numbers of the pages to render in ascending order, starting at 1. None
+        renders every page
+    Raises
+    ------
+    CalledProcessError
+        If ghostscript fails to render the document
+    """
+    cmd = [
+        "gs",
+        "-q",
+        "-dSAFER",
+        "-dBATCH",
+        "-dNOPAUSE",
+        "-sDEVICE=ppmraw",
+        "-sstdout=%stderr",
+        f"-r{dpi}",
+    ]
+    if pages is not None:
+        cmd.append(f"-sPageList={','.join([str(number) for number in pages])}")
+    cmd += ["-o", "-", str(file_path)]
+    # stderr goes to a file, a full stderr pipe would block ghostscript
+    with TemporaryFile() as stderr, Popen(cmd, stdout=PIPE, stderr=stderr) as proc:
+        try:
+            while True:
+                image = read_ppm_frame(proc.stdout)
+                if image is None:
+                    break
+                yield image
+        except BaseException:
+            # consumer stopped early or decoding failed
+            proc.kill()
+            raise
+        if proc.wait() != 0:
+            stderr.seek(0)
+            raise CalledProcessError(proc.returncode, cmd, stderr=stderr.read())
+
+
+def _put(queue: Queue, item, stop: Event) -> bool:
+    """Put the item unless the consumer stopped. Returns whether it was put."""
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def _render_chunk(
+    file_path: str, dpi: int, pages: List[int], queue: Queue, stop: Event
+) -> None:
+    """Thread target rendering a chunk of pages into the queue. Errors are put
+    in the queue so that the consumer raises them in page order."""
+    images = stream_pdf_images(file_path, dpi=dpi, pages=pages)
+    try:
+        for image in images:
+            if not _put(queue, image, stop):
+                break
+        # only read if ghostscript rendered fewer pages than requested
+        _put(queue, None, stop)
+    # pylint: disable=W0718:broad-exception-caught
+    except Exception as error:
+        _put(queue, error, stop)
+    finally:
+        images.close()
+
+
+def stream_pdf_images_parallel(
+    file_path: str, dpi=300, pages: Optional[List[int]] = None, workers=1, queue_size=2
+) -> Iterator[PILImage.Image]:
+    """Render the pages with up to `workers` ghostscript processes in parallel
+    and yield them in page order, as stream_pdf_images. Every process renders a
+    strided chunk of the pages (e.g. 1,3,5 and 2,4,6) so that the next page in
+    order is always among the first ones in progress. Each process is at most
+    queue_size pages ahead of the consumer, bounding the memory in use.
+    Raises
+    ------
+    CalledProcessError
+        If any ghostscript process fails to render its pages
+    """
+    if pages is None or workers <= 1 or len(pages) <= 1:
+        yield from stream_pdf_images(file_path, dpi=dpi, pages=pages)
+        return
+
+    workers = min(workers, len(pages))
+    stop = Event()
+    queues = [Queue(maxsize=queue_size) for _ in range(workers)]
+    threads = [
+        Thread(
+            target=_render_chunk,
+            args=(file_path, dpi, pages[idx::workers], queues[idx], stop),
+            daemon=True,
+        )
+        for idx in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for idx, number in enumerate(pages):
+            item = queues[idx % workers].get()
+            if isinstance(item, Exception):
+                raise item
+            if item is None:
+                raise Exception(f"ghostscript did not render page {number}")
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def pdf2background_images(file_path: str, output_path: str, dpi=150) -> None:
+    """Render the PDF pages without text as page1.png, page2.png, etc. These
+    images match the background images that pdftohtml writes next to the html
+    pages, where text is left out of the graphical content.
+    Raises
+    ------
+    CalledProcessError
+        If ghostscript fails to render the document
+    """
+    check_output(
+        [
+            "gs",
+            "-q",
+            "-dSAFER",
+            "-dBATCH",
+            "-dNOPAUSE",
+            "-dFILTERTEXT",
+            "-sDEVICE=png16m",
+            f"-r{dpi}",
+            f"-o{join(output_path, 'page%d.png')}",
+            str(file_path),
+        ]
+    )
 
 
 def pdf2html(file_path: str, output_base_path: str, new_folder_name: str) -> str:
@@ -87,6 +283,27 @@ def launch_chromedriver() -> webdriver.Chrome:
     return driver
 
 
+# Collects the page size and every text div rect and content in a single
+# WebDriver round-trip. Rects follow WebElement.rect, i.e., relative to the
+# document and not to the viewport. textContent matches bs4's get_text.
+PAGE_CONTENT_SCRIPT = """
+const img = document.querySelector("body > img");
+const imgRect = img.getBoundingClientRect();
+const divs = document.getElementsByClassName("txt");
+const boxes = Array.from(divs, (div) => {
+  const rect = div.getBoundingClientRect();
+  return [
+    rect.left + window.scrollX,
+    rect.top + window.scrollY,
+    rect.width,
+    rect.height,
+    div.textContent,
+  ];
+});
+return { width: imgRect.width, height: imgRect.height, boxes: boxes };
+"""
+
+
 def extract_page_text_content(
     browser: webdriver.Chrome, html_page_path: str
 ) -> HtmlPage:
@@ -97,10 +314,9 @@ def extract_page_text_content(
     content is stored in divs of class 'txt', which also provide the location
     in the page as left and top style attributes. However, as we need to use
     the div box size in later calculations, we use Selenium's webdriver to
-    compute the width and height. Each resulting web component also provides
-    the text content but accessing elem.text is very slow. Instead, we read
-    the html content and parse it with bs4. Using Selenium for text can be
-    2.5X slower.
+    compute the width and height. Reading the rect and text of every web
+    element is one HTTP round-trip per call, so instead we run a single
+    script that returns the image size and every div rect and text at once.
     Parameters:
     ----------
     - browser: webdriver.Chrome
@@ -111,57 +327,44 @@ def extract_page_text_content(
     - HtmlPage
         Page object holding the parsed raw data
     """
-    # read with webchromedriver to get the computed sizes
     html_file = f"file://{html_page_path}"
     browser.get(html_file)
+    content = browser.execute_script(PAGE_CONTENT_SCRIPT)
+    return build_html_page(
+        html_page_path, content["width"], content["height"], content["boxes"]
+    )
+
+
+def build_html_page(
+    html_page_path: str,
+    width: int,
+    height: int,
+    boxes: List[Tuple[float, float, float, float, str]],
+) -> HtmlPage:
+    """Create the page from the measured text divs given as (x, y, width, height,
+    text) in document order. Text boxes that may start a figure caption are
+    kept apart as captions.
+    """
     html_path = Path(html_page_path)
     page_number = int(html_path.stem[4:])  # prefix is page (e.g. page1)
-    page_layout = browser.find_element(By.XPATH, "/html/body/img")
-    div_components = browser.find_elements(By.CLASS_NAME, "txt")
 
+    page_text = PageText.from_texts(page_number, [el[4] for el in boxes])
     text_boxes = []
     captions = []
-    # read with bs4 to read the text faster than div_comps[i].text
-    try:
-        with open(html_path.resolve(), "r") as f:
-            html_content = f.read()
-        soup = BeautifulSoup(html_content, "html.parser")
-        divs = soup.find_all("div", class_="txt")
-        for idx, (comp, div) in enumerate(zip(div_components, divs)):
-            args = {
-                **comp.rect,
-                "id": idx,
-                "page_number": page_number,
-                "text": div.get_text(),
-            }
-            text_box = TextBox(**args)
-            if text_box.can_be_caption(type="figure"):
-                captions.append(text_box)
-            else:
-                text_boxes.append(text_box)
-    except UnicodeDecodeError:
-        # some html files may have conflicting characters with utf-8, in those
-        # cases try to read with the text from the web components
-        text_boxes = []
-        for idx, comp in enumerate(div_components):
-            args = {
-                **comp.rect,
-                "id": idx,
-                "page_number": page_number,
-                "text": comp.text,
-            }
-            text_box = TextBox(**args)
-            if text_box.can_be_caption(type="figure"):
-                captions.append(text_box)
-            else:
-                text_boxes.append(text_box)
-            text_boxes.append(TextBox(**args))
+    for idx, (x, y, box_width, box_height, _) in enumerate(boxes):
+        text_box = TextBox.from_page_text(
+            x, y, box_width, box_height, idx, page_text, idx
+        )
+        if text_box.can_be_caption(type="figure"):
+            captions.append(text_box)
+        else:
+            text_boxes.append(text_box)
 
     return HtmlPage(
         name=html_path.name,
         img_name=f"{html_path.stem}.png",
-        width=page_layout.size["width"],
-        height=page_layout.size["height"],
+        width=width,
+        height=height,
         text_boxes=text_boxes,
         captions=captions,
         number=page_number,
@@ -181,6 +384,11 @@ def overlap_ratio_based(box1: Bbox, box2: Bbox) -> float:
     return overlap_ratio
 
 
+def overlap_ratios_based(boxes: ndarray, box2: Bbox) -> ndarray:
+    """overlap_ratio_based for every row [x, y, width, height] of boxes"""
+    return BboxArray(boxes).overlap_ratio(box2)
+
+
 def batch(iterable, n=256):
     """Create an iterable to process a long list in batches.
     Needed to process the data in batches and guarantee that we are not filling
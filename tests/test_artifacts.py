@@ -0,0 +1,74 @@
+""" testing the content-addressed artifacts store """
+
+from os import makedirs
+
+import pytest
+
+from pdfigcapx.artifacts import COMPLETE_MARKER, content_hash, ensure_artifacts
+
+
+class FakeConverter:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    def __call__(self, pdf_path, output_path):
+        self.calls += 1
+        makedirs(output_path)
+        (output_path / "page1.html").write_text(pdf_path.name)
+        if self.fail:
+            raise RuntimeError("pdftohtml failed")
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    inputs = tmp_path / "inputs"
+    makedirs(inputs / "other")
+    (inputs / "a.pdf").write_bytes(b"%PDF-1.4 first")
+    (inputs / "b.pdf").write_bytes(b"%PDF-1.4 first")
+    (inputs / "other" / "a.pdf").write_bytes(b"%PDF-1.4 second")
+    return inputs
+
+
+def test_same_content_shares_conversion(pdfs, tmp_path):
+    convert = FakeConverter()
+    folder_a, reused_a = ensure_artifacts(pdfs / "a.pdf", tmp_path, "xpdf", convert)
+    folder_b, reused_b = ensure_artifacts(pdfs / "b.pdf", tmp_path, "xpdf", convert)
+    assert convert.calls == 1
+    assert (reused_a, reused_b) == (False, True)
+    assert folder_a == folder_b
+    assert folder_a.name == f"xpdf_{content_hash(pdfs / 'a.pdf')}"
+    assert (folder_a / COMPLETE_MARKER).exists()
+
+    digest = content_hash(pdfs / "other" / "a.pdf")
+    folder, reused = ensure_artifacts(
+        pdfs / "other" / "a.pdf", tmp_path, "xpdf", convert, digest=digest
+    )
+    assert (folder.name, reused, convert.calls) == (f"xpdf_{digest}", False, 2)
+
+
+def test_same_name_different_content(pdfs, tmp_path):
+    convert = FakeConverter()
+    folder_1, _ = ensure_artifacts(pdfs / "a.pdf", tmp_path, "xpdf", convert)
+    folder_2, _ = ensure_artifacts(pdfs / "other" / "a.pdf", tmp_path, "xpdf", convert)
+    assert convert.calls == 2
+    assert folder_1 != folder_2
+
+
+def test_incomplete_folder_is_regenerated(pdfs, tmp_path):
+    stale = tmp_path / f"xpdf_{content_hash(pdfs / 'a.pdf')}"
+    makedirs(stale)
+    (stale / "page1.html").write_text("half written")
+    convert = FakeConverter()
+    folder, reused = ensure_artifacts(pdfs / "a.pdf", tmp_path, "xpdf", convert)
+    assert not reused
+    assert convert.calls == 1
+    assert (folder / "page1.html").read_text() == "a.pdf"
+
+
+def test_failed_conversion_leaves_nothing(pdfs, tmp_path):
+    artifacts = tmp_path / "artifacts"
+    makedirs(artifacts)
+    with pytest.raises(RuntimeError):
+        ensure_artifacts(pdfs / "a.pdf", artifacts, "xpdf", FakeConverter(fail=True))
+    assert list(artifacts.iterdir()) == []
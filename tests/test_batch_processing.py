@@ -0,0 +1,67 @@
+""" testing the artifacts garbage collection """
+
+from json import dumps as json_dumps
+from os import makedirs, utime
+
+from pdfigcapx.artifacts import COMPLETE_MARKER, content_hash
+from pdfigcapx.batch_processing import ArtifactManager
+
+
+def make_artifacts(base_path, digest, size, last_use):
+    folder = base_path / f"xpdf_{digest}"
+    makedirs(folder)
+    (folder / "page1.png").write_bytes(b"0" * size)
+    marker = folder / COMPLETE_MARKER
+    marker.write_text(json_dumps({"sha256": digest, "bytes": size}))
+    utime(marker, (last_use, last_use))
+    return folder
+
+
+def test_evicts_least_recently_used(tmp_path):
+    folders = [
+        make_artifacts(tmp_path, f"{idx:064x}", 100, 1000 + idx) for idx in range(4)
+    ]
+    manager = ArtifactManager(tmp_path, max_bytes=250)
+    evicted = manager.collect(force=True)
+
+    assert evicted["artifacts_evictions"] == 2
+    assert evicted["artifacts_evicted_bytes"] == 200
+    assert [folder.exists() for folder in folders] == [False, False, True, True]
+    assert [el.name for el in tmp_path.iterdir() if el.name.startswith(".")] == []
+
+
+def test_pinned_folders_are_not_evicted(tmp_path):
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    digest = content_hash(pdf_path)
+    pinned = make_artifacts(tmp_path, digest, 100, 1000)
+    other = make_artifacts(tmp_path, f"{1:064x}", 100, 2000)
+
+    manager = ArtifactManager(tmp_path, max_bytes=150)
+    manager.pin(digest)
+    manager.collect(force=True)
+    assert pinned.exists()
+    assert not other.exists()
+
+    manager.unpin(digest)
+    manager.max_bytes = 50
+    manager.collect(force=True)
+    assert not pinned.exists()
+
+
+def test_record_use_refreshes_recency(tmp_path):
+    old = make_artifacts(tmp_path, f"{0:064x}", 100, 1000)
+    recent = make_artifacts(tmp_path, f"{1:064x}", 100, 2000)
+    manager = ArtifactManager(tmp_path, max_bytes=150, collect_interval=1)
+    manager.record_use(old)
+    evicted = manager.collect()
+
+    assert old.exists()
+    assert not recent.exists()
+    assert evicted["artifacts_evictions"] == 1
+
+
+def test_no_budget_keeps_everything(tmp_path):
+    folder = make_artifacts(tmp_path, f"{0:064x}", 100, 1000)
+    assert ArtifactManager(tmp_path).collect(force=True) == {}
+    assert folder.exists()
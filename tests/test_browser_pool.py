@@ -0,0 +1,64 @@
+""" testing the browser pool without launching chromedriver """
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from pdfigcapx.browser_pool import BrowserPool
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.alive = True
+        self.quitted = False
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise WebDriverException("session deleted")
+        return 1
+
+    def quit(self):
+        self.quitted = True
+
+
+def test_browser_reused_across_borrows():
+    """A healthy browser under the page limit is lent again"""
+    pool = BrowserPool(max_pages=10, launcher=FakeBrowser)
+    with pool.borrow() as lease:
+        first = lease.browser
+        lease.pages += 3
+    with pool.borrow() as lease:
+        assert lease.browser is first
+        assert lease.pages == 3
+    pool.close()
+    assert first.quitted
+
+
+def test_browser_recycled_after_max_pages():
+    pool = BrowserPool(max_pages=5, launcher=FakeBrowser)
+    with pool.borrow() as lease:
+        first = lease.browser
+        lease.pages += 5
+    assert first.quitted
+    with pool.borrow() as lease:
+        assert lease.browser is not first
+
+
+def test_unhealthy_browser_replaced():
+    pool = BrowserPool(max_pages=10, launcher=FakeBrowser)
+    with pool.borrow() as lease:
+        first = lease.browser
+    first.alive = False
+    with pool.borrow() as lease:
+        assert lease.browser is not first
+    assert first.quitted
+
+
+def test_browser_discarded_on_webdriver_error():
+    pool = BrowserPool(max_pages=10, launcher=FakeBrowser)
+    with pytest.raises(WebDriverException):
+        with pool.borrow() as lease:
+            first = lease.browser
+            raise WebDriverException("crash")
+    assert first.quitted
+    with pool.borrow() as lease:
+        assert lease.browser is not first
@@ -0,0 +1,255 @@
+""" testing the candidate engines """
+
+import numpy as np
+from cv2 import imwrite
+
+from pdfigcapx import contours
+from pdfigcapx.models import Bbox, Layout
+from pdfigcapx.page import HtmlPage
+from pdfigcapx.utils import overlap_ratio_based, overlap_ratios_based
+
+
+def _random_binary(rng, height, width):
+    image = (rng.random((height, width)) < rng.uniform(0.01, 0.6)).astype(np.uint8)
+    return contours.dilate(image * 255, np.ones((3, 3), np.uint8))
+
+
+def test_component_boxes_match_contour_boxes():
+    """Connected components give the boxes of findContours, in the same order"""
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        height, width = rng.integers(5, 120, 2)
+        binary = _random_binary(rng, height, width)
+        expected = contours.contour_boxes(binary)
+        assert contours.component_boxes(binary).tolist() == expected.tolist()
+
+
+def test_nested_shapes_are_not_candidates():
+    """Shapes inside the hole of another shape are not external contours"""
+    binary = np.zeros((60, 60), dtype=np.uint8)
+    binary[5:55, 5:55] = 255
+    binary[10:50, 10:50] = 0
+    binary[20:30, 20:30] = 255
+    assert contours.component_boxes(binary).tolist() == [[5, 5, 50, 50]]
+    assert contours.component_boxes(np.zeros((4, 4), np.uint8)).shape == (0, 4)
+
+
+def test_detect_contours_engines(tmp_path):
+    rng = np.random.default_rng(3)
+    image = np.full((400, 300, 3), 255, dtype=np.uint8)
+    image[_random_binary(rng, 400, 300) > 0] = 0
+    imwrite(str(tmp_path / "page1.png"), image)
+    page = HtmlPage(
+        name="page1.html",
+        width=150,
+        height=200,
+        img_name="page1.png",
+        number=1,
+        text_boxes=[],
+        captions=[],
+    )
+
+    boxes = contours.detect_contours(str(tmp_path), page, contours.COMPONENTS)
+    expected = contours.detect_contours(str(tmp_path), page, contours.CONTOURS)
+    assert boxes.dtype == np.int32
+    assert boxes.tolist() == expected.tolist()
+
+
+def test_detect_contours_reuse_the_page_image(tmp_path):
+    """The page already read gives the contours without reading the PNG"""
+    rng = np.random.default_rng(11)
+    image = np.full((400, 300, 3), 255, dtype=np.uint8)
+    image[_random_binary(rng, 400, 300) > 0] = (40, 90, 200)
+    imwrite(str(tmp_path / "page1.png"), image)
+    page = HtmlPage("page1.html", 150, 200, "page1.png", 1, [], [])
+    gray = contours.page_gray(str(tmp_path), page)
+    for scale in [1, 2, 4]:
+        expected = contours.detect_contours(str(tmp_path), page, pyramid_scale=scale)
+        boxes = contours.detect_contours(
+            str(tmp_path / "missing"), page, pyramid_scale=scale, gray=gray
+        )
+        assert boxes.tolist() == expected.tolist()
+
+
+def test_overlap_ratios_based():
+    region = Bbox(10, 10, 100.5, 80)
+    boxes = np.array([[0, 0, 20, 20], [15, 15, 5, 5], [200, 0, 4, 4], [12, 12, 0, 9]])
+    expected = [overlap_ratio_based(Bbox(*el), region) for el in boxes.tolist()]
+    assert overlap_ratios_based(boxes, region).tolist() == expected
+
+
+def _naive_cross_column_groups(cnts, x_cross, content_region):
+    """Reference pairwise implementation"""
+    groups = []
+    for i, cnt in enumerate(cnts):
+        if cnt.x < x_cross and cnt.x1 > x_cross:
+            idxs_merge = [i]
+            for j, cnt_eval in enumerate(cnts):
+                if cnt != cnt_eval:
+                    row_region = Bbox(
+                        content_region.x, cnt.y, content_region.width, cnt.height
+                    )
+                    if row_region.intersect_area(cnt_eval) > 0:
+                        idxs_merge.append(j)
+            if len(idxs_merge) > 1:
+                groups.append(idxs_merge)
+    return groups
+
+
+def test_cross_column_groups_match_pairwise_merge():
+    rng = np.random.default_rng(11)
+    content_region = Bbox(40, 50, 520.5, 700)
+    for _ in range(100):
+        cnts = [
+            Bbox(*el)
+            for el in zip(
+                rng.integers(0, 600, 150).tolist(),
+                rng.integers(0, 800, 150).tolist(),
+                rng.integers(0, 300, 150).tolist(),
+                rng.integers(0, 60, 150).tolist(),
+            )
+        ]
+        cnts += cnts[:5]  # duplicates are not merged with their equals
+        cnts.append(Bbox(500, 0, 40, int(rng.choice([60, 800]))))  # tall contour
+        assert contours.cross_column_groups(
+            cnts, 300, content_region
+        ) == _naive_cross_column_groups(cnts, 300, content_region)
+    assert contours.cross_column_groups([], 300, content_region) == []
+
+
+def test_pyramid_boxes_match_full_resolution(tmp_path):
+    """High contrast shapes are found with the same boxes on a reduced page"""
+    image = np.full((800, 600), 255, dtype=np.uint8)
+    image[100:300, 50:400] = 0
+    image[120:280, 70:380] = 255
+    image[500:520, 100:500] = 0
+    image[600:700, 450:460] = 30
+    png_path = str(tmp_path / "page1.png")
+    imwrite(png_path, image)
+    expected = contours.graphics_boxes(image)
+    for scale in [2, 4]:
+        boxes = contours.pyramid_boxes(png_path, scale)
+        assert boxes.tolist() == expected.tolist()
+    imwrite(png_path, np.full((800, 600), 255, dtype=np.uint8))
+    assert contours.pyramid_boxes(png_path, 4).shape == (0, 4)
+
+
+def test_pyramid_boxes_keep_thin_lines(tmp_path):
+    """One pixel lines are averaged, not sampled away, on the reduced page"""
+    image = np.full((800, 600), 255, dtype=np.uint8)
+    image[100:400, 203] = 0
+    image[500, 50:550] = 120
+    png_path = str(tmp_path / "page1.png")
+    imwrite(png_path, image)
+    expected = contours.graphics_boxes(image)
+    assert contours.pyramid_boxes(png_path, 8).tolist() == expected.tolist()
+
+
+def test_has_graphics(tmp_path):
+    """Blank pages and isolated specks have no graphics, thin lines do"""
+    page = HtmlPage(
+        name="page1.html",
+        width=300,
+        height=400,
+        img_name="page1.png",
+        number=1,
+        text_boxes=[],
+        captions=[],
+    )
+    image = np.full((800, 600, 3), 255, dtype=np.uint8)
+    imwrite(str(tmp_path / "page1.png"), image)
+    assert not contours.has_graphics(str(tmp_path), page)
+    image[400, 300] = 0
+    imwrite(str(tmp_path / "page1.png"), image)
+    assert not contours.has_graphics(str(tmp_path), page)
+    image[100:300, 200] = 0
+    imwrite(str(tmp_path / "page1.png"), image)
+    assert contours.has_graphics(str(tmp_path), page)
+
+    page.raw_contours = np.zeros((0, 4), dtype=np.int32)
+    assert not contours.has_graphics(str(tmp_path), page)
+
+
+def test_furniture_mask():
+    """A logo on most pages is furniture, a figure on a single page is not"""
+    thumbnails = []
+    for idx in range(5):
+        thumbnail = np.full((100, 80), 255, dtype=np.uint8)
+        if idx != 2:
+            thumbnail[2:6, 60:75] = 0  # logo
+        if idx == 3:
+            thumbnail[40:70, 10:70] = 0  # figure
+        thumbnails.append(thumbnail)
+    thumbnails.append(np.full((80, 100), 0, dtype=np.uint8))  # landscape page
+    mask = contours.furniture_mask(thumbnails)
+    assert mask.shape == (100, 80)
+    assert mask[2:6, 60:75].all()
+    assert not mask[40:70, 10:70].any()
+    assert contours.furniture_mask(thumbnails[:2]) is None
+
+    page = HtmlPage(
+        name="page4.html",
+        width=320,
+        height=400,
+        img_name="page4.png",
+        number=4,
+        text_boxes=[],
+        captions=[],
+    )
+    boxes = np.array([[240, 8, 60, 16], [40, 160, 240, 120], [236, 4, 100, 200]])
+    coverage = contours.furniture_coverage(boxes, mask, page)
+    assert coverage[0] == 1.0
+    assert coverage[1] == 0.0
+    assert 0 < coverage[2] < contours.FURNITURE_COVERAGE
+
+    assert contours.has_graphics("", page, thumbnails[3], mask)
+    assert not contours.has_graphics("", page, thumbnails[0], mask)
+
+
+def test_furniture_mask_keeps_repeated_figures():
+    """A figure at about the same place on every page, as in supplementary
+    files, is not furniture, while rules and banners around it are"""
+    rng = np.random.default_rng(3)
+    # a 320x400 html page, content region in thumbnail pixels [5, 75) x [10, 90)
+    layout = Layout(320, 400, 1, 280, 11, Bbox(20, 40, 280, 320), [20])
+    thumbnails = []
+    for _ in range(10):
+        thumbnail = np.full((100, 80), 255, dtype=np.uint8)
+        thumbnail[1:6, 5:75] = 0  # banner in the header band
+        thumbnail[12, 5:75] = 0  # header rule
+        dx, dy = rng.integers(-2, 3, 2)
+        thumbnail[25 + dy : 80 + dy, 10 + dx : 70 + dx] = rng.integers(0, 200)
+        thumbnails.append(thumbnail)
+    mask = contours.furniture_mask(thumbnails, layout)
+    assert mask[1:6, 5:75].all() and mask[12, 5:75].all()
+    assert not mask[30:75, 15:65].any()
+    assert contours.furniture_mask(thumbnails)[12, 5:75].all()
+
+    page = HtmlPage("page2.html", 320, 400, "page2.png", 2, [], [])
+    boxes = np.array([[40, 100, 240, 220], [20, 4, 280, 20]])
+    coverage = contours.furniture_coverage(boxes, mask, page)
+    assert coverage[0] < contours.FURNITURE_COVERAGE
+    assert coverage[1] >= contours.FURNITURE_COVERAGE
+    assert all([contours.has_graphics("", page, el, mask) for el in thumbnails])
+
+
+def test_known_contours_skip_the_page_png(tmp_path):
+    """Thumbnails and graphics checks of pages with known contours only read
+    the PNG header"""
+    imwrite(str(tmp_path / "page1.png"), np.full((833, 638), 255, dtype=np.uint8))
+    page = HtmlPage("page1.html", 306, 400, "page1.png", 1, [], [])
+    page.raw_contours = np.array([[240, 8, 40, 16], [40, 160, 200, 120]])
+    thumbnail = contours.contours_thumbnail(str(tmp_path), page)
+    assert thumbnail.shape == contours.page_thumbnail(str(tmp_path), page).shape
+    scaling = 638 / 306 / contours.THUMBNAIL_SCALE
+    assert thumbnail[int(12 * scaling), int(260 * scaling)] == 0
+    assert thumbnail[int(300 * scaling), int(100 * scaling)] == 255
+    assert (thumbnail < contours.THUMBNAIL_INK).sum() < thumbnail.size / 4
+
+    furniture = np.zeros(thumbnail.shape, dtype=bool)
+    furniture[: int(30 * scaling), int(230 * scaling) :] = True
+    (tmp_path / "page1.png").unlink()
+    assert contours.has_graphics("", page, None, furniture)
+    page.raw_contours = page.raw_contours[:1]
+    assert not contours.has_graphics("", page, None, furniture)
+    assert contours.has_graphics("", page)
@@ -0,0 +1,150 @@
+""" testing the pdf ingestion backend """
+
+import pytest
+
+from pdfigcapx.contours import object_contours
+from pdfigcapx.ingestion import extract_graphics_boxes, extract_pdf_pages
+from pdfigcapx.page import HtmlPage
+
+pytest.importorskip("pdfminer")
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    """One letter-size page with a title, a plot and a caption"""
+    # pylint: disable=import-outside-toplevel
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8.5, 11))
+    fig.text(72 / 612, 1 - 80 / 792, "Introduction", fontsize=12, va="top")
+    fig.text(72 / 612, 1 - 400 / 792, "Figure 1. Overview", fontsize=10, va="top")
+    path = tmp_path / "doc.pdf"
+    fig.savefig(path)
+    return path
+
+
+def pages_stub(width, height):
+    return HtmlPage(
+        name="page1.html",
+        width=width,
+        height=height,
+        img_name="page1.png",
+        number=1,
+        text_boxes=[],
+        captions=[],
+    )
+
+
+def test_extract_pdf_pages(pdf_path):
+    """Text lines are placed in pdftohtml coordinates (72 dpi, top-left origin)"""
+    pages = extract_pdf_pages(pdf_path)
+    assert len(pages) == 1
+    page = pages[0]
+    assert (page.width, page.height) == (612, 792)
+    assert page.number == 1
+    assert page.img_name == "page1.png"
+
+    assert len(page.text_boxes) == 1
+    title = page.text_boxes[0]
+    assert title.text == "Introduction"
+    assert title.x == pytest.approx(72, abs=1)
+    assert 78 <= title.y <= 86
+
+    assert len(page.captions) == 1
+    assert page.captions[0].text == "Figure 1. Overview"
+    assert page.captions[0].y > title.y1
+
+
+def test_extract_graphics_boxes(tmp_path):
+    """Images and vector drawings are placed in pdftohtml coordinates, the
+    page background is left out, and they become contours as in the PNGs"""
+    # pylint: disable=import-outside-toplevel
+    from matplotlib.figure import Figure
+    from numpy import arange
+
+    fig = Figure(figsize=(8.5, 11))
+    ax = fig.add_axes([100 / 612, 1 - 400 / 792, 300 / 612, 200 / 792])
+    ax.plot(arange(10), arange(10) ** 2)
+    ax.axis("off")
+    fig.figimage(arange(2500).reshape(50, 50), xo=100, yo=100)
+    path = tmp_path / "graphics.pdf"
+    fig.savefig(path, dpi=72)
+
+    boxes = extract_graphics_boxes(path)[1]
+    assert len(boxes) > 0
+    assert boxes[:, 2].max() < 612
+    contours = object_contours(boxes, pages_stub(612, 792))
+    regions = sorted(contours.tolist(), key=lambda el: el[1])
+    plot, image = regions
+    # the line plot lies inside the axes at (100, 200, 300, 200)
+    assert plot[0] >= 95 and plot[1] >= 195
+    assert plot[0] + plot[2] <= 405 and plot[1] + plot[3] <= 405
+    assert plot[2] > 250 and plot[3] > 150
+    assert image == pytest.approx([100, 642, 50, 50], abs=3)
+
+
+def _write_pdf(path, objects):
+    """PDF file from the bodies of objects 1, 2, ..."""
+    content = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(content))
+        content += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(content)
+    content += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    content += b"".join([b"%010d 00000 n \n" % el for el in offsets])
+    content += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1)
+    content += b"startxref\n%d\n%%%%EOF\n" % xref
+    path.write_bytes(content)
+
+
+def _stream(stream, entries=b""):
+    return b"<< %s /Length %d >>\nstream\n%s\nendstream" % (
+        entries,
+        len(stream),
+        stream,
+    )
+
+
+def test_extract_graphics_boxes_inside_page_forms(tmp_path):
+    """Drawings inside a form wrapping the whole page are found, and drawings
+    outside the page are left out"""
+    form = b"100 300 200 150 re f 300 100 120 80 re f"
+    page = b"q /Fm1 Do Q 0 742 m 612 742 l S 700 100 50 50 re f 0 -90 612 40 re f"
+    path = tmp_path / "stamped.pdf"
+    _write_pdf(
+        path,
+        [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /XObject << /Fm1 5 0 R >> >> /Contents 4 0 R >>",
+            _stream(page),
+            _stream(form, b"/Type /XObject /Subtype /Form /BBox [0 0 612 792]"),
+        ],
+    )
+
+    boxes = extract_graphics_boxes(path)[1]
+    boxes = sorted(boxes.tolist())
+    expected = [[0, 50, 612, 0], [100, 342, 200, 150], [300, 612, 120, 80]]
+    assert len(boxes) == len(expected)
+    for box, expected_box in zip(boxes, expected):
+        assert box == pytest.approx(expected_box, abs=1)
+
+
+def test_unreadable_pdf_keeps_the_raster_contours(tmp_path):
+    """PDFs that pdfminer cannot parse fall back to the page PNGs"""
+    # pylint: disable=import-outside-toplevel
+    from collections import Counter
+
+    from pdfigcapx.document import Document
+
+    path = tmp_path / "corrupt.pdf"
+    path.write_bytes(b"%PDF-1.4\n1 0 obj\n<< /Type /Cat")
+    document = Document.__new__(Document)
+    document.pdf_path, document.doc_name = path, "corrupt"
+    document.metrics = Counter()
+    page = pages_stub(612, 792)
+    document._place_object_contours([page])
+    assert page.raw_contours is None and page.has_graphics is None
+    assert document.metrics["documents_object_candidates_failed"] == 1
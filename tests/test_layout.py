@@ -0,0 +1,169 @@
+""" testing the layout statistics """
+
+import numpy as np
+
+import pytest
+
+from pdfigcapx.layout import (
+    IncrementalLayoutEstimator,
+    LayoutBuilder,
+    TextBoxCoords,
+    UnsupportedLayoutError,
+    cluster_points,
+)
+from pdfigcapx.models import TextBox
+from pdfigcapx.page import HtmlPage
+
+
+def _page(number, boxes, width=612, height=792):
+    return HtmlPage(
+        name=f"page{number}.html",
+        width=width,
+        height=height,
+        img_name=f"page{number}.png",
+        number=number,
+        text_boxes=[TextBox(*el, idx, number, "") for idx, el in enumerate(boxes)],
+        captions=[],
+    )
+
+
+def test_value_counts_match_list_histogram():
+    """Same pairs, order and measured types as counting over the lists"""
+    rng = np.random.default_rng(5)
+    for _ in range(100):
+        values = rng.integers(0, 40, rng.integers(1, 200)).tolist()
+        values = [v + 0.5 if v % 7 == 0 else v for v in values]
+        coords = TextBoxCoords([_page(1, [(v, 0, 10, 10) for v in values])])
+        xs = [v for v in values if v > 10]
+        assert coords.value_counts("x", coords.arrays["x"] > 10) == [
+            (i, xs.count(i)) for i in set(xs)
+        ]
+        assert repr(coords.min("x")) == repr(min(values))
+        assert repr(coords.max("x1")) == repr(max([v + 10 for v in values]))
+    assert coords.value_counts("x", coords.arrays["x"] > 100) == []
+
+
+def test_two_column_layout():
+    rows = []
+    for y in range(60, 720, 12):
+        rows += [(72, y, 220, 11), (320, y, 220, 11), (75, y, 20, 9)]
+    pages = [_page(number, rows) for number in range(1, 4)]
+    layout = LayoutBuilder.build(pages)
+    assert (layout.num_cols, layout.row_width, layout.row_height) == (2, 220, 11)
+    assert layout.col_coords == [72, 320]
+    assert layout.content_region.to_arr() == [72, 60, 468, 659]
+
+
+def test_padded_second_column():
+    """Second column starts split by the conversion are merged"""
+    rows = []
+    for idx, y in enumerate(range(60, 720, 12)):
+        rows += [(72, y, 220, 11), (320 + idx % 3, y, 220, 11)]
+        if idx % 2 == 0:
+            rows.append((450, y, 20, 9))  # more frequent than any single start
+    layout = LayoutBuilder.build([_page(1, rows)])
+    assert layout.col_coords == [72, 320]
+
+
+def _column_rows(col_xs, col_width=140):
+    rows = []
+    for y in range(60, 720, 12):
+        rows += [(x, y, col_width, 11) for x in col_xs]
+    return rows
+
+
+def test_incremental_layout_is_fixed_when_stable():
+    rows = _column_rows([72, 320], col_width=220)
+    pages = [_page(number, rows) for number in range(1, 11)]
+    estimator = IncrementalLayoutEstimator(max_pages=8)
+    confidences = []
+    for page in pages[:5]:
+        layout = estimator.add_page(page)
+        confidences.append(estimator.confidence)
+    assert confidences == [0.0, 0.0, 1 / 3, 2 / 3, 1.0]
+    assert repr(layout) == repr(LayoutBuilder.build(pages))
+    assert estimator.done and len(estimator.pages) == 5
+    assert estimator.add_page(pages[5]) is layout and len(estimator.pages) == 5
+
+
+def test_incremental_layout_abandons_unsupported_columns():
+    pages = [_page(number, _column_rows([72, 232, 392])) for number in range(1, 40)]
+    with pytest.raises(UnsupportedLayoutError) as error:
+        LayoutBuilder.build(pages)
+    assert error.value.num_cols == 3
+
+    estimator = IncrementalLayoutEstimator()
+    with pytest.raises(UnsupportedLayoutError):
+        for page in pages:
+            estimator.add_page(page)
+    assert len(estimator.pages) == 5
+
+
+def test_incremental_layout_without_stable_sample():
+    """A sample that keeps changing is not fixed"""
+    estimator = IncrementalLayoutEstimator(max_pages=4)
+    for number in range(1, 7):
+        rows = _column_rows([72, 320], col_width=200 + number)
+        assert estimator.add_page(_page(number, rows)) is None
+    assert estimator.done and estimator.layout is None
+    assert estimator.confidence == 1 / 3
+
+
+def _nested_merge(sorted_points, padding_threshold=10):
+    """Reference merge of every point into the first point within padding"""
+    left_points = sorted_points.copy()
+    i = 0
+    while i < len(left_points):
+        j = i + 1
+        while j < len(left_points):
+            if abs(left_points[i][0] - left_points[j][0]) <= padding_threshold:
+                left_points[i] = (
+                    left_points[i][0],
+                    left_points[i][1] + left_points[j][1],
+                )
+                del left_points[j]
+            else:
+                j = j + 1
+        i = i + 1
+    return sorted(left_points, key=lambda x: x[1], reverse=True)
+
+
+def _margin_histogram(rng):
+    """Counts of text starts around a few margins, e.g., columns, indented
+    paragraphs and centered headings, jittered by the html conversion"""
+    n_margins = rng.integers(1, 6)
+    margins = np.sort(rng.choice(np.arange(0, 600, 12), n_margins, replace=False))
+    xs = []
+    for margin in margins.tolist():
+        jitter = rng.choice([0, 0, 0, 0.5, 1, 2.5, 4], rng.integers(1, 300))
+        xs += (margin + jitter).tolist()
+    points = [(i, xs.count(i)) for i in set(xs)]
+    return sorted(points, key=lambda x: x[1], reverse=True)
+
+
+def test_cluster_points_match_nested_merge():
+    rng = np.random.default_rng(13)
+    for _ in range(300):
+        points = _margin_histogram(rng)
+        clusters = cluster_points(points)
+        assert clusters == _nested_merge(points)
+        assert sum([count for _, count in clusters]) == sum(
+            [count for _, count in points]
+        )
+    for _ in range(300):
+        xs = (rng.random(40) * rng.choice([30, 100, 600])).round(1).tolist()
+        points = sorted(
+            zip(xs, rng.integers(1, 5, 40).tolist()), key=lambda x: x[1], reverse=True
+        )
+        assert cluster_points(points) == _nested_merge(points)
+    assert cluster_points([]) == []
+
+
+def test_cluster_points_do_not_depend_on_order():
+    """Counts and representatives are the same for any order without ties"""
+    points = [(72, 40), (74.5, 3), (83, 1), (86, 25), (320, 35), (322, 6)]
+    expected = [(72, 43), (320, 41), (86, 26)]
+    rng = np.random.default_rng(17)
+    for _ in range(20):
+        shuffled = [points[idx] for idx in rng.permutation(len(points))]
+        assert cluster_points(shuffled) == expected
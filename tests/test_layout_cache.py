@@ -0,0 +1,55 @@
+""" testing the publisher layout template cache """
+
+from pdfigcapx.layout import LayoutBuilder
+from pdfigcapx.layout_cache import LayoutTemplateCache
+from pdfigcapx.models import TextBox
+from pdfigcapx.page import HtmlPage
+
+
+def _document(col_xs, n_rows=55, width=612, height=792):
+    rows = []
+    for y in range(60, 60 + 12 * n_rows, 12):
+        rows += [(x, y, 220, 11) for x in col_xs]
+    return [
+        HtmlPage(
+            name=f"page{number}.html",
+            width=width,
+            height=height,
+            img_name=f"page{number}.png",
+            number=number,
+            text_boxes=[TextBox(*el, idx, number, "") for idx, el in enumerate(rows)],
+            captions=[],
+        )
+        for number in range(1, 6)
+    ]
+
+
+def test_template_is_used_once_confirmed(tmp_path):
+    cache = LayoutTemplateCache(tmp_path)
+    pages = _document([72, 320])
+    key = cache.fingerprint(pages)
+    assert key == cache.fingerprint(_document([72, 320], n_rows=50))
+    assert key != cache.fingerprint(_document([72, 320], width=595))
+    assert key != cache.fingerprint(_document([90, 320]))
+
+    layout = LayoutBuilder.build(pages)
+    assert cache.load(key, pages) is None
+    cache.save(key, layout)
+    assert cache.load(key, pages) is None  # a single document is not enough
+    cache.save(key, layout)
+    cached = cache.load(key, pages)
+    assert cached == layout and repr(cached) == repr(layout)
+
+    # the text of the first pages must fit the content region of the template
+    assert cache.load(key, _document([72, 320, 480])) is None
+
+
+def test_different_layout_restarts_the_template(tmp_path):
+    cache = LayoutTemplateCache(tmp_path)
+    pages = _document([72, 320])
+    key = cache.fingerprint(pages)
+    cache.save(key, LayoutBuilder.build(pages))
+    cache.save(key, LayoutBuilder.build(pages))
+    cache.save(key, LayoutBuilder.build(_document([72, 320], n_rows=50)))
+    assert cache.load(key, pages) is None
+    assert cache.fingerprint([]) is None
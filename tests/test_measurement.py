@@ -0,0 +1,87 @@
+""" testing the browser-free measurement backend """
+
+import pytest
+
+from pdfigcapx.measurement import (
+    FontMetrics,
+    FontMetricsMeasurement,
+    MeasurementBackend,
+    compare_measurements,
+    generic_family,
+)
+
+PAGE_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<style type="text/css">
+.txt { white-space:nowrap; }
+#f0 { font-family:sans-serif; font-weight:normal; font-style:normal; }
+#f1 { font-family:serif; font-weight:bold; font-style:normal; }
+</style>
+</head>
+<body>
+<img width="612" height="792" src="page2.png" alt="">
+<div class="txt" style="position:absolute; left:72px; top:80px;"><span id="f1" style="font-size:14px;vertical-align:baseline;color:rgba(0,0,0,1);">Results</span></div>
+<div class="txt" style="position:absolute; left:72px; top:100px;"><span id="f0" style="font-size:10px;vertical-align:baseline;color:rgba(0,0,0,1);">Figure 2. </span><span id="f1" style="font-size:10px;vertical-align:baseline;color:rgba(0,0,0,1);">Overview</span></div>
+<div class="txt" style="position:absolute; left:72px; top:120px;"><span id="f0" style="font-size:10px;vertical-align:baseline;color:rgba(0,0,0,1);">Overview of the results</span></div>
+</body>
+</html>
+"""
+
+
+@pytest.fixture
+def page_path(tmp_path):
+    path = tmp_path / "page2.html"
+    path.write_text(PAGE_HTML, encoding="utf-8")
+    return path
+
+
+def test_font_metrics_page(page_path):
+    page = FontMetricsMeasurement().extract_page(page_path)
+    assert page.number == 2
+    assert (page.width, page.height) == (612, 792)
+    assert [tb.id for tb in page.text_boxes] == [0, 2]
+    assert [tb.id for tb in page.captions] == [1]
+    assert page.captions[0].text == "Figure 2. Overview"
+
+    title, paragraph = page.text_boxes
+    assert (title.x, title.y) == (72, 80)
+    assert 0 < title.width < paragraph.width
+    # line height is at least the 16px strut of the div default font
+    assert paragraph.height >= 16
+
+
+@pytest.mark.parametrize(
+    "family,expected",
+    [
+        ("sans-serif", "sans-serif"),
+        ("'Times New Roman',serif", "serif"),
+        ("Courier", "monospace"),
+        ("ff3", "serif"),
+    ],
+)
+def test_generic_family(family, expected):
+    assert generic_family(family) == expected
+
+
+def test_text_width_cached():
+    metrics = FontMetrics()
+    key = ("serif", False, False)
+    width = metrics.text_width(key, 10.0, "abc")
+    assert metrics.text_width(key, 20.0, "abc") == pytest.approx(2 * width)
+    metrics.text_width(key, 10.0, "abc")
+    assert metrics.text_width.cache_info().hits == 1
+
+
+def test_backends_implement_extract_pages():
+    with pytest.raises(TypeError):
+        MeasurementBackend()  # pylint: disable=abstract-class-instantiated
+    assert isinstance(FontMetricsMeasurement(), MeasurementBackend)
+
+
+def test_compare_measurements_same_backend(page_path):
+    backend = FontMetricsMeasurement()
+    report = compare_measurements([page_path], backend, backend)
+    assert report["boxes"] == 3
+    assert report["mean_iou"] == pytest.approx(1.0)
+    assert report["width_mae"] == 0
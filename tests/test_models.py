@@ -0,0 +1,123 @@
+""" testing the geometry models """
+
+from copy import deepcopy
+from dataclasses import FrozenInstanceError
+from pickle import dumps, loads
+
+import numpy as np
+import pytest
+
+from pdfigcapx.models import AlignmentType, Bbox, BboxArray, PageText, TextBox
+from pdfigcapx.utils import build_html_page, overlap_ratio_based
+
+
+def _values(bbox):
+    return (bbox.x, bbox.y, bbox.width, bbox.height, bbox.x1, bbox.y1)
+
+
+def test_bbox_array_matches_bbox_operations():
+    rng = np.random.default_rng(5)
+    for dtype in [int, float]:
+        rows = rng.integers(0, 300, (60, 4)).astype(dtype)
+        if dtype is float:
+            rows += rng.choice([0, 0.5, 0.25], rows.shape)
+        rows[3, 2] = 0  # empty box
+        bboxes = [Bbox(*el) for el in rows.tolist()]
+        boxes = BboxArray(rows)
+        assert [_values(el) for el in boxes] == [_values(el) for el in bboxes]
+
+        other = Bbox(50, 40.5, 120, 200)
+        assert boxes.intersect_area(other).tolist() == [
+            el.intersect_area(other) for el in bboxes
+        ]
+        assert boxes.overlap_ratio(other).tolist() == [
+            overlap_ratio_based(el, other) for el in bboxes
+        ]
+        assert _values(boxes.merge()) == _values(Bbox.merge_bboxes(bboxes))
+        assert _values(boxes[5:9].merge()) == _values(Bbox.merge_bboxes(bboxes[5:9]))
+
+
+def test_bbox_array_indexing():
+    text_boxes = [
+        TextBox(72, 80, 200.5, 14, 7, 1, "a"),
+        TextBox(72, 95, 451, 12, 9, 1, "b"),
+        TextBox(300, 95, 100, 12, 12, 1, "c"),
+    ]
+    boxes = BboxArray.from_bboxes(text_boxes)
+    assert boxes.ids.tolist() == [7, 9, 12]
+    assert isinstance(boxes[1], Bbox) and _values(boxes[1]) == _values(text_boxes[1])
+    assert isinstance(boxes[1].width, int) and boxes[0].width == 200.5
+
+    selected = boxes[boxes.x < 100]
+    assert len(selected) == 2 and selected.ids.tolist() == [7, 9]
+    assert len(boxes[:0]) == 0 and len(BboxArray([])) == 0
+
+    joined = BboxArray.concat([selected, boxes[[2]]])
+    assert [_values(el) for el in joined] == [_values(el) for el in text_boxes]
+    assert joined.to_arr().tolist() == [
+        [72, 80, 200.5, 14],
+        [72, 95, 451, 12],
+        [300, 95, 100, 12],
+    ]
+
+    trimmed = boxes.with_columns(x1=np.minimum(boxes.x1, 250))
+    assert trimmed.width.tolist() == [178, 178, -50]
+    assert boxes.width.tolist() == [200.5, 451, 100]
+
+
+def test_models_are_slotted():
+    text_box = TextBox(72, 80, 200.5, 14, 7, 3, "Figure 1. Overview")
+    assert not hasattr(Bbox(1, 2, 3, 4), "__dict__")
+    assert not hasattr(text_box, "__dict__")
+    assert (text_box.x1, text_box.y1, text_box.page_number) == (272.5, 94, 3)
+
+
+def test_text_boxes_share_the_page_text():
+    boxes = [
+        [72, 80, 200.5, 14, "Introduction — résumé"],
+        [72, 95, 451, 12, ""],
+        [72, 300, 450, 12, "Figure 1. Overview"],
+    ]
+    page = build_html_page("/tmp/xpdf_doc/page3.html", 612, 792, boxes)
+    text_boxes = page.text_boxes + page.captions
+    assert [tb.text for tb in text_boxes] == [el[4] for el in boxes]
+    assert [tb.page_number for tb in text_boxes] == [3, 3, 3]
+    assert len(set([id(tb._page_text) for tb in text_boxes])) == 1
+
+    caption = page.captions[0].with_text("Figure 1. Overview of the pipeline")
+    assert caption.text == "Figure 1. Overview of the pipeline"
+    assert (caption.id, caption.page_number) == (2, 3)
+    assert page.captions[0].text == "Figure 1. Overview"
+    assert page.text_boxes[0].text == "Introduction — résumé"
+
+    page_text = PageText.from_texts(1, ["ab", "", "c"])
+    assert [page_text.text(idx) for idx in range(3)] == ["ab", "", "c"]
+
+
+def test_models_are_immutable():
+    caption = TextBox(72, 300, 450, 12, 4, 2, "Figure 2. Results")
+    with pytest.raises(FrozenInstanceError):
+        caption.y1 = 400
+    with pytest.raises(FrozenInstanceError):
+        caption.alignment = AlignmentType.LEFT
+    with pytest.raises(FrozenInstanceError):
+        Bbox(1, 2, 3, 4).x = 0
+
+    moved = caption.with_edges(y1=340.5)
+    assert _values(moved) == (72, 300, 450, 40.5, 522, 340.5)
+    assert _values(caption) == (72, 300, 450, 12, 522, 312)
+    assert (moved.id, moved.text, moved.alignment) == (
+        4,
+        caption.text,
+        caption.alignment,
+    )
+    assert caption.with_alignment(AlignmentType.LEFT).alignment == AlignmentType.LEFT
+    assert caption.alignment == AlignmentType.UNKNOWN
+
+    bbox = Bbox(0.1, 0, 0.2, 10).with_edges(y=5)
+    assert (bbox.width, bbox.height) == (0.2, 5)  # width is kept as given
+    assert bbox.with_edges(x=0.2).width == bbox.x1 - 0.2
+
+    for copied in [deepcopy(caption), loads(dumps(caption))]:
+        assert _values(copied) == _values(caption)
+        assert (copied.id, copied.text, copied.page_number) == (4, caption.text, 2)
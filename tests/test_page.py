@@ -0,0 +1,116 @@
+""" testing the caption expansion of html pages """
+
+import numpy as np
+
+from pdfigcapx.models import AlignmentType, Bbox, Figure, Layout, TextBox
+from pdfigcapx.page import HtmlPage
+from pdfigcapx.utils import build_html_page
+
+LAYOUT = Layout(612, 792, 2, 240, 11, Bbox(60, 50, 492, 700), [60, 310])
+
+
+def _naive_expand_captions(text_boxes, captions, layout):
+    """Reference scan over every text box per caption"""
+    expanded = []
+    for caption in captions:
+        if caption.x < layout.width / 2 and caption.x1 > layout.width / 2:
+            alignment, edge = AlignmentType.MULTICOLUMN, "x"
+        elif caption.x1 < layout.width / 2:
+            alignment, edge = AlignmentType.LEFT, "x"
+        else:
+            alignment, edge = AlignmentType.RIGHT, "x1"
+        sentences = [
+            box
+            for box in text_boxes
+            if box.y > caption.y
+            and abs(getattr(caption, edge) - getattr(box, edge)) < layout.row_width / 2
+        ]
+        sentences = sorted(sentences, key=lambda el: el.y)
+        sweep_y, y1, texts, ids_to_remove = caption.y1, None, [caption.text], []
+        for sentence in sentences:
+            if abs(sentence.y - sweep_y) < layout.row_height * 1.5:
+                y1, sweep_y = sentence.y1, sentence.y
+                texts.append(sentence.text)
+                ids_to_remove.append(sentence.id)
+            else:
+                break
+        text_boxes = [tb for tb in text_boxes if tb.id not in ids_to_remove]
+        height = caption.height if y1 is None else y1 - caption.y
+        expanded.append((caption.y, height, " ".join(texts), alignment))
+    return text_boxes, expanded
+
+
+def _random_page(rng):
+    boxes = []
+    for idx in range(int(rng.integers(0, 300))):
+        col = int(rng.integers(0, 2))
+        x = 60 + 250 * col + float(rng.choice([0, 0, 0.5, 3, 130]))
+        y = float(rng.integers(40, 60)) * 12 + float(rng.choice([0, 0, 0.5, 6, 11]))
+        width = float(rng.choice([230, 230, 100, 480]))
+        boxes.append(TextBox(x, y, width, 11, idx, 1, f"line {idx}"))
+    captions = []
+    for idx in range(int(rng.integers(0, 6))):
+        x = float(rng.choice([60, 310, 62, 100]))
+        y = float(rng.integers(40, 60)) * 12
+        width = float(rng.choice([230, 480]))
+        captions.append(TextBox(x, y, width, 11, 1000 + idx, 1, f"Figure {idx}."))
+    return boxes, captions
+
+
+def test_expand_captions_matches_full_scan():
+    rng = np.random.default_rng(13)
+    for _ in range(300):
+        boxes, captions = _random_page(rng)
+        page = HtmlPage("page1.html", 612, 792, "page1.png", 1, boxes, captions)
+        page.expand_captions(LAYOUT)
+        text_boxes, expanded = _naive_expand_captions(boxes, captions, LAYOUT)
+        assert [tb.id for tb in page.text_boxes] == [tb.id for tb in text_boxes]
+        assert [(c.y, c.height, c.text, c.alignment) for c in page.captions] == expanded
+
+
+def test_text_boxes_assignment_resets_the_index():
+    boxes = [
+        TextBox(60, 100, 230, 11, 0, 1, "Figure 1. Overview"),
+        TextBox(60, 112, 230, 11, 1, 1, "of the pipeline"),
+        TextBox(60, 300, 230, 11, 2, 1, "Results"),
+    ]
+    page = HtmlPage("page1.html", 612, 792, "page1.png", 1, boxes[1:], boxes[:1])
+    page.expand_captions(LAYOUT)
+    assert page.captions[0].text == "Figure 1. Overview of the pipeline"
+    assert [tb.id for tb in page.text_boxes] == [2]
+    assert [tb.id for tb in page.text_boxes_in(0, 0, 612, 792)] == [2]
+
+    page.text_boxes = boxes[1:]
+    assert [tb.id for tb in page.text_boxes] == [1, 2]
+    assert [tb.id for tb in page.text_boxes_in(0, 0, 612, 792)] == [1, 2]
+    page.release_text_boxes()
+    assert page.text_boxes == [] and page.text_boxes_in(0, 0, 612, 792) == []
+
+
+def test_release_text_boxes_frees_the_page_text():
+    boxes = [
+        [60, 100, 230, 11, "Figure 1. Overview"],
+        [60, 112, 230, 11, "of the pipeline"],
+        [310, 400, 230, 11, "Figure 2. Results"],
+        [310, 600, 230, 11, "Figure 3. Unmatched"],
+        [60, 300, 230, 11, "Results"],
+    ]
+    page = build_html_page("/tmp/xpdf_doc/page1.html", 612, 792, boxes)
+    page_text = page.text_boxes[0]._page_text
+    page.expand_captions(LAYOUT)
+    expanded, matched, orphan = page.captions
+    page.figures.append(Figure(Bbox(310, 200, 230, 190), False, matched, "unique"))
+    page.orphan_captions.append(orphan)
+
+    page.release_text_boxes()
+    captions = page.captions + page.orphan_captions
+    assert [c.text for c in captions] == [
+        "Figure 1. Overview of the pipeline",
+        "Figure 2. Results",
+        "Figure 3. Unmatched",
+        "Figure 3. Unmatched",
+    ]
+    assert all([c._page_text is not page_text for c in captions])
+    assert page.figures[0].caption is page.captions[1]
+    assert page.orphan_captions[0] is page.captions[2]
+    assert (page.captions[1].id, page.captions[1].y) == (matched.id, matched.y)
@@ -0,0 +1,115 @@
+""" testing the page-level parse cache """
+
+from numpy import array, int32, zeros
+
+from pdfigcapx.page_cache import PageCache
+from pdfigcapx.utils import build_html_page
+
+
+def _box_values(text_box):
+    return (
+        text_box.x,
+        text_box.y,
+        text_box.width,
+        text_box.height,
+        text_box.id,
+        text_box.page_number,
+        text_box.text,
+    )
+
+
+def test_page_round_trip(tmp_path):
+    boxes = [
+        [72, 80, 200.5, 14, "Introduction — résumé"],
+        [72, 300, 450, 12, "Figure 1. Overview of the pipeline"],
+        [72, 95, 451, 12, ""],
+    ]
+    page = build_html_page("/tmp/xpdf_doc/page3.html", 612, 792.5, boxes)
+    cache = PageCache(tmp_path / "cache")
+    cache.save_page("ab" * 32, page)
+
+    cached = cache.load_page("ab" * 32, "/tmp/xpdf_doc/page3.html")
+    assert (cached.name, cached.img_name, cached.number) == (
+        "page3.html",
+        "page3.png",
+        3,
+    )
+    assert (cached.width, cached.height) == (612, 792.5)
+    assert isinstance(cached.width, int)
+    assert [_box_values(tb) for tb in cached.text_boxes] == [
+        _box_values(tb) for tb in page.text_boxes
+    ]
+    assert [_box_values(tb) for tb in cached.captions] == [
+        _box_values(tb) for tb in page.captions
+    ]
+    assert cached.cache_key == "ab" * 32
+    assert cached.raw_contours is None
+
+
+def test_contours_round_trip(tmp_path):
+    cache = PageCache(tmp_path)
+    assert cache.load_contours("cd" * 32) is None
+    cache.save_contours("cd" * 32, array([[1, 2, 30, 40], [5, 6, 7, 8]]))
+    contours = cache.load_contours("cd" * 32)
+    assert contours.tolist() == [[1, 2, 30, 40], [5, 6, 7, 8]]
+    cache.save_contours("ef" * 32, zeros((0, 4), dtype=int32))
+    assert cache.load_contours("ef" * 32).shape == (0, 4)
+
+
+def test_key_depends_on_content_and_salt(tmp_path):
+    html_path, png_path = tmp_path / "page1.html", tmp_path / "page1.png"
+    html_path.write_text("<div>text</div>")
+    png_path.write_bytes(b"png")
+    cache = PageCache(tmp_path / "cache")
+    key = cache.key(html_path, png_path, "chrome")
+    assert key == cache.key(html_path, png_path, "chrome")
+    assert key != cache.key(html_path, png_path, "fonts")
+    png_path.write_bytes(b"png changed")
+    assert key != cache.key(html_path, png_path, "chrome")
+    assert cache.load_page(key, html_path) is None
+
+
+class _CountingMeasurement:
+    """Measurement stub building pages without text, recording what it measures"""
+
+    name = "stub"
+
+    def __init__(self):
+        self.measured = []
+
+    def extract_pages(self, page_paths):
+        for page_path in page_paths:
+            self.measured.append(page_path.name)
+            yield build_html_page(page_path, 612, 792, [])
+
+
+def test_cached_pages_keep_the_document_order(tmp_path):
+    # pylint: disable=import-outside-toplevel
+    from collections import Counter
+
+    from pdfigcapx.document import Document
+
+    page_paths = []
+    for number in range(1, 7):
+        page_path = tmp_path / f"page{number}.html"
+        page_path.write_text(f"<div>page {number}</div>")
+        page_path.with_suffix(".png").write_bytes(b"png")
+        page_paths.append(page_path)
+    document = Document.__new__(Document)
+    document.page_cache = PageCache(tmp_path / "cache")
+    document.measurement = _CountingMeasurement()
+    document.contours_variant = ""
+    document.metrics = Counter()
+    for page_path in [page_paths[1], page_paths[4]]:
+        key = document.page_cache.key(page_path, page_path.with_suffix(".png"), "stub")
+        document.page_cache.save_page(key, build_html_page(page_path, 612, 792, []))
+
+    pages = document._fetch_cached_pages(page_paths)
+    assert [page.number for page in pages] == [1, 2, 3, 4, 5, 6]
+    assert document.measurement.measured == [
+        "page1.html",
+        "page3.html",
+        "page4.html",
+        "page6.html",
+    ]
+    assert document.metrics["page_cache_hits"] == 2
@@ -0,0 +1,53 @@
+""" testing the grid index over page boxes """
+
+from math import inf
+
+import numpy as np
+
+from pdfigcapx.models import Bbox
+from pdfigcapx.spatial_index import GridIndex
+
+
+def _touches(box, x0, y0, x1, y1):
+    x0, x1 = min(x0, x1), max(x0, x1)
+    y0, y1 = min(y0, y1), max(y0, y1)
+    return (
+        min(box.x, box.x1) <= x1
+        and max(box.x, box.x1) >= x0
+        and min(box.y, box.y1) <= y1
+        and max(box.y, box.y1) >= y0
+    )
+
+
+def test_query_returns_every_touching_box():
+    rng = np.random.default_rng(17)
+    for _ in range(50):
+        boxes = [
+            Bbox(*el)
+            for el in zip(
+                rng.uniform(-50, 650, 200).tolist(),
+                rng.uniform(-50, 850, 200).tolist(),
+                rng.choice([-20, 0, 3.5, 40, 500], 200).tolist(),
+                rng.choice([-5, 0, 11, 120], 200).tolist(),
+            )
+        ]
+        grid = GridIndex(boxes, 612, 792)
+        for _ in range(40):
+            x0, x1 = rng.choice([-inf, -100, 0, 30.5, 300, 612, 700, inf], 2)
+            y0, y1 = rng.choice([-inf, -10, 0, 45, 400.5, 792, 900, inf], 2)
+            found = grid.query(x0, y0, x1, y1)
+            assert found == sorted(set(found))
+            expected = [
+                idx for idx, el in enumerate(boxes) if _touches(el, x0, y0, x1, y1)
+            ]
+            assert set(expected) <= set(found)
+
+
+def test_query_reads_only_the_window_cells():
+    boxes = [Bbox(10, 10, 5, 5), Bbox(500, 700, 5, 5), Bbox(0, 300, 612, 11)]
+    grid = GridIndex(boxes, 612, 792, cell_size=32)
+    assert grid.query(0, 0, 20, 20) == [0]
+    assert grid.query(600, 790, 300, 600) == [1]
+    assert grid.query(490, -inf, 510, inf) == [1, 2]
+    assert grid.query(400, -inf, 420, inf) == [2]
+    assert GridIndex([], 0, 0).query(-inf, -inf, inf, inf) == []
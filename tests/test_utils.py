@@ -1,8 +1,10 @@
 """ testing utility functions """
 
+from io import BytesIO
 from os import listdir, makedirs, path
 from pathlib import Path
 from shutil import rmtree
+from subprocess import CalledProcessError
 
 import pytest
 from pdfigcapx import utils
@@ -82,3 +84,72 @@ def test_chromedriver():
     assert len(page.figures) == 0
     assert page.orphan_figure is None
     browser.quit()
+
+
+def test_build_html_page():
+    """Measured divs become text boxes or captions, keeping the document order"""
+    boxes = [
+        [72, 80, 200.5, 14, "Introduction"],
+        [72, 300, 450, 12, "Figure 1. Overview of the pipeline"],
+        [72, 95, 451, 12, "Some text in a paragraph"],
+    ]
+    page = utils.build_html_page("/tmp/xpdf_doc/page3.html", 612, 792, boxes)
+    assert page.number == 3
+    assert page.name == "page3.html"
+    assert page.img_name == "page3.png"
+    assert (page.width, page.height) == (612, 792)
+    assert [tb.id for tb in page.text_boxes] == [0, 2]
+    assert page.text_boxes[0].width == 200.5
+    assert page.text_boxes[1].text == "Some text in a paragraph"
+    assert len(page.captions) == 1
+    assert page.captions[0].id == 1
+    assert page.captions[0].y1 == 312
+
+
+def test_read_ppm_frame():
+    """Concatenated PPM frames, as piped by ghostscript, are decoded in order"""
+    first = b"P6\n# Image generated by GPL Ghostscript\n2 1\n255\n" + bytes(
+        [255, 0, 0, 0, 0, 255]
+    )
+    second = b"P6 1 2 255\n" + bytes([1, 2, 3, 4, 5, 6])
+    stream = BytesIO(first + second)
+    image = utils.read_ppm_frame(stream)
+    assert image.size == (2, 1)
+    assert image.getpixel((0, 0)) == (255, 0, 0)
+    assert image.getpixel((1, 0)) == (0, 0, 255)
+    image = utils.read_ppm_frame(stream)
+    assert image.size == (1, 2)
+    assert image.getpixel((0, 1)) == (4, 5, 6)
+    assert utils.read_ppm_frame(stream) is None
+
+
+def test_read_truncated_ppm_frame():
+    with pytest.raises(Exception, match="truncated"):
+        utils.read_ppm_frame(BytesIO(b"P6\n2 2\n255\n" + bytes(5)))
+
+
+def test_parallel_rendering_keeps_page_order(monkeypatch):
+    """Strided chunks rendered in parallel are merged back in page order"""
+
+    def fake_stream(file_path, dpi, pages):
+        for number in pages:
+            yield number
+
+    monkeypatch.setattr(utils, "stream_pdf_images", fake_stream)
+    pages = [2, 3, 5, 8, 13, 21, 34]
+    images = utils.stream_pdf_images_parallel("doc.pdf", pages=pages, workers=3)
+    assert list(images) == pages
+
+
+def test_parallel_rendering_raises_renderer_errors(monkeypatch):
+    def fake_stream(file_path, dpi, pages):
+        for number in pages:
+            if number == 4:
+                raise CalledProcessError(1, ["gs"])
+            yield number
+
+    monkeypatch.setattr(utils, "stream_pdf_images", fake_stream)
+    images = utils.stream_pdf_images_parallel("doc.pdf", pages=[1, 2, 3, 4], workers=2)
+    assert next(images) == 1
+    with pytest.raises(CalledProcessError):
+        list(images)